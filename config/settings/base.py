@@ -146,6 +146,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "metecho.logging_middleware.LoggingMiddleware",
+    "metecho.replica_routing.ReplicaRoutingMiddleware",
     "sfdo_template_helpers.admin.middleware.AdminRestrictMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
@@ -198,7 +199,25 @@ SITE_ID = 1
 # Database
 # https://docs.djangoproject.com/en/1.11/ref/settings/#databases
 
-DATABASES = {"default": dj_database_url.config(default="postgres:///metecho")}
+DATABASES = {
+    "default": dj_database_url.config(
+        default="postgres:///metecho",
+        conn_max_age=env("DATABASE_CONN_MAX_AGE", default=0, type_=int),
+    )
+}
+# An optional read replica, for safe requests and websocket hydration (see
+# metecho.replica_routing):
+DATABASE_REPLICA_URL = env("DATABASE_REPLICA_URL", default="")
+if DATABASE_REPLICA_URL:
+    DATABASES["replica"] = dj_database_url.parse(
+        DATABASE_REPLICA_URL,
+        conn_max_age=env("DATABASE_CONN_MAX_AGE", default=0, type_=int),
+    )
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+DATABASE_ROUTERS = ["metecho.replica_routing.ReplicaRouter"]
+# How long a client that wrote keeps reading from the primary, to cover
+# replication lag:
+REPLICA_PIN_SECONDS = env("REPLICA_PIN_SECONDS", default=10, type_=int)
 
 # Custom User model:
 AUTH_USER_MODEL = "api.User"
@@ -306,6 +325,16 @@ DAYS_BEFORE_ORG_EXPIRY_TO_ALERT = env(
     "DAYS_BEFORE_ORG_EXPIRY_TO_ALERT", default=3, type_=int
 )
 ORG_RECHECK_MINUTES = env("ORG_RECHECK_MINUTES", default=5, type_=int)
+# How often the expiry sweeper looks for soon-to-expire scratch orgs, and
+# how many orgs it claims per query:
+ORG_EXPIRY_SWEEP_MINUTES = env("ORG_EXPIRY_SWEEP_MINUTES", default=60, type_=int)
+ORG_EXPIRY_SWEEP_BATCH_SIZE = env("ORG_EXPIRY_SWEEP_BATCH_SIZE", default=100, type_=int)
+
+# How often to retry looking up the GitHub repo_id of projects that lack
+# one, and the bounds of the per-project backoff after failed lookups:
+REPO_ID_SWEEP_MINUTES = env("REPO_ID_SWEEP_MINUTES", default=15, type_=int)
+REPO_ID_RETRY_BASE_MINUTES = env("REPO_ID_RETRY_BASE_MINUTES", default=5, type_=int)
+REPO_ID_RETRY_MAX_MINUTES = env("REPO_ID_RETRY_MAX_MINUTES", default=24 * 60, type_=int)
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/1.11/howto/static-files/
@@ -397,6 +426,8 @@ JS_REVERSE_EXCLUDE_NAMESPACES = ["admin", "admin_rest"]
 # Redis configuration:
 
 REDIS_LOCATION = "{0}/{1}".format(env("REDIS_URL", default="redis://localhost:6379"), 0)
+# How many rendered Markdown descriptions each process keeps around:
+MARKDOWN_CACHE_SIZE = env("MARKDOWN_CACHE_SIZE", default=1024, type_=int)
 CACHES = {
     "default": {
         "BACKEND": "django_redis.cache.RedisCache",
@@ -407,14 +438,40 @@ CACHES = {
         },
     }
 }
+# GitHub webhook deliveries are processed in order on their own queue, which
+# must only ever have a single worker:
+HOOK_EVENT_QUEUE = "hooks"
+# Pushes to the same branch arriving within this many seconds of the first
+# one are applied as one update (0 disables the wait). Waiting pushes are
+# rescheduled through rqscheduler, so its polling interval adds to this:
+HOOK_PUSH_COALESCE_SECONDS = env("HOOK_PUSH_COALESCE_SECONDS", default=3, type_=int)
+# How long to keep successfully handled deliveries around:
+HOOK_EVENT_RETENTION_DAYS = env("HOOK_EVENT_RETENTION_DAYS", default=7, type_=int)
 RQ_QUEUES = {
     "default": {
         "USE_REDIS_CACHE": "default",
         "DEFAULT_TIMEOUT": env("REDIS_JOB_TIMEOUT", type_=int, default=3600),
         "DEFAULT_RESULT_TTL": 720,
-    }
+    },
+    HOOK_EVENT_QUEUE: {
+        "USE_REDIS_CACHE": "default",
+        "DEFAULT_TIMEOUT": env("REDIS_JOB_TIMEOUT", type_=int, default=3600),
+        "DEFAULT_RESULT_TTL": 720,
+    },
 }
-RQ = {"WORKER_CLASS": "metecho.rq_worker.ConnectionClosingWorker"}
+# Use "metecho.rq_worker.ConnectionReusingSimpleWorker" for a non-forking
+# worker that keeps its db connections open between jobs:
+RQ = {
+    "WORKER_CLASS": env(
+        "RQ_WORKER_CLASS", default="metecho.rq_worker.ConnectionClosingWorker"
+    )
+}
+# How long a serialized instance is shared between the subscribers of one
+# websocket message:
+PUSH_HYDRATION_CACHE_SECONDS = env(
+    "PUSH_HYDRATION_CACHE_SECONDS", default=10, type_=int
+)
+
 CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels_redis.core.RedisChannelLayer",
@@ -505,6 +562,9 @@ LOGGING = {
 }
 
 API_PAGE_SIZE = env("API_PAGE_SIZE", type_=int, default=50)
+# How many of a task's newest commits to inline in its API representation;
+# the full history is paged through at /api/tasks/:id/commits/.
+TASK_COMMITS_SUMMARY_SIZE = env("TASK_COMMITS_SUMMARY_SIZE", type_=int, default=50)
 
 # New feature branch prefix:
 BRANCH_PREFIX = env("BRANCH_PREFIX", default=None)
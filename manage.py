@@ -8,6 +8,7 @@ ALLOWED_PRODUCTION_COMMANDS = [
     "migrate",
     "rqscheduler",
     "rqworker",
+    "schedule_periodic_jobs",
     "showmigrations",
 ]
 
@@ -9,8 +9,10 @@ from parler.admin import TranslatableAdmin
 
 from . import gh
 from .models import (
+    Commit,
     Epic,
     EpicSlug,
+    GitHubHookEvent,
     GitHubRepository,
     Project,
     ProjectSlug,
@@ -100,6 +102,21 @@ class GitHubRepositoryAdmin(admin.ModelAdmin):
     list_display = ("repo_url", "user")
 
 
+@admin.register(GitHubHookEvent)
+class GitHubHookEventAdmin(admin.ModelAdmin):
+    list_display = ("delivery_id", "event", "repo_id", "status", "created_at")
+    list_filter = ("status", "event")
+    search_fields = ("delivery_id",)
+    readonly_fields = ("processed_at",)
+    actions = ("reprocess",)
+
+    def reprocess(self, request, queryset):
+        for hook_event in queryset:
+            hook_event.queue_process()
+
+    reprocess.short_description = _("Reprocess selected hook events")
+
+
 @admin.register(Epic)
 class EpicAdmin(admin.ModelAdmin):
     list_display = ("name", "project", "deleted_at")
@@ -119,7 +136,6 @@ class TaskAdmin(admin.ModelAdmin):
         ("name", "epic"),
         "description",
         ("branch_name", "org_config_name"),
-        "commits",
         "origin_sha",
         "metecho_commits",
         "has_unmerged_commits",
@@ -130,12 +146,18 @@ class TaskAdmin(admin.ModelAdmin):
         ("assigned_dev", "assigned_qa"),
     )
     readonly_fields = (
-        "commits",
         "reviewers",
         "get_all_users_in_commits",
     )
 
 
+@admin.register(Commit)
+class CommitAdmin(admin.ModelAdmin):
+    list_display = ("sha", "task", "author_username", "timestamp")
+    search_fields = ("sha", "author_username")
+    raw_id_fields = ("task",)
+
+
 @admin.register(TaskSlug)
 class TaskSlugAdmin(admin.ModelAdmin):
     list_display = ("slug", "parent")
@@ -1,4 +1,7 @@
+from functools import lru_cache
+
 import bleach
+from django.conf import settings
 from markdown import markdown
 from rest_framework.fields import CharField
 from sfdo_template_helpers.fields.markdown import MarkdownFieldMixin
@@ -9,6 +12,17 @@ ALLOWED_ATTRS = MarkdownFieldMixin.allowed_attrs
 
 
 def render_clean_markdown(raw_md):
+    if not raw_md:
+        return ""
+    return _render_clean_markdown(raw_md)
+
+
+# The same descriptions are rendered over and over (every list page, every
+# websocket push to every subscriber), so keep the most recently used
+# renderings around. Keyed on the text itself, so an edit is a cache miss
+# and stale entries just age out:
+@lru_cache(maxsize=settings.MARKDOWN_CACHE_SIZE)
+def _render_clean_markdown(raw_md):
     return bleach.clean(markdown(raw_md), tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRS)
 
 
@@ -36,9 +36,7 @@ class NoGitHubTokenError(Exception):
 
 def gh_given_user(user):
     try:
-        token = (
-            user.socialaccount_set.get(provider="github").socialtoken_set.get().token
-        )
+        token = user.gh_token
     except (ObjectDoesNotExist, MultipleObjectsReturned):
         raise NoGitHubTokenError
     return login(token=token)
@@ -54,6 +52,15 @@ def gh_as_app(repo_owner, repo_name):
     return gh
 
 
+def get_rate_limit_remaining(repo_owner, repo_name):
+    """
+    How many core API calls the app installation for the repo has left in
+    the current rate-limit window. Asking doesn't count against the limit.
+    """
+    gh = gh_as_app(repo_owner, repo_name)
+    return gh.rate_limit()["resources"]["core"]["remaining"]
+
+
 def get_all_org_repos(user):
     gh = gh_given_user(user)
     repos = set(
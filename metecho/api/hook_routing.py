@@ -0,0 +1,155 @@
+"""
+Resolve the repository, branch and PR number in a GitHub hook payload to
+the Metecho objects it concerns.
+
+Resolved primary keys are cached. A cached key is always re-checked
+against the row it points to, so a stale entry (an object renamed,
+re-pointed at another PR, or deleted) only costs the fallback query.
+Giving a PR number to a Task or Epic can make it outrank a cached match
+that still checks out, so that invalidates the PR's cached targets.
+Misses are not cached.
+"""
+
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from .models import Epic, Project, Task
+
+CACHE_PREFIX = "metecho:hook_routing"
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _cached(key, *, fetch, is_match, resolve):
+    key = f"{CACHE_PREFIX}:{key}"
+    cached = cache.get(key)
+    if cached is not None:
+        obj = fetch(cached)
+        if obj is not None and is_match(obj):
+            return obj
+    obj = resolve()
+    if obj is not None:
+        cache.set(key, _cache_value(obj), CACHE_TIMEOUT)
+    return obj
+
+
+def _cache_value(obj):
+    return (obj.__class__.__name__, str(obj.pk))
+
+
+def _fetch(cached):
+    model_name, pk = cached
+    model = {"Project": Project, "Epic": Epic, "Task": Task}[model_name]
+    qs = model.objects.filter(pk=pk)
+    if model is Task:
+        qs = qs.select_related("epic")
+    return qs.first()
+
+
+def get_project(repo_id):
+    return _cached(
+        f"project:{repo_id}",
+        fetch=_fetch,
+        is_match=lambda project: project.repo_id == repo_id,
+        resolve=lambda: Project.objects.filter(repo_id=repo_id).first(),
+    )
+
+
+def _by_pr_then_branch(qs, pr_number, branch_q):
+    # One query for "matches the PR number, or failing that the branches",
+    # preferring the former:
+    return (
+        qs.filter(Q(pr_number=pr_number) | branch_q)
+        .annotate(
+            by_branch=Case(
+                When(pr_number=pr_number, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        )
+        .order_by("by_branch", "-created_at")
+        .first()
+    )
+
+
+def _resolve_pr_target(project, pr_number, head_ref, base_ref):
+    # The precedence is: task by PR, epic by PR, task by branch, epic by
+    # branch.
+    task = _by_pr_then_branch(
+        Task.objects.filter(epic__project=project).select_related("epic"),
+        pr_number,
+        Q(branch_name=head_ref, epic__branch_name=base_ref),
+    )
+    if task is not None and task.pr_number == pr_number:
+        return task
+    epic = _by_pr_then_branch(
+        Epic.objects.filter(project=project),
+        pr_number,
+        Q(branch_name=head_ref, project__branch_name=base_ref),
+    )
+    if epic is not None and epic.pr_number == pr_number:
+        return epic
+    return task or epic
+
+
+def _is_pr_target(obj, project, pr_number, head_ref, base_ref):
+    if isinstance(obj, Task):
+        epic = obj.epic
+        return epic.project_id == project.id and (
+            obj.pr_number == pr_number
+            or (obj.branch_name == head_ref and epic.branch_name == base_ref)
+        )
+    return obj.project_id == project.id and (
+        obj.pr_number == pr_number
+        or (obj.branch_name == head_ref and project.branch_name == base_ref)
+    )
+
+
+def _pr_generation_key(project_id, pr_number):
+    return f"{CACHE_PREFIX}:pr_generation:{project_id}:{pr_number}"
+
+
+def _pr_generation(project_id, pr_number):
+    key = _pr_generation_key(project_id, pr_number)
+    generation = cache.get(key)
+    if generation is None:
+        # Never fall back to a fixed value, which could bring back entries
+        # from before an invalidation:
+        cache.add(key, uuid4().hex, CACHE_TIMEOUT)
+        generation = cache.get(key)
+    return generation
+
+
+def forget_pr_targets(project_id, pr_number):
+    """
+    Invalidate the cached targets of a PR, when a Task or Epic in the
+    project is given its number.
+    """
+    cache.set(_pr_generation_key(project_id, pr_number), uuid4().hex, CACHE_TIMEOUT)
+
+
+def get_pr_target(project, *, pr_number, head_ref, base_ref):
+    """
+    The Task or Epic that a pull request is for, if any.
+    """
+    generation = _pr_generation(project.id, pr_number)
+    return _cached(
+        f"pr:{project.id}:{pr_number}:{generation}:{head_ref}:{base_ref}",
+        fetch=_fetch,
+        is_match=lambda obj: _is_pr_target(obj, project, pr_number, head_ref, base_ref),
+        resolve=lambda: _resolve_pr_target(project, pr_number, head_ref, base_ref),
+    )
+
+
+def get_task_for_pr(project, pr_number):
+    return _cached(
+        f"task_pr:{project.id}:{pr_number}",
+        fetch=_fetch,
+        is_match=lambda task: (
+            task.epic.project_id == project.id and task.pr_number == pr_number
+        ),
+        resolve=lambda: Task.objects.filter(epic__project=project, pr_number=pr_number)
+        .select_related("epic")
+        .first(),
+    )
@@ -3,15 +3,23 @@ import logging
 from rest_framework import serializers
 from rest_framework.exceptions import NotFound
 
-from .models import Epic, Project, Task
+from . import hook_routing
+from .gh import normalize_commit
 
 logger = logging.getLogger(__name__)
 
 
 class HookSerializerMixin:
     def get_matching_project(self):
-        repo_id = self.validated_data["repository"]["id"]
-        return Project.objects.filter(repo_id=repo_id).first()
+        return hook_routing.get_project(self.validated_data["repository"]["id"])
+
+    @classmethod
+    def process_hooks(cls, serializers):
+        """
+        Process several validated hooks of this type, in order.
+        """
+        for serializer in serializers:
+            serializer.process_hook()
 
 
 class HookRepositorySerializer(HookSerializerMixin, serializers.Serializer):
@@ -57,22 +65,11 @@ class PrHookSerializer(HookSerializerMixin, serializers.Serializer):
         return self._is_closed() and self.validated_data["pull_request"]["merged"]
 
     def _get_matching_instance(self, project):
-        pr_number = self.validated_data["number"]
-        pr_head_ref = self.validated_data["pull_request"]["head"]["ref"]
-        pr_base_ref = self.validated_data["pull_request"]["base"]["ref"]
-        return (
-            Task.objects.filter(epic__project=project, pr_number=pr_number).first()
-            or Epic.objects.filter(project=project, pr_number=pr_number).first()
-            or Task.objects.filter(
-                epic__project=project,
-                branch_name=pr_head_ref,
-                epic__branch_name=pr_base_ref,
-            ).first()
-            or Epic.objects.filter(
-                project=project,
-                branch_name=pr_head_ref,
-                project__branch_name=pr_base_ref,
-            ).first()
+        return hook_routing.get_pr_target(
+            project,
+            pr_number=self.validated_data["number"],
+            head_ref=self.validated_data["pull_request"]["head"]["ref"],
+            base_ref=self.validated_data["pull_request"]["base"]["ref"],
         )
 
     def process_hook(self):
@@ -120,32 +117,53 @@ class PushHookSerializer(HookSerializerMixin, serializers.Serializer):
     def _is_force_push(self):
         return self.validated_data["forced"]
 
-    def process_hook(self):
-        project = self.get_matching_project()
-        if not project:
-            raise NotFound("No matching project.")
-
+    def get_branch_name(self):
         ref = self.validated_data["ref"]
         branch_prefix = "refs/heads/"
         tag_prefix = "refs/tags/"
         if ref.startswith(tag_prefix):
             logger.info(f"Received a tag ref, aborting: {ref}")
-            return
+            return None
         if not ref.startswith(branch_prefix):
             logger.warn(f"Received an invalid ref: {ref}")
-            return
+            return None
         prefix_len = len(branch_prefix)
-        ref = ref[prefix_len:]
+        return ref[prefix_len:]
 
-        if self._is_force_push():
+    def get_normalized_commits(self):
+        sender = self.validated_data["sender"]
+        return [
+            normalize_commit(commit, sender=sender)
+            for commit in self.validated_data["commits"]
+        ]
+
+    def process_hook(self):
+        self.process_hooks([self])
+
+    @classmethod
+    def process_hooks(cls, serializers):
+        """
+        Apply a run of pushes to the same branch as one update. If any of
+        them was forced we resync the whole branch from GitHub, which picks
+        up the later pushes too; otherwise their commits are concatenated.
+        """
+        first = serializers[0]
+        project = first.get_matching_project()
+        if not project:
+            raise NotFound("No matching project.")
+        ref = first.get_branch_name()
+        if ref is None:
+            return
+
+        if any(serializer._is_force_push() for serializer in serializers):
             project.queue_refresh_commits(ref=ref, originating_user_id=None)
         else:
-            sender = self.validated_data["sender"]
-            project.add_commits(
-                commits=self.validated_data["commits"],
-                ref=ref,
-                sender=sender,
-            )
+            commits = [
+                commit
+                for serializer in serializers
+                for commit in serializer.get_normalized_commits()
+            ]
+            project.add_commits(commits=commits, ref=ref)
 
 
 class PrReviewHookSerializer(HookSerializerMixin, serializers.Serializer):
@@ -159,9 +177,17 @@ class PrReviewHookSerializer(HookSerializerMixin, serializers.Serializer):
             raise NotFound("No matching project.")
 
         pr_number = self.validated_data["pull_request"]["number"]
-        task = Task.objects.filter(epic__project=project, pr_number=pr_number).first()
+        task = hook_routing.get_task_for_pr(project, pr_number)
         if not task:
             raise NotFound("No matching task.")
 
         sender = self.validated_data["sender"]
         task.add_reviewer(sender)
+
+
+# To support the various formats that GitHub can post to the hook endpoint:
+HOOK_SERIALIZERS = {
+    "push": PushHookSerializer,
+    "pull_request": PrHookSerializer,
+    "pull_request_review": PrReviewHookSerializer,
+}
@@ -5,16 +5,17 @@ from datetime import timedelta
 from pathlib import Path
 
 import requests
-from asgiref.sync import async_to_sync
 from bs4 import BeautifulSoup
 from django.conf import settings
 from django.db import transaction
+from django.db.models import Q
 from django.template.loader import render_to_string
 from django.utils.text import slugify
 from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _
 from django_rq import get_scheduler, job
 from github3.exceptions import NotFoundError
+from rest_framework.exceptions import NotFound
 
 from .email_utils import get_user_facing_url
 from .gh import (
@@ -25,8 +26,8 @@ from .gh import (
     normalize_commit,
     try_to_make_branch,
 )
-from .models import TASK_REVIEW_STATUS
-from .push import report_scratch_org_error
+from .model_mixins import flush_notifications
+from .models import HOOK_EVENT_STATUSES, TASK_REVIEW_STATUS
 from .sf_org_changes import (
     commit_changes_to_github,
     compare_revisions,
@@ -158,6 +159,175 @@ def alert_user_about_expiring_org(*, org, days):
         user.notify(subject, body)
 
 
+def alert_users_about_expiring_orgs():
+    """
+    Periodic sweeper that alerts the owners of scratch orgs that will
+    expire within the next ``DAYS_BEFORE_ORG_EXPIRY_TO_ALERT`` days.
+
+    Each batch of due orgs is claimed (by setting ``expiry_alerted_at``)
+    under a row lock before it is processed, so overlapping sweeps never
+    alert about the same org twice.
+    """
+    from .models import ScratchOrg
+
+    days = settings.DAYS_BEFORE_ORG_EXPIRY_TO_ALERT
+    batch_size = settings.ORG_EXPIRY_SWEEP_BATCH_SIZE
+    current_time = now()
+    due_orgs = ScratchOrg.objects.active().filter(
+        is_created=True,
+        expiry_alerted_at__isnull=True,
+        expires_at__gt=current_time,
+        expires_at__lte=current_time + timedelta(days=days),
+    )
+    while True:
+        with transaction.atomic():
+            batch = list(
+                due_orgs.order_by("expires_at").select_for_update(skip_locked=True)[
+                    :batch_size
+                ]
+            )
+            ScratchOrg.objects.filter(id__in=[org.id for org in batch]).update(
+                expiry_alerted_at=current_time
+            )
+        if not batch:
+            break
+        for org in batch:
+            try:
+                alert_user_about_expiring_org(org=org, days=days)
+            except Exception:
+                tb = traceback.format_exc()
+                logger.error(tb)
+
+
+alert_users_about_expiring_orgs_job = job(alert_users_about_expiring_orgs)
+
+
+def _claim_hook_event_batch(repo_id):
+    """
+    Claims the oldest waiting event for the repo, along with the waiting
+    pushes to the same branch that follow it before any other kind of
+    event, so that bursts of pushes (rebases, bots) are applied as one
+    update without reordering them around the repo's other events.
+
+    The repo's waiting events are locked while they are claimed, so no two
+    jobs can claim the same event. (Locked rows aren't skipped, as that
+    could claim a later event ahead of an earlier one.)
+    """
+    from .models import GitHubHookEvent
+
+    with transaction.atomic():
+        waiting = list(
+            GitHubHookEvent.objects.filter(
+                repo_id=repo_id, status=HOOK_EVENT_STATUSES.Received
+            )
+            .order_by("created_at", "id")
+            .select_for_update()
+        )
+        if not waiting:
+            return []
+        head, *rest = waiting
+        batch = [head]
+        if head.event == "push" and head.ref:
+            for event in rest:
+                if event.event != "push":
+                    break
+                if event.ref == head.ref:
+                    batch.append(event)
+        GitHubHookEvent.objects.filter(id__in=[event.id for event in batch]).update(
+            status=HOOK_EVENT_STATUSES.Processing
+        )
+    return batch
+
+
+def _apply_hook_event_batch(batch):
+    from .hook_serializers import HOOK_SERIALIZERS
+
+    serializer_class = HOOK_SERIALIZERS[batch[0].event]
+    try:
+        serializers = [serializer_class(data=event.payload) for event in batch]
+        for serializer in serializers:
+            serializer.is_valid(raise_exception=True)
+        serializer_class.process_hooks(serializers)
+    except NotFound as e:
+        # The project or task went away since we accepted the hook:
+        for event in batch:
+            event.finalize_process(
+                status=HOOK_EVENT_STATUSES.Ignored, error=str(e.detail)
+            )
+    except Exception:
+        error = traceback.format_exc()
+        for event in batch:
+            event.finalize_process(status=HOOK_EVENT_STATUSES.Failed, error=error)
+        raise
+    else:
+        for event in batch:
+            event.finalize_process(status=HOOK_EVENT_STATUSES.Processed)
+
+
+def process_hook_event(hook_event):
+    """
+    Apply a stored GitHub webhook delivery, after any of the repo's
+    deliveries that are still waiting from before it, so each repo's
+    events are applied in the order received.
+
+    A push is first left to wait out ``HOOK_PUSH_COALESCE_SECONDS``, by
+    rescheduling this job rather than blocking the worker, so that further
+    pushes to the branch can be applied along with it.
+    """
+    from .models import GitHubHookEvent
+
+    hook_event.refresh_from_db()
+    if hook_event.status != HOOK_EVENT_STATUSES.Received:
+        # Already applied as part of an earlier batch:
+        return
+
+    if hook_event.event == "push" and hook_event.ref:
+        window = timedelta(seconds=settings.HOOK_PUSH_COALESCE_SECONDS)
+        wait = hook_event.created_at + window - now()
+        if wait > timedelta(0):
+            get_scheduler(settings.HOOK_EVENT_QUEUE).enqueue_in(
+                wait, process_hook_event, hook_event
+            )
+            return
+
+    if hook_event.repo_id is None:
+        claimed = GitHubHookEvent.objects.filter(
+            id=hook_event.id, status=HOOK_EVENT_STATUSES.Received
+        ).update(status=HOOK_EVENT_STATUSES.Processing)
+        if claimed:
+            _apply_hook_event_batch([hook_event])
+        return
+    while True:
+        batch = _claim_hook_event_batch(hook_event.repo_id)
+        if not batch:
+            return
+        if hook_event in batch:
+            _apply_hook_event_batch(batch)
+            return
+        try:
+            _apply_hook_event_batch(batch)
+        except Exception:
+            # It's marked as failed; that shouldn't hold up the later events:
+            tb = traceback.format_exc()
+            logger.error(tb)
+
+
+process_hook_event_job = job(settings.HOOK_EVENT_QUEUE)(process_hook_event)
+
+
+def prune_hook_events():
+    from .models import GitHubHookEvent
+
+    cutoff = now() - timedelta(days=settings.HOOK_EVENT_RETENTION_DAYS)
+    GitHubHookEvent.objects.filter(
+        status__in=(HOOK_EVENT_STATUSES.Processed, HOOK_EVENT_STATUSES.Ignored),
+        created_at__lt=cutoff,
+    ).delete()
+
+
+prune_hook_events_job = job(prune_hook_events)
+
+
 def _create_org_and_run_flow(
     scratch_org,
     *,
@@ -208,6 +378,7 @@ def _create_org_and_run_flow(
     }
     flow_name = scratch_org_config.setup_flow or cases[scratch_org.task.org_config_name]
 
+    flush_notifications()
     try:
         run_flow(
             cci=cci,
@@ -232,16 +403,9 @@ def _create_org_and_run_flow(
         originating_user_id=originating_user_id,
     )
     scratch_org.is_created = True
-
-    scheduler = get_scheduler("default")
-    days = settings.DAYS_BEFORE_ORG_EXPIRY_TO_ALERT
-    before_expiry = scratch_org.expires_at - timedelta(days=days)
-    scratch_org.expiry_job_id = scheduler.enqueue_at(
-        before_expiry,
-        alert_user_about_expiring_org,
-        org=scratch_org,
-        days=days,
-    ).id
+    # A (re)created org has a fresh expiry date, so it should be alerted
+    # about again by the expiry sweeper:
+    scratch_org.expiry_alerted_at = None
 
 
 def create_branches_on_github_then_create_scratch_org(
@@ -261,6 +425,8 @@ def create_branches_on_github_then_create_scratch_org(
             task=task,
             originating_user_id=originating_user_id,
         )
+        # Provisioning takes minutes, so send the branch updates now:
+        flush_notifications()
         with local_github_checkout(user, repo_id, commit_ish) as repo_root:
             _create_org_and_run_flow(
                 scratch_org,
@@ -501,8 +667,7 @@ def delete_scratch_org(scratch_org, *, originating_user_id):
                 originating_user_id=originating_user_id,
             )
         scratch_org.save()
-        async_to_sync(report_scratch_org_error)(
-            scratch_org,
+        scratch_org.notify_scratch_org_error(
             error=e,
             type_="SCRATCH_ORG_DELETE_FAILED",
             originating_user_id=originating_user_id,
@@ -515,6 +680,25 @@ def delete_scratch_org(scratch_org, *, originating_user_id):
 delete_scratch_org_job = job(delete_scratch_org)
 
 
+def delete_scratch_orgs(scratch_org_ids, *, originating_user_id):
+    """
+    Tear down a batch of scratch orgs queued by a bulk soft-delete. A
+    failure is reported for its org by ``delete_scratch_org``, and logged,
+    but doesn't stop the rest of the batch.
+    """
+    from .models import ScratchOrg
+
+    for scratch_org in ScratchOrg.objects.filter(id__in=scratch_org_ids):
+        try:
+            delete_scratch_org(scratch_org, originating_user_id=originating_user_id)
+        except Exception:
+            tb = traceback.format_exc()
+            logger.error(f"Failed to delete scratch org {scratch_org.id}:\n{tb}")
+
+
+delete_scratch_orgs_job = job(delete_scratch_orgs)
+
+
 def refresh_github_repositories_for_user(user):
     user.refresh_repositories()
 
@@ -522,6 +706,31 @@ def refresh_github_repositories_for_user(user):
 refresh_github_repositories_for_user_job = job(refresh_github_repositories_for_user)
 
 
+def populate_repo_id(project):
+    if not project.populate_repo_id():
+        logger.warning(f"Could not look up the repo_id for {project}.")
+
+
+populate_repo_id_job = job(populate_repo_id)
+
+
+def populate_repo_ids():
+    """
+    Periodic sweeper that looks up the GitHub repo_id of every project
+    still missing one and due for another attempt.
+    """
+    from .models import Project
+
+    projects = Project.objects.filter(repo_id__isnull=True).filter(
+        Q(repo_id_retry_at__isnull=True) | Q(repo_id_retry_at__lte=now())
+    )
+    for project in projects:
+        populate_repo_id(project)
+
+
+populate_repo_ids_job = job(populate_repo_ids)
+
+
 def get_social_image(*, project):
     try:
         repo = get_repo_info(
@@ -542,6 +751,29 @@ def get_social_image(*, project):
 get_social_image_job = job(get_social_image)
 
 
+def _commits_until_origins(repo, branch_name, origin_shas, *, limit=1000):
+    """
+    Page lazily through the commits on ``branch_name``, newest first,
+    stopping as soon as every sha in ``origin_shas`` has been seen (or
+    after ``limit`` commits).
+
+    Returns the commits seen, and a dict of sha to position in that list.
+    """
+    commits = []
+    positions = {}
+    remaining = set(origin_shas)
+    if not remaining:
+        return commits, positions
+    head_sha = repo.branch(branch_name).latest_sha()
+    for commit in repo.commits(head_sha, number=limit, per_page=100):
+        positions[commit.sha] = len(commits)
+        commits.append(commit)
+        remaining.discard(commit.sha)
+        if not remaining:
+            break
+    return commits, positions
+
+
 # This avoids partially-applied saving:
 @transaction.atomic
 def refresh_commits(*, project, branch_name, originating_user_id):
@@ -549,25 +781,43 @@ def refresh_commits(*, project, branch_name, originating_user_id):
     This should only run when we're notified of a force-commit. It's the
     nuclear option.
     """
-    from .models import Task
+    from .models import Commit, Task
 
     repo = get_repo_info(
         None, repo_owner=project.repo_owner, repo_name=project.repo_name
     )
-    # We get this as a GitHubIterator, but we want to slice it later, so
-    # we will convert it to a list.
+    tasks = list(
+        Task.objects.filter(epic__project=project, branch_name=branch_name)
+        .exclude(origin_sha="")
+        .select_related("epic__project")
+    )
     # We limit it to 1000 commits to avoid hammering the API, and on the
     # assumption that we will find the origin of the task branch within
     # that limit.
-    commits = list(repo.commits(repo.branch(branch_name).latest_sha(), number=1000))
-
-    tasks = Task.objects.filter(epic__project=project, branch_name=branch_name)
+    commits, positions = _commits_until_origins(
+        repo, branch_name, {task.origin_sha for task in tasks}
+    )
+    normalized_commits = [normalize_commit(commit) for commit in commits]
+    # Tasks on the same branch share a (base, head) pair, so only compare
+    # each pair once:
+    ahead_by_cache = {}
     for task in tasks:
-        origin_sha_index = [commit.sha for commit in commits].index(task.origin_sha)
-        task.commits = [
-            normalize_commit(commit) for commit in commits[:origin_sha_index]
-        ]
-        task.update_has_unmerged_commits()
+        origin_sha_index = positions.get(task.origin_sha)
+        if origin_sha_index is None:
+            logger.warning(
+                f"Origin commit {task.origin_sha} of task {task.id} not found "
+                f"on branch {branch_name}; skipping."
+            )
+            continue
+        task.commits.all().delete()
+        # Rows are ordered newest (highest id) first, so insert oldest first:
+        Commit.objects.bulk_create(
+            [
+                Commit.from_normalized(task, commit)
+                for commit in reversed(normalized_commits[:origin_sha_index])
+            ]
+        )
+        task.update_has_unmerged_commits(repo=repo, ahead_by_cache=ahead_by_cache)
         task.update_review_valid()
         task.finalize_task_update(originating_user_id=originating_user_id)
 
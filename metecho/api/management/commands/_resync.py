@@ -0,0 +1,164 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from ...gh import get_rate_limit_remaining
+
+
+class ResyncCommand(BaseCommand):
+    """
+    Shared options and machinery for the resync_all_gh_* commands.
+
+    Subclasses implement ``get_work``, returning an iterable of
+    ``(key, project, callable)`` triples. Each callable is run on a bounded
+    thread pool; once it has succeeded its key is written to the checkpoint
+    file (if any), so an interrupted run can be resumed without redoing work.
+
+    Before each group, the GitHub rate limit of its project's app
+    installation is checked; once it is below ``--min-rate-limit`` no more
+    groups are started, and the run can be resumed from the checkpoint
+    after the limit resets.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--project",
+            action="append",
+            default=[],
+            metavar="OWNER/NAME",
+            help="Only resync this project. May be given more than once.",
+        )
+        parser.add_argument(
+            "--since",
+            help="Only resync objects edited on or after this ISO date(time).",
+        )
+        parser.add_argument(
+            "--max-workers",
+            type=int,
+            default=4,
+            help=(
+                "How many groups to resync concurrently. Each one makes its own "
+                "GitHub API calls, so keep this within your rate-limit budget."
+            ),
+        )
+        parser.add_argument(
+            "--min-rate-limit",
+            type=int,
+            default=500,
+            help=(
+                "Stop starting groups once a project's GitHub rate limit has fewer "
+                "calls than this left. Groups already running may still use up to "
+                "what one group needs each."
+            ),
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="File recording finished groups; existing entries are skipped.",
+        )
+
+    def parse_since(self, value):
+        if not value:
+            return None
+        since = parse_datetime(value)
+        if since is None:
+            date = parse_date(value)
+            if date is None:
+                raise CommandError(f"Invalid --since value: {value}")
+            since = datetime.combine(date, datetime.min.time())
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        return since
+
+    def filter_projects(self, queryset, projects, *, prefix=""):
+        """
+        Limit ``queryset`` to the given "owner/name" projects; ``prefix``
+        is the lookup path from the queryset's model to Project.
+        """
+        if not projects:
+            return queryset
+        condition = Q()
+        for project in projects:
+            try:
+                repo_owner, repo_name = project.split("/")
+            except ValueError:
+                raise CommandError(f"Invalid --project value: {project}")
+            condition |= Q(
+                **{f"{prefix}repo_owner": repo_owner, f"{prefix}repo_name": repo_name}
+            )
+        return queryset.filter(condition)
+
+    def get_work(self, *, projects, since):  # pragma: nocover
+        raise NotImplementedError
+
+    def _load_checkpoint(self, path):
+        if path and path.exists():
+            return set(json.loads(path.read_text()))
+        return set()
+
+    def _run(self, project, func):
+        """
+        Runs ``func`` unless the rate-limit floor has been reached, and
+        returns whether it ran.
+        """
+        try:
+            if self._stopped.is_set():
+                return False
+            remaining = get_rate_limit_remaining(project.repo_owner, project.repo_name)
+            if remaining < self._min_rate_limit:
+                self._stopped.set()
+                return False
+            func()
+            return True
+        finally:
+            # Each worker thread gets its own database connection:
+            connections.close_all()
+
+    def handle(self, *args, **options):
+        checkpoint = Path(options["checkpoint"]) if options["checkpoint"] else None
+        done = self._load_checkpoint(checkpoint)
+        work = [
+            (key, project, func)
+            for key, project, func in self.get_work(
+                projects=options["project"], since=self.parse_since(options["since"])
+            )
+            if key not in done
+        ]
+        self._min_rate_limit = options["min_rate_limit"]
+        self._stopped = threading.Event()
+        failed = 0
+        skipped = 0
+        with ThreadPoolExecutor(max_workers=options["max_workers"]) as executor:
+            futures = {
+                executor.submit(self._run, project, func): key
+                for key, project, func in work
+            }
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    ran = future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"Failed to resync {key}: {e}")
+                    continue
+                if not ran:
+                    skipped += 1
+                    continue
+                done.add(key)
+                if checkpoint:
+                    checkpoint.write_text(json.dumps(sorted(done)))
+        if skipped:
+            self.stderr.write(
+                f"Stopped at the GitHub rate-limit floor of {self._min_rate_limit} "
+                f"calls; {skipped} groups were not resynced."
+            )
+        self.stdout.write(
+            f"Resynced {len(work) - failed - skipped} of {len(work)} groups."
+        )
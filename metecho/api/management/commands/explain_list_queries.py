@@ -0,0 +1,79 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ...models import EPIC_STATUS_RANKS, EPIC_STATUSES, Epic, Project, Task
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill a throwaway transaction with --rows epics and as many tasks, "
+        "then print the plans of the epic/task list and name-uniqueness "
+        "queries, to check that they use the active-row indexes at scale. "
+        "Nothing is kept."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100_000)
+
+    def handle(self, *args, rows, **options):
+        with transaction.atomic():
+            self.explain_all(rows)
+            transaction.set_rollback(True)
+
+    def explain_all(self, rows):
+        now = timezone.now()
+        project = Project.objects.bulk_create(
+            [
+                Project(
+                    name="Index benchmark",
+                    repo_owner="index-benchmark",
+                    repo_name="index-benchmark",
+                )
+            ]
+        )[0]
+        statuses = list(EPIC_STATUS_RANKS)
+        Epic.objects.bulk_create(
+            (
+                Epic(
+                    project=project,
+                    name=f"Epic {i}",
+                    status=statuses[i % len(statuses)],
+                    status_rank=EPIC_STATUS_RANKS[statuses[i % len(statuses)]],
+                    # Some soft-deleted rows for the partial indexes to skip:
+                    deleted_at=now if i % 10 == 0 else None,
+                )
+                for i in range(rows)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        epic = Epic.objects.active().filter(project=project).first()
+        Task.objects.bulk_create(
+            (
+                Task(
+                    epic=epic,
+                    name=f"Task {i}",
+                    org_config_name="dev",
+                    deleted_at=now if i % 10 == 0 else None,
+                )
+                for i in range(rows)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE api_epic, api_task")
+
+        epics = Epic.objects.active().filter(project=project)
+        tasks = Task.objects.active().filter(epic=epic)
+        queries = {
+            "Epic list": epics.order_by("status_rank", "-created_at", "name")[:50],
+            "Epic name check": epics.filter(name__iexact="EPIC 12345")[:1],
+            "Task list": tasks.order_by("-created_at", "name")[:50],
+            "Task name check": tasks.filter(name__iexact="TASK 12345")[:1],
+            "Epic status": epics.filter(status=EPIC_STATUSES.Review)[:50],
+        }
+        for label, queryset in queries.items():
+            self.stdout.write(f"== {label}")
+            self.stdout.write(queryset.explain(analyze=True))
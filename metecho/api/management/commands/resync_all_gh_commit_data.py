@@ -1,17 +1,35 @@
-from django.core.management.base import BaseCommand
+from functools import partial
+
 from django.db.models import Q
 
 from ...jobs import refresh_commits
-from ...models import Task
+from ...models import Project, Task
+from ._resync import ResyncCommand
 
 
-class Command(BaseCommand):
+class Command(ResyncCommand):
     help = "Remove and resync all stored commits from GitHub."
 
-    def handle(self, *args, **options):
-        for task in Task.objects.exclude(Q(branch_name="") | Q(origin_sha="")):
-            refresh_commits(
-                project=task.epic.project,
-                branch_name=task.branch_name,
-                originating_user_id=None,
+    def get_work(self, *, projects, since):
+        tasks = Task.objects.exclude(Q(branch_name="") | Q(origin_sha=""))
+        tasks = self.filter_projects(tasks, projects, prefix="epic__project__")
+        if since:
+            tasks = tasks.filter(edited_at__gte=since)
+        # Sibling tasks on the same branch share their commits, so we only
+        # need to fetch them once per (project, branch):
+        groups = (
+            tasks.order_by().values_list("epic__project_id", "branch_name").distinct()
+        )
+        groups = list(groups)
+        project_map = Project.objects.in_bulk({project_id for project_id, _ in groups})
+        for project_id, branch_name in groups:
+            yield (
+                f"{project_id}:{branch_name}",
+                project_map[project_id],
+                partial(
+                    refresh_commits,
+                    project=project_map[project_id],
+                    branch_name=branch_name,
+                    originating_user_id=None,
+                ),
             )
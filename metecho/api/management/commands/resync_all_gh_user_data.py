@@ -1,12 +1,20 @@
-from django.core.management.base import BaseCommand
+from functools import partial
 
 from ...jobs import populate_github_users
 from ...models import Project
+from ._resync import ResyncCommand
 
 
-class Command(BaseCommand):
+class Command(ResyncCommand):
     help = "Reset and resync all stored collaborator lists from GitHub."
 
-    def handle(self, *args, **options):
-        for project in Project.objects.all():
-            populate_github_users(project, originating_user_id=None)
+    def get_work(self, *, projects, since):
+        queryset = self.filter_projects(Project.objects.all(), projects)
+        if since:
+            queryset = queryset.filter(edited_at__gte=since)
+        for project in queryset:
+            yield (
+                str(project.id),
+                project,
+                partial(populate_github_users, project, originating_user_id=None),
+            )
@@ -0,0 +1,62 @@
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django_rq import get_scheduler
+
+from ...jobs import (
+    alert_users_about_expiring_orgs_job,
+    populate_repo_ids_job,
+    prune_hook_events_job,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "(Re-)register the periodic jobs with rq-scheduler. Safe to run on "
+        "every deploy or scheduler start."
+    )
+
+    # Jobs that periodic ones have replaced, and which may still be
+    # sitting in the scheduler from before the upgrade:
+    legacy_func_names = ("metecho.api.jobs.alert_user_about_expiring_org",)
+
+    def get_periodic_jobs(self):
+        # (job id, callable, interval in seconds)
+        return [
+            (
+                "metecho-alert-users-about-expiring-orgs",
+                alert_users_about_expiring_orgs_job,
+                settings.ORG_EXPIRY_SWEEP_MINUTES * 60,
+            ),
+            ("metecho-prune-hook-events", prune_hook_events_job, 24 * 60 * 60),
+            (
+                "metecho-populate-repo-ids",
+                populate_repo_ids_job,
+                settings.REPO_ID_SWEEP_MINUTES * 60,
+            ),
+        ]
+
+    def cancel_legacy_jobs(self, scheduler):
+        cancelled = 0
+        for job in scheduler.get_jobs():
+            if job.func_name in self.legacy_func_names:
+                scheduler.cancel(job)
+                cancelled += 1
+        if cancelled:
+            self.stdout.write(f"Cancelled {cancelled} legacy jobs.")
+
+    def handle(self, *args, **options):
+        scheduler = get_scheduler("default")
+        self.cancel_legacy_jobs(scheduler)
+        for job_id, func, interval in self.get_periodic_jobs():
+            if job_id in scheduler:
+                scheduler.cancel(job_id)
+            scheduler.schedule(
+                scheduled_time=datetime.utcnow(),
+                func=func,
+                interval=interval,
+                repeat=None,
+                id=job_id,
+            )
+            self.stdout.write(f"Scheduled {job_id} every {interval} seconds.")
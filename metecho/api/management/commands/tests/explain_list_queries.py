@@ -0,0 +1,18 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from ....models import Epic, Project
+
+
+@pytest.mark.django_db
+def test_explain_list_queries():
+    out = StringIO()
+    call_command("explain_list_queries", rows=20, stdout=out)
+
+    assert "== Epic list" in out.getvalue()
+    assert "== Task name check" in out.getvalue()
+    # It all gets rolled back:
+    assert not Project.objects.exists()
+    assert not Epic.objects.exists()
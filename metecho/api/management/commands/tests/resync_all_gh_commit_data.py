@@ -1,14 +1,25 @@
+import json
 from contextlib import ExitStack
+from io import StringIO
 from unittest.mock import patch
 
 import pytest
 from django.core.management import call_command
 
+module_name = "metecho.api.management.commands.resync_all_gh_commit_data"
+
+
+@pytest.fixture(autouse=True)
+def get_rate_limit_remaining():
+    with patch(
+        "metecho.api.management.commands._resync.get_rate_limit_remaining",
+        return_value=5000,
+    ) as get_rate_limit_remaining:
+        yield get_rate_limit_remaining
+
 
 @pytest.mark.django_db
 def test_resync_all_gh_commit_data(task_factory):
-    module_name = "metecho.api.management.commands.resync_all_gh_commit_data"
-
     with ExitStack() as stack:
         refresh_commits = stack.enter_context(patch(f"{module_name}.refresh_commits"))
         task_factory(
@@ -19,3 +30,88 @@ def test_resync_all_gh_commit_data(task_factory):
         call_command("resync_all_gh_commit_data")
 
         assert refresh_commits.called
+
+
+@pytest.mark.django_db
+def test_resync_all_gh_commit_data__grouped(task_factory, epic_factory):
+    epic = epic_factory()
+    task_factory(epic=epic, branch_name="test", origin_sha="1234567sha")
+    task_factory(epic=epic, branch_name="test", origin_sha="7654321sha")
+    with patch(f"{module_name}.refresh_commits") as refresh_commits:
+        call_command("resync_all_gh_commit_data")
+
+        assert refresh_commits.call_count == 1
+
+
+@pytest.mark.django_db
+def test_resync_all_gh_commit_data__project_filter(task_factory):
+    task = task_factory(branch_name="test", origin_sha="1234567sha")
+    task_factory(branch_name="other", origin_sha="1234567sha")
+    project = task.epic.project
+    with patch(f"{module_name}.refresh_commits") as refresh_commits:
+        call_command(
+            "resync_all_gh_commit_data",
+            "--project",
+            f"{project.repo_owner}/{project.repo_name}",
+        )
+
+        refresh_commits.assert_called_once_with(
+            project=project, branch_name="test", originating_user_id=None
+        )
+
+
+@pytest.mark.django_db
+def test_resync_all_gh_commit_data__checkpoint(task_factory, tmp_path):
+    done = task_factory(branch_name="done", origin_sha="1234567sha")
+    task_factory(branch_name="todo", origin_sha="1234567sha")
+    checkpoint = tmp_path / "checkpoint.json"
+    checkpoint.write_text(json.dumps([f"{done.epic.project.id}:done"]))
+    with patch(f"{module_name}.refresh_commits") as refresh_commits:
+        call_command("resync_all_gh_commit_data", "--checkpoint", str(checkpoint))
+
+        assert refresh_commits.call_count == 1
+        assert refresh_commits.call_args.kwargs["branch_name"] == "todo"
+    assert len(json.loads(checkpoint.read_text())) == 2
+
+
+@pytest.mark.django_db
+def test_resync_all_gh_commit_data__error(task_factory, tmp_path):
+    task_factory(branch_name="test", origin_sha="1234567sha")
+    checkpoint = tmp_path / "checkpoint.json"
+    err = StringIO()
+    with patch(f"{module_name}.refresh_commits") as refresh_commits:
+        refresh_commits.side_effect = Exception("Oops")
+        call_command(
+            "resync_all_gh_commit_data",
+            "--checkpoint",
+            str(checkpoint),
+            stderr=err,
+        )
+
+    assert "Oops" in err.getvalue()
+    assert not checkpoint.exists()
+
+
+@pytest.mark.django_db
+def test_resync_all_gh_commit_data__rate_limit(
+    task_factory, tmp_path, get_rate_limit_remaining
+):
+    task_factory(branch_name="test", origin_sha="1234567sha")
+    task_factory(branch_name="other", origin_sha="1234567sha")
+    get_rate_limit_remaining.return_value = 99
+    checkpoint = tmp_path / "checkpoint.json"
+    err = StringIO()
+    with patch(f"{module_name}.refresh_commits") as refresh_commits:
+        call_command(
+            "resync_all_gh_commit_data",
+            "--min-rate-limit",
+            "100",
+            "--checkpoint",
+            str(checkpoint),
+            stderr=err,
+        )
+
+    assert not refresh_commits.called
+    assert get_rate_limit_remaining.called
+    assert "rate-limit floor of 100" in err.getvalue()
+    assert not checkpoint.exists()
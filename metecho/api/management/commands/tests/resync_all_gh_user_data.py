@@ -1,14 +1,26 @@
 from contextlib import ExitStack
+from datetime import timedelta
 from unittest.mock import patch
 
 import pytest
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
+
+module_name = "metecho.api.management.commands.resync_all_gh_user_data"
+
+
+@pytest.fixture(autouse=True)
+def get_rate_limit_remaining():
+    with patch(
+        "metecho.api.management.commands._resync.get_rate_limit_remaining",
+        return_value=5000,
+    ) as get_rate_limit_remaining:
+        yield get_rate_limit_remaining
 
 
 @pytest.mark.django_db
 def test_resync_all_gh_user_data(project_factory):
-    module_name = "metecho.api.management.commands.resync_all_gh_user_data"
-
     with ExitStack() as stack:
         project_factory(repo_id=1234)
 
@@ -18,3 +30,24 @@ def test_resync_all_gh_user_data(project_factory):
         call_command("resync_all_gh_user_data")
 
         assert populate_github_users.called
+
+
+@pytest.mark.django_db
+def test_resync_all_gh_user_data__since(project_factory):
+    project = project_factory(repo_id=1234)
+    with patch(f"{module_name}.populate_github_users") as populate_github_users:
+        tomorrow = (timezone.now() + timedelta(days=1)).date().isoformat()
+        call_command("resync_all_gh_user_data", "--since", tomorrow)
+
+        assert not populate_github_users.called
+
+        call_command("resync_all_gh_user_data", "--since", "2020-01-01")
+
+        populate_github_users.assert_called_once_with(project, originating_user_id=None)
+
+
+def test_resync_all_gh_user_data__bad_args():
+    with pytest.raises(CommandError):
+        call_command("resync_all_gh_user_data", "--since", "yesterday")
+    with pytest.raises(CommandError):
+        call_command("resync_all_gh_user_data", "--project", "no-slash")
@@ -0,0 +1,36 @@
+from io import StringIO
+from unittest.mock import MagicMock, patch
+
+from django.core.management import call_command
+
+
+def test_schedule_periodic_jobs():
+    module_name = "metecho.api.management.commands.schedule_periodic_jobs"
+    scheduler = MagicMock(**{"__contains__.return_value": True})
+    with patch(f"{module_name}.get_scheduler", return_value=scheduler):
+        out = StringIO()
+        call_command("schedule_periodic_jobs", stdout=out)
+
+    assert scheduler.cancel.called
+    assert scheduler.schedule.called
+    assert "metecho-alert-users-about-expiring-orgs" in out.getvalue()
+    assert "metecho-prune-hook-events" in out.getvalue()
+    assert "metecho-populate-repo-ids" in out.getvalue()
+
+
+def test_schedule_periodic_jobs__cancels_legacy_jobs():
+    module_name = "metecho.api.management.commands.schedule_periodic_jobs"
+    legacy_job = MagicMock(func_name="metecho.api.jobs.alert_user_about_expiring_org")
+    other_job = MagicMock(func_name="metecho.api.jobs.prune_hook_events")
+    scheduler = MagicMock(
+        **{
+            "__contains__.return_value": False,
+            "get_jobs.return_value": [legacy_job, other_job],
+        }
+    )
+    with patch(f"{module_name}.get_scheduler", return_value=scheduler):
+        out = StringIO()
+        call_command("schedule_periodic_jobs", stdout=out)
+
+    scheduler.cancel.assert_called_once_with(legacy_job)
+    assert "Cancelled 1 legacy jobs." in out.getvalue()
@@ -0,0 +1,47 @@
+# Generated by Django 3.1.5 on 2026-10-19 12:00
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils.timezone import now
+
+
+def hand_over_to_sweeper(apps, schema_editor):
+    """
+    Marks the orgs whose alert is already due (and so has been sent, or is
+    about to be) as alerted, so the sweeper doesn't alert about them a
+    second time. The per-org expiry jobs themselves are cancelled by the
+    schedule_periodic_jobs command, so migrating doesn't need Redis.
+    """
+    ScratchOrg = apps.get_model("api", "ScratchOrg")
+    current_time = now()
+    days = settings.DAYS_BEFORE_ORG_EXPIRY_TO_ALERT
+    ScratchOrg.objects.filter(
+        expires_at__lte=current_time + timedelta(days=days)
+    ).update(expiry_alerted_at=current_time)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0090_rename_repository_project"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scratchorg",
+            name="expiry_alerted_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="scratchorg",
+            name="expires_at",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(hand_over_to_sweeper, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="scratchorg",
+            name="expiry_job_id",
+        ),
+    ]
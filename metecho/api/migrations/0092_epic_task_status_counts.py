@@ -0,0 +1,53 @@
+# Generated by Django 3.1.5 on 2026-10-19 12:00
+
+from django.db import migrations, models
+from django.db.models import Count
+
+COUNT_FIELDS = {
+    "Planned": "planned_task_count",
+    "In progress": "in_progress_task_count",
+    "Completed": "completed_task_count",
+}
+
+
+def count_task_statuses(apps, schema_editor):
+    Epic = apps.get_model("api", "Epic")
+    Task = apps.get_model("api", "Task")
+    counts = (
+        Task.objects.filter(deleted_at__isnull=True)
+        .order_by()
+        .values("epic_id", "status")
+        .annotate(count=Count("id"))
+    )
+    by_epic = {}
+    for row in counts:
+        field = COUNT_FIELDS[row["status"]]
+        by_epic.setdefault(row["epic_id"], {})[field] = row["count"]
+    for epic_id, values in by_epic.items():
+        Epic.objects.filter(id=epic_id).update(**values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0091_scratchorg_expiry_sweeper"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="epic",
+            name="completed_task_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="epic",
+            name="in_progress_task_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="epic",
+            name="planned_task_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_task_statuses, migrations.RunPython.noop),
+    ]
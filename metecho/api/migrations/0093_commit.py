@@ -0,0 +1,119 @@
+# Generated by Django 3.1.5 on 2026-10-19 12:00
+
+import django.db.models.deletion
+import sfdo_template_helpers.fields.string
+from django.db import migrations, models
+from django.utils.dateparse import parse_datetime
+
+
+def copy_commits_to_table(apps, schema_editor):
+    Task = apps.get_model("api", "Task")
+    Commit = apps.get_model("api", "Commit")
+    tasks = Task.objects.exclude(legacy_commits=[]).values_list("id", "legacy_commits")
+    for task_id, commits in tasks.iterator():
+        rows = []
+        seen = set()
+        # The JSON list is newest first, and rows are ordered by
+        # descending id, so insert oldest first:
+        for commit in reversed(commits):
+            sha = commit.get("id")
+            if not sha or sha in seen:
+                continue
+            seen.add(sha)
+            author = commit.get("author") or {}
+            rows.append(
+                Commit(
+                    task_id=task_id,
+                    sha=sha,
+                    timestamp=parse_datetime(commit.get("timestamp") or "") or None,
+                    author_name=author.get("name") or "",
+                    author_email=author.get("email") or "",
+                    author_username=author.get("username") or "",
+                    author_avatar_url=author.get("avatar_url") or "",
+                    message=commit.get("message") or "",
+                    url=commit.get("url") or "",
+                )
+            )
+        Commit.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0092_epic_task_status_counts"),
+    ]
+
+    operations = [
+        # Move the JSON field out of the way first, so the foreign key can
+        # be created with its final related_name. Altering it after the
+        # data copy would drop and re-create its constraint, which
+        # Postgres refuses while the inserts' constraint checks are pending.
+        migrations.RenameField(
+            model_name="task",
+            old_name="commits",
+            new_name="legacy_commits",
+        ),
+        migrations.CreateModel(
+            name="Commit",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("sha", models.CharField(max_length=64)),
+                ("timestamp", models.DateTimeField(blank=True, null=True)),
+                (
+                    "author_name",
+                    sfdo_template_helpers.fields.string.StringField(
+                        blank=True, default=""
+                    ),
+                ),
+                (
+                    "author_email",
+                    sfdo_template_helpers.fields.string.StringField(
+                        blank=True, default=""
+                    ),
+                ),
+                (
+                    "author_username",
+                    models.CharField(
+                        blank=True, db_index=True, default="", max_length=64
+                    ),
+                ),
+                ("author_avatar_url", models.URLField(blank=True, default="")),
+                ("message", models.TextField(blank=True, default="")),
+                ("url", models.URLField(blank=True, default="")),
+                (
+                    "task",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="commits",
+                        to="api.task",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("-id",),
+            },
+        ),
+        migrations.AddIndex(
+            model_name="commit",
+            index=models.Index(fields=["task", "-id"], name="commit_task_newest_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="commit",
+            constraint=models.UniqueConstraint(
+                fields=("task", "sha"), name="unique_commit_sha_per_task"
+            ),
+        ),
+        migrations.RunPython(copy_commits_to_table, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="task",
+            name="legacy_commits",
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 3.1.5 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0093_commit"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GitHubHookEvent",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("edited_at", models.DateTimeField(auto_now=True)),
+                ("delivery_id", models.CharField(max_length=64, unique=True)),
+                ("event", models.CharField(max_length=64)),
+                (
+                    "repo_id",
+                    models.IntegerField(blank=True, db_index=True, null=True),
+                ),
+                ("payload", models.JSONField(default=dict)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("Received", "Received"),
+                            ("Processed", "Processed"),
+                            ("Ignored", "Ignored"),
+                            ("Failed", "Failed"),
+                        ],
+                        db_index=True,
+                        default="Received",
+                        max_length=16,
+                    ),
+                ),
+                ("processed_at", models.DateTimeField(blank=True, null=True)),
+                ("error", models.TextField(blank=True, default="")),
+            ],
+            options={
+                "verbose_name": "GitHub hook event",
+                "ordering": ("-created_at",),
+            },
+        ),
+    ]
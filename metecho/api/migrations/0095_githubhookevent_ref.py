@@ -0,0 +1,24 @@
+# Generated by Django 3.1.5 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0094_githubhookevent"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="githubhookevent",
+            name="ref",
+            field=models.CharField(blank=True, default="", max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name="githubhookevent",
+            index=models.Index(
+                fields=["repo_id", "ref", "status"], name="hook_event_branch_idx"
+            ),
+        ),
+    ]
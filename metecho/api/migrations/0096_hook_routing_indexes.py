@@ -0,0 +1,35 @@
+# Generated by Django 3.1.5 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0095_githubhookevent_ref"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="epic",
+            index=models.Index(
+                fields=["project", "pr_number"], name="epic_project_pr_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="epic",
+            index=models.Index(
+                fields=["project", "branch_name"], name="epic_project_branch_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(fields=["pr_number", "epic"], name="task_pr_epic_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["branch_name", "epic"], name="task_branch_epic_idx"
+            ),
+        ),
+    ]
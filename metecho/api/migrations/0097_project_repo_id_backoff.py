@@ -0,0 +1,23 @@
+# Generated by Django 3.1.5 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0096_hook_routing_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="project",
+            name="repo_id_failures",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="project",
+            name="repo_id_retry_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
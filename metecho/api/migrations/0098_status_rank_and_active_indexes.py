@@ -0,0 +1,64 @@
+# Generated by Django 3.1.5 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+EPIC_STATUS_RANKS = {"Review": 0, "In progress": 1, "Planned": 2, "Merged": 3}
+
+
+def populate_status_rank(apps, schema_editor):
+    Epic = apps.get_model("api", "Epic")
+    for status, rank in EPIC_STATUS_RANKS.items():
+        Epic.objects.filter(status=status).update(status_rank=rank)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0097_project_repo_id_backoff"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="epic",
+            name="status_rank",
+            field=models.PositiveSmallIntegerField(default=2),
+        ),
+        migrations.RunPython(populate_status_rank, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="epic",
+            index=models.Index(
+                condition=models.Q(deleted_at__isnull=True),
+                fields=["project", "status_rank", "-created_at", "name"],
+                name="epic_active_list_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                condition=models.Q(deleted_at__isnull=True),
+                fields=["epic", "-created_at", "name"],
+                name="task_active_list_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="scratchorg",
+            index=models.Index(
+                condition=models.Q(deleted_at__isnull=True),
+                fields=["task", "org_type"],
+                name="scratchorg_active_task_idx",
+            ),
+        ),
+        # For the case-insensitive name uniqueness checks (name__iexact,
+        # which compiles to UPPER("name"::text)). Not UNIQUE, as existing
+        # data was never constrained:
+        migrations.RunSQL(
+            'CREATE INDEX "epic_active_name_ci_idx" ON "api_epic" '
+            '("project_id", UPPER("name"::text)) WHERE "deleted_at" IS NULL;',
+            'DROP INDEX "epic_active_name_ci_idx";',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX "task_active_name_ci_idx" ON "api_task" '
+            '("epic_id", UPPER("name"::text)) WHERE "deleted_at" IS NULL;',
+            'DROP INDEX "task_active_name_ci_idx";',
+        ),
+    ]
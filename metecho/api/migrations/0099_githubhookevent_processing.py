@@ -0,0 +1,29 @@
+# Generated by Django 3.1.5 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0098_status_rank_and_active_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="githubhookevent",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("Received", "Received"),
+                    ("Processing", "Processing"),
+                    ("Processed", "Processed"),
+                    ("Ignored", "Ignored"),
+                    ("Failed", "Failed"),
+                ],
+                db_index=True,
+                default="Received",
+                max_length=16,
+            ),
+        ),
+    ]
@@ -1,14 +1,20 @@
+import logging
 import re
 from collections import namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
 
 from asgiref.sync import async_to_sync
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from hashid_field import HashidAutoField
 
 from . import push
 from .gh import get_repo_info
 
+logger = logging.getLogger(__name__)
+
 Request = namedtuple("Request", "user")
 
 
@@ -48,14 +54,133 @@ class PopulateRepoIdMixin:
         return self.repo_id
 
 
+class PrefetchedSlugsMixin:
+    """
+    Serve ``slug`` and ``old_slugs`` from prefetched ``slugs`` when the
+    instance was loaded with ``prefetch_related("slugs")``, rather than
+    querying for each of them. Must come before SlugMixin in the bases.
+    """
+
+    def _get_prefetched_slugs(self):
+        return getattr(self, "_prefetched_objects_cache", {}).get("slugs")
+
+    @property
+    def slug(self):
+        slugs = self._get_prefetched_slugs()
+        if slugs is None:
+            return super().slug
+        return next((slug.slug for slug in slugs if slug.is_active), None)
+
+    @property
+    def old_slugs(self):
+        slugs = self._get_prefetched_slugs()
+        if slugs is None:
+            return super().old_slugs
+        return [slug.slug for slug in slugs if not slug.is_active]
+
+
+class NotificationBatch:
+    """
+    Push messages collected by batched_notifications, keeping only the
+    last message of each type about each instance.
+    """
+
+    def __init__(self):
+        self.messages = {}
+        self.is_open = True
+
+    def add_all(self, messages):
+        if not self.is_open:
+            # Their transaction committed after the batch was sent:
+            send_push_messages(messages)
+            return
+        for message in messages:
+            key = (message.model_name, message.id, message.for_list)
+            key += (message.message["type"],)
+            self.messages.pop(key, None)
+            self.messages[key] = message
+
+    def flush(self):
+        """
+        Sends the messages collected so far, and keeps collecting.
+        """
+        if not self.messages:
+            return
+        messages = list(self.messages.values())
+        self.messages = {}
+        try:
+            send_push_messages(messages)
+        except Exception:
+            # This runs on the way out of the block (or in the middle of
+            # it), where raising would mask whatever the block raised (or
+            # abort it):
+            logger.exception("Failed to send push messages")
+
+    def send(self):
+        self.is_open = False
+        self.flush()
+
+
+_notification_batch = ContextVar("notification_batch", default=None)
+
+
+@contextmanager
+def batched_notifications():
+    """
+    Sends the push messages queued in the block all at once, at its end.
+    Jobs run in one of these (see metecho.rq_worker).
+    """
+    batch = NotificationBatch()
+    token = _notification_batch.set(batch)
+    try:
+        yield batch
+    finally:
+        _notification_batch.reset(token)
+        batch.send()
+
+
+def flush_notifications():
+    """
+    Sends the push messages batched so far, if in a batched_notifications
+    block. Long jobs call this before their slow steps, so that clients
+    hear about the progress up to then without waiting for the job to end.
+    """
+    batch = _notification_batch.get()
+    if batch is not None:
+        batch.flush()
+
+
+def send_push_messages(messages):
+    async_to_sync(push.push_messages)(messages)
+
+
+def queue_push_messages(messages):
+    """
+    Sends push.PushMessages once the current transaction commits, so that
+    clients never hear of changes that are then rolled back; and in a
+    batched_notifications block, at the end of that.
+    """
+    batch = _notification_batch.get()
+    if batch is None:
+        transaction.on_commit(partial(send_push_messages, messages))
+    else:
+        transaction.on_commit(partial(batch.add_all, messages))
+
+
 class PushMixin:
     """
     Expects the following attributes:
         push_update_type: str
         push_error_type: str
         get_serialized_representation: Callable[self, Optional[User]]
+
+    And optionally:
+        push_audience_field: str, naming the field holding the id of the
+            one user who is shown more of the serialized representation
     """
 
+    push_audience_field = None
+
     def _create_context_with_user(self, user):
         return {
             "request": Request(user),
@@ -71,11 +196,11 @@ class PushMixin:
                 Optional["message"]: str  // error or other message
             }
         """
-        async_to_sync(push.push_message_about_instance)(
-            self,
-            {"type": type_, "payload": message},
-            for_list=for_list,
-        )
+        self._queue_push_message({"type": type_, "payload": message}, for_list)
+
+    def _queue_push_message(self, message, for_list=False):
+        if push.should_push_about_instance(self, message):
+            queue_push_messages([push.message_about_instance(self, message, for_list)])
 
     def notify_changed(
         self, *, type_=None, originating_user_id, message=None, for_list=False
@@ -107,12 +232,13 @@ class PushMixin:
         follows the pattern enough that I wanted to move it into this
         mixin.
         """
-        async_to_sync(push.report_scratch_org_error)(
-            self,
-            error=error,
-            type_=type_,
-            originating_user_id=originating_user_id,
-            message=message or {},
+        self._queue_push_message(
+            push.scratch_org_error_message(
+                error=error,
+                type_=type_,
+                originating_user_id=originating_user_id,
+                message=message or {},
+            )
         )
 
 
@@ -191,26 +317,41 @@ class SoftDeleteQuerySet(models.QuerySet):
 
     def notify_soft_deleted(self, *, preserve_sf_org=False):
         if self.model.__name__ == "ScratchOrg" and not preserve_sf_org:
-            for scratch_org in self:
-                try:
-                    scratch_org.queue_delete(originating_user_id=None)
-                except Exception:  # pragma: nocover
-                    # If there's a problem deleting it, it's probably
-                    # already been deleted.
-                    pass
+            try:
+                self.queue_delete(originating_user_id=None)
+            except Exception:  # pragma: nocover
+                # If there's a problem deleting them, they've probably
+                # already been deleted, but log it in case they haven't:
+                logger.exception("Failed to queue scratch orgs for deletion")
         else:
-            for instance in self:
-                instance.notify_changed(type_="SOFT_DELETE", originating_user_id=None)
+            message = {"type": "SOFT_DELETE", "payload": {"originating_user_id": None}}
+            model_name = self.model._meta.model_name
+            queue_push_messages(
+                [
+                    push.PushMessage(model_name, str(id_), message, False, None)
+                    for id_ in self.values_list("id", flat=True)
+                ]
+            )
 
     def delete(self, *, preserve_sf_org=False):
+        """
+        Soft-delete in bulk: one UPDATE and one batch of notifications per
+        level of the cascade, however many rows are involved.
+        """
         soft_delete_child_class = getattr(self.model, "soft_delete_child_class", None)
         if soft_delete_child_class:
             parent = camel_to_snake(self.model.__name__)
             soft_delete_child_class(None).objects.filter(
                 **{f"{parent}__in": self}
             ).delete(preserve_sf_org=preserve_sf_org)
-        self.active().notify_soft_deleted(preserve_sf_org=preserve_sf_org)
-        return self.active().update(deleted_at=timezone.now())
+        # Pin down the rows first, so we notify about exactly the rows we
+        # update:
+        ids = list(self.active().values_list("id", flat=True))
+        if not ids:
+            return 0
+        rows = self.model.objects.filter(id__in=ids)
+        rows.notify_soft_deleted(preserve_sf_org=preserve_sf_org)
+        return rows.update(deleted_at=timezone.now())
 
     def hard_delete(self):  # pragma: nocover
         return super().delete()
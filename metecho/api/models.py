@@ -3,8 +3,7 @@ import logging
 from datetime import timedelta
 
 from allauth.account.signals import user_logged_in
-from allauth.socialaccount.models import SocialAccount
-from asgiref.sync import async_to_sync
+from allauth.socialaccount.models import SocialAccount, SocialToken
 from cryptography.fernet import InvalidToken
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
@@ -13,10 +12,13 @@ from django.contrib.sites.models import Site
 from django.core.mail import send_mail
 from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.template.loader import render_to_string
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.utils.functional import cached_property
 from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
@@ -35,9 +37,12 @@ from .model_mixins import (
     CreatePrMixin,
     HashIdMixin,
     PopulateRepoIdMixin,
+    PrefetchedSlugsMixin,
     PushMixin,
     SoftDeleteMixin,
+    SoftDeleteQuerySet,
     TimestampsMixin,
+    queue_push_messages,
 )
 from .sf_run_flow import get_devhub_api, refresh_access_token
 from .validators import validate_unicode_branch
@@ -47,12 +52,28 @@ logger = logging.getLogger(__name__)
 ORG_TYPES = Choices("Production", "Scratch", "Sandbox", "Developer")
 SCRATCH_ORG_TYPES = Choices("Dev", "QA")
 EPIC_STATUSES = Choices("Planned", "In progress", "Review", "Merged")
+# The order epics are listed in, stored on each epic so it can be indexed:
+EPIC_STATUS_RANKS = {
+    EPIC_STATUSES.Review: 0,
+    EPIC_STATUSES["In progress"]: 1,
+    EPIC_STATUSES.Planned: 2,
+    EPIC_STATUSES.Merged: 3,
+}
 TASK_STATUSES = Choices(
     ("Planned", "Planned"), ("In progress", "In progress"), ("Completed", "Completed")
 )
 TASK_REVIEW_STATUS = Choices(
     ("Approved", "Approved"), ("Changes requested", "Changes requested")
 )
+HOOK_EVENT_STATUSES = Choices(
+    "Received", "Processing", "Processed", "Ignored", "Failed"
+)
+# Epic fields holding the number of active tasks in each status:
+TASK_STATUS_COUNT_FIELDS = {
+    TASK_STATUSES.Planned: "planned_task_count",
+    TASK_STATUSES["In progress"]: "in_progress_task_count",
+    TASK_STATUSES.Completed: "completed_task_count",
+}
 
 
 class SiteProfile(TranslatableModel):
@@ -64,8 +85,20 @@ class SiteProfile(TranslatableModel):
     )
 
 
+# Everything the User properties below read from allauth, in the order
+# they'd get it from .first():
+SOCIAL_ACCOUNT_PREFETCHES = (
+    models.Prefetch("socialaccount_set", queryset=SocialAccount.objects.order_by("pk")),
+    models.Prefetch(
+        "socialaccount_set__socialtoken_set",
+        queryset=SocialToken.objects.order_by("pk"),
+    ),
+)
+
+
 class UserQuerySet(models.QuerySet):
-    pass
+    def with_social_accounts(self):
+        return self.prefetch_related(*SOCIAL_ACCOUNT_PREFETCHES)
 
 
 class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
@@ -125,10 +158,40 @@ class User(HashIdMixin, AbstractUser):
 
     def notify_repositories_updated(self):
         message = {"type": "USER_REPOS_REFRESH"}
-        async_to_sync(push.push_message_about_instance)(self, message)
+        queue_push_messages([push.message_about_instance(self, message)])
 
     def invalidate_salesforce_credentials(self):
         self.socialaccount_set.filter(provider="salesforce").delete()
+        self.clear_social_accounts()
+
+    def __getstate__(self):
+        # The cached accounts hold plaintext tokens, so keep them out of
+        # pickles (like job arguments in Redis); whoever unpickles the user
+        # then loads current ones:
+        state = super().__getstate__().copy()
+        prefetched = state.get("_prefetched_objects_cache", {})
+        if "socialaccount_set" in prefetched:
+            state["_prefetched_objects_cache"] = {
+                key: value
+                for key, value in prefetched.items()
+                if key != "socialaccount_set"
+            }
+        return state
+
+    def _get_social_accounts(self, provider):
+        # Load the social accounts and their tokens once per instance (so
+        # once per request or job) and keep them in the prefetch cache,
+        # which refresh_from_db() and clear_social_accounts() clear:
+        if "socialaccount_set" not in getattr(self, "_prefetched_objects_cache", {}):
+            models.prefetch_related_objects([self], *SOCIAL_ACCOUNT_PREFETCHES)
+        return [
+            account
+            for account in self.socialaccount_set.all()
+            if account.provider == provider
+        ]
+
+    def clear_social_accounts(self):
+        getattr(self, "_prefetched_objects_cache", {}).pop("socialaccount_set", None)
 
     def subscribable_by(self, user):
         return self == user
@@ -212,7 +275,7 @@ class User(HashIdMixin, AbstractUser):
     @property
     def sf_token(self):
         try:
-            token = self.salesforce_account.socialtoken_set.first()
+            token = next(iter(self.salesforce_account.socialtoken_set.all()), None)
             return (
                 fernet_decrypt(token.token) if token.token else None,
                 token.token_secret if token.token_secret else None,
@@ -222,15 +285,27 @@ class User(HashIdMixin, AbstractUser):
 
     @property
     def gh_token(self):
-        return self.socialaccount_set.get(provider="github").socialtoken_set.get().token
+        # Same semantics as .get(): exactly one account with exactly one
+        # token.
+        accounts = self._get_social_accounts("github")
+        if not accounts:
+            raise SocialAccount.DoesNotExist
+        if len(accounts) > 1:
+            raise SocialAccount.MultipleObjectsReturned
+        tokens = list(accounts[0].socialtoken_set.all())
+        if not tokens:
+            raise SocialToken.DoesNotExist
+        if len(tokens) > 1:
+            raise SocialToken.MultipleObjectsReturned
+        return tokens[0].token
 
     @property
     def github_account(self):
-        return self.socialaccount_set.filter(provider="github").first()
+        return next(iter(self._get_social_accounts("github")), None)
 
     @property
     def salesforce_account(self):
-        return self.socialaccount_set.filter(provider="salesforce").first()
+        return next(iter(self._get_social_accounts("salesforce")), None)
 
     @property
     def valid_token_for(self):
@@ -266,11 +341,17 @@ class ProjectSlug(AbstractSlug):
     )
 
 
+class ProjectQuerySet(models.QuerySet):
+    def for_serialization(self):
+        return self.prefetch_related("slugs")
+
+
 class Project(
     PushMixin,
     PopulateRepoIdMixin,
     HashIdMixin,
     TimestampsMixin,
+    PrefetchedSlugsMixin,
     SlugMixin,
     models.Model,
 ):
@@ -296,10 +377,15 @@ class Project(
     #     "avatar_url": str,
     #   }
     github_users = models.JSONField(default=list, blank=True)
+    # Backoff state for looking up a missing repo_id on GitHub:
+    repo_id_failures = models.PositiveIntegerField(default=0)
+    repo_id_retry_at = models.DateTimeField(null=True, blank=True)
 
     slug_class = ProjectSlug
     tracker = FieldTracker(fields=["name"])
 
+    objects = ProjectQuerySet.as_manager()
+
     def subscribable_by(self, user):  # pragma: nocover
         return True
 
@@ -338,8 +424,47 @@ class Project(
 
             get_social_image_job.delay(project=self)
 
+        is_new = self.id is None
         super().save(*args, **kwargs)
 
+        if is_new and not self.repo_id:
+            # The job looks the project up by id, so wait until it exists:
+            transaction.on_commit(self.queue_populate_repo_id)
+
+    def queue_populate_repo_id(self):
+        from .jobs import populate_repo_id_job
+
+        populate_repo_id_job.delay(self)
+
+    def populate_repo_id(self):
+        """
+        Look up a missing repo_id, backing off exponentially (up to
+        ``REPO_ID_RETRY_MAX_MINUTES``) on each failed attempt, since a
+        misconfigured repository tends to stay that way for a while.
+        Returns whether the repo_id is now known.
+        """
+        try:
+            self.get_repo_id()
+        except Exception:
+            self.repo_id_failures += 1
+            delay = min(
+                settings.REPO_ID_RETRY_BASE_MINUTES * 2 ** (self.repo_id_failures - 1),
+                settings.REPO_ID_RETRY_MAX_MINUTES,
+            )
+            self.repo_id_retry_at = timezone.now() + timedelta(minutes=delay)
+            Project.objects.filter(id=self.id).update(
+                repo_id_failures=self.repo_id_failures,
+                repo_id_retry_at=self.repo_id_retry_at,
+            )
+            return False
+        if self.repo_id_failures:
+            self.repo_id_failures = 0
+            self.repo_id_retry_at = None
+            Project.objects.filter(id=self.id).update(
+                repo_id_failures=0, repo_id_retry_at=None
+            )
+        return True
+
     def finalize_get_social_image(self):
         self.save()
         self.notify_changed(originating_user_id=None)
@@ -363,12 +488,70 @@ class Project(
             project=self, branch_name=ref, originating_user_id=originating_user_id
         )
 
-    @transaction.atomic
-    def add_commits(self, *, commits, ref, sender):
-        matching_tasks = Task.objects.filter(branch_name=ref, epic__project=self)
-
+    def add_commits(self, *, commits, ref):
+        """
+        ``commits`` are as returned by ``gh.normalize_commit``, oldest first.
+        """
+        # Not atomic: each task makes GitHub API calls, and we don't want to
+        # hold database locks across those.
+        matching_tasks = Task.objects.filter(
+            branch_name=ref, epic__project=self
+        ).select_related("epic__project")
+        # Tasks on the same branch share a (base, head) pair, so only compare
+        # each pair once:
+        ahead_by_cache = {}
         for task in matching_tasks:
-            task.add_commits(commits, sender)
+            task.add_commits(commits, ahead_by_cache=ahead_by_cache)
+
+
+class GitHubHookEvent(TimestampsMixin, models.Model):
+    """
+    A GitHub webhook delivery, stored as received so that it can be
+    processed outside of the request. GitHub redelivers with the same
+    delivery id, which makes storing it idempotent.
+    """
+
+    delivery_id = models.CharField(max_length=64, unique=True)
+    event = models.CharField(max_length=64)
+    repo_id = models.IntegerField(null=True, blank=True, db_index=True)
+    # For push events, so bursts of pushes to one branch can be coalesced:
+    ref = models.CharField(max_length=255, blank=True, default="")
+    payload = models.JSONField(default=dict)
+    status = models.CharField(
+        choices=HOOK_EVENT_STATUSES,
+        default=HOOK_EVENT_STATUSES.Received,
+        max_length=16,
+        db_index=True,
+    )
+    processed_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+
+    class Meta:
+        verbose_name = "GitHub hook event"
+        ordering = ("-created_at",)
+        indexes = [
+            models.Index(
+                fields=("repo_id", "ref", "status"), name="hook_event_branch_idx"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.event} {self.delivery_id}"
+
+    def queue_process(self):
+        from .jobs import process_hook_event_job
+
+        if self.status != HOOK_EVENT_STATUSES.Received:
+            self.status = HOOK_EVENT_STATUSES.Received
+            self.error = ""
+            self.save()
+        process_hook_event_job.delay(self)
+
+    def finalize_process(self, *, status, error=""):
+        self.status = status
+        self.error = error
+        self.processed_at = timezone.now()
+        self.save()
 
 
 class GitHubRepository(HashIdMixin, models.Model):
@@ -386,6 +569,37 @@ class GitHubRepository(HashIdMixin, models.Model):
         return self.repo_url
 
 
+class EpicQuerySet(SoftDeleteQuerySet):
+    def for_serialization(self):
+        return self.select_related("project").prefetch_related("slugs")
+
+    def recount_task_statuses(self):
+        """
+        Recompute the denormalized task status counts from scratch. These
+        are normally kept up to date incrementally by ``Task.save``.
+        """
+        counts = (
+            Task.objects.active()
+            .filter(epic__in=self)
+            .order_by()
+            .values("epic_id", "status")
+            .annotate(count=Count("id"))
+        )
+        by_epic = {}
+        for row in counts:
+            field = TASK_STATUS_COUNT_FIELDS[row["status"]]
+            by_epic.setdefault(row["epic_id"], {})[field] = row["count"]
+        # Epics with no active tasks left (e.g. after a bulk delete) are all
+        # zeroed in one go:
+        self.exclude(id__in=Task.objects.active().order_by().values("epic_id")).update(
+            **dict.fromkeys(TASK_STATUS_COUNT_FIELDS.values(), 0)
+        )
+        for epic_id, counted in by_epic.items():
+            values = dict.fromkeys(TASK_STATUS_COUNT_FIELDS.values(), 0)
+            values.update(counted)
+            Epic.objects.filter(id=epic_id).update(**values)
+
+
 class EpicSlug(AbstractSlug):
     parent = models.ForeignKey("Epic", on_delete=models.CASCADE, related_name="slugs")
 
@@ -395,6 +609,7 @@ class Epic(
     PushMixin,
     HashIdMixin,
     TimestampsMixin,
+    PrefetchedSlugsMixin,
     SlugMixin,
     SoftDeleteMixin,
     models.Model,
@@ -412,6 +627,9 @@ class Epic(
     status = models.CharField(
         max_length=20, choices=EPIC_STATUSES, default=EPIC_STATUSES.Planned
     )
+    status_rank = models.PositiveSmallIntegerField(
+        default=EPIC_STATUS_RANKS[EPIC_STATUSES.Planned]
+    )
     # List of {
     #   "key": str,
     #   "label": str,
@@ -420,6 +638,12 @@ class Epic(
     available_task_org_config_names = models.JSONField(default=list, blank=True)
     currently_fetching_org_config_names = models.BooleanField(default=False)
 
+    # Number of active tasks in each status, maintained by Task.save so
+    # that deriving the epic status doesn't need to scan the tasks:
+    planned_task_count = models.PositiveIntegerField(default=0)
+    in_progress_task_count = models.PositiveIntegerField(default=0)
+    completed_task_count = models.PositiveIntegerField(default=0)
+
     project = models.ForeignKey(Project, on_delete=models.PROTECT, related_name="epics")
 
     # User data is shaped like this:
@@ -430,15 +654,38 @@ class Epic(
     #   }
     github_users = models.JSONField(default=list, blank=True)
 
+    objects = EpicQuerySet.as_manager()
+
     slug_class = EpicSlug
-    tracker = FieldTracker(fields=["name"])
+    tracker = FieldTracker(fields=["name", "pr_number"])
 
     def __str__(self):
         return self.name
 
     def save(self, *args, **kwargs):
+        if not self._state.adding:
+            # The task counts are changed concurrently with atomic updates
+            # from Task.save, so we read them instead of overwriting them:
+            count_fields = TASK_STATUS_COUNT_FIELDS.values()
+            self.refresh_from_db(fields=count_fields)
+            if kwargs.get("update_fields") is None:
+                kwargs["update_fields"] = [
+                    field.name
+                    for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name not in count_fields
+                ]
         self.update_status()
-        return super().save(*args, **kwargs)
+        self.status_rank = EPIC_STATUS_RANKS[self.status]
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "status" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "status_rank"}
+        pr_number_changed = self.tracker.has_changed("pr_number")
+        ret = super().save(*args, **kwargs)
+        if pr_number_changed and self.pr_number is not None:
+            from .hook_routing import forget_pr_targets
+
+            forget_pr_targets(self.project_id, self.pr_number)
+        return ret
 
     def subscribable_by(self, user):  # pragma: nocover
         return True
@@ -483,17 +730,15 @@ class Epic(
 
         create_gh_branch_for_new_epic_job.delay(self, user=user)
 
+    @property
+    def task_count(self):
+        return sum(getattr(self, field) for field in TASK_STATUS_COUNT_FIELDS.values())
+
     def should_update_in_progress(self):
-        task_statuses = self.tasks.values_list("status", flat=True)
-        return task_statuses and any(
-            status != TASK_STATUSES.Planned for status in task_statuses
-        )
+        return bool(self.in_progress_task_count or self.completed_task_count)
 
     def should_update_review(self):
-        task_statuses = self.tasks.values_list("status", flat=True)
-        return task_statuses and all(
-            status == TASK_STATUSES.Completed for status in task_statuses
-        )
+        return bool(self.task_count) and self.completed_task_count == self.task_count
 
     def should_update_merged(self):
         return self.pr_is_merged
@@ -559,6 +804,44 @@ class Epic(
         # need to limit this constraint only to active Epics, and
         # make the name column case-insensitive:
         # unique_together = (("name", "project"),)
+        # That check is backed by a partial index on (project, UPPER(name))
+        # for active epics, created in migration 0098 as Django can't
+        # express it here.
+        indexes = [
+            # For routing GitHub hooks:
+            models.Index(fields=("project", "pr_number"), name="epic_project_pr_idx"),
+            models.Index(
+                fields=("project", "branch_name"), name="epic_project_branch_idx"
+            ),
+            # For listing a project's epics, in EpicViewSet's order:
+            models.Index(
+                fields=("project", "status_rank", "-created_at", "name"),
+                name="epic_active_list_idx",
+                condition=models.Q(deleted_at__isnull=True),
+            ),
+        ]
+
+
+class TaskQuerySet(SoftDeleteQuerySet):
+    def for_serialization(self):
+        return self.select_related("epic__project").prefetch_related(
+            "slugs",
+            models.Prefetch(
+                "commits",
+                queryset=Commit.objects.newest_per_task(
+                    settings.TASK_COMMITS_SUMMARY_SIZE
+                ),
+            ),
+        )
+
+    def delete(self, **kwargs):
+        # Bulk soft-deletes bypass Task.save, so recount the affected epics:
+        epic_ids = set(self.active().values_list("epic_id", flat=True))
+        ret = super().delete(**kwargs)
+        Epic.objects.filter(id__in=epic_ids).recount_task_statuses()
+        return ret
+
+    delete.queryset_only = True
 
 
 class TaskSlug(AbstractSlug):
@@ -570,6 +853,7 @@ class Task(
     PushMixin,
     HashIdMixin,
     TimestampsMixin,
+    PrefetchedSlugsMixin,
     SlugMixin,
     SoftDeleteMixin,
     models.Model,
@@ -582,7 +866,6 @@ class Task(
     )
     org_config_name = StringField()
 
-    commits = models.JSONField(default=list, blank=True)
     origin_sha = StringField(blank=True, default="")
     metecho_commits = models.JSONField(default=list, blank=True)
     has_unmerged_commits = models.BooleanField(default=False)
@@ -613,20 +896,78 @@ class Task(
     assigned_dev = models.JSONField(null=True, blank=True)
     assigned_qa = models.JSONField(null=True, blank=True)
 
+    objects = TaskQuerySet.as_manager()
+
     slug_class = TaskSlug
-    tracker = FieldTracker(fields=["name"])
+    tracker = FieldTracker(fields=["name", "pr_number"])
 
     def __str__(self):
         return self.name
 
     def save(self, *args, force_epic_save=False, **kwargs):
-        ret = super().save(*args, **kwargs)
-        # To update the epic's status:
-        if force_epic_save or self.epic.should_update_status():
+        update_fields = kwargs.get("update_fields")
+        with transaction.atomic():
+            old_count_field = new_count_field = None
+            if update_fields is None or {"status", "deleted_at"} & set(update_fields):
+                old_count_field, new_count_field = self._task_count_fields(
+                    update_fields
+                )
+            pr_number_changed = self.tracker.has_changed("pr_number")
+            ret = super().save(*args, **kwargs)
+            counts_changed = old_count_field != new_count_field
+            if counts_changed:
+                self._update_epic_task_counts(old_count_field, new_count_field)
+        if pr_number_changed and self.pr_number is not None:
+            from .hook_routing import forget_pr_targets
+
+            forget_pr_targets(self.epic.project_id, self.pr_number)
+        # To update the epic's status. Only the task counts feed into it,
+        # so we needn't even check unless they changed:
+        if force_epic_save or (counts_changed and self.epic.should_update_status()):
             self.epic.save()
             self.epic.notify_changed(originating_user_id=None)
         return ret
 
+    def _task_count_fields(self, update_fields):
+        """
+        Returns the epic task count fields this task is leaving and joining.
+
+        The old values are read from the locked row rather than from this
+        instance, so that saving a stale copy of the task, or two
+        concurrent saves, don't move it out of the same bucket twice.
+        """
+        status, deleted_at = self.status, self.deleted_at
+        old_count_field = None
+        if not self._state.adding:
+            row = (
+                Task.objects.select_for_update()
+                .filter(pk=self.pk)
+                .values_list("status", "deleted_at")
+                .first()
+            )
+            if row is not None:
+                old_status, old_deleted_at = row
+                if old_deleted_at is None:
+                    old_count_field = TASK_STATUS_COUNT_FIELDS[old_status]
+                if update_fields is not None:
+                    if "status" not in update_fields:
+                        status = old_status
+                    if "deleted_at" not in update_fields:
+                        deleted_at = old_deleted_at
+        new_count_field = None
+        if deleted_at is None:
+            new_count_field = TASK_STATUS_COUNT_FIELDS[status]
+        return old_count_field, new_count_field
+
+    def _update_epic_task_counts(self, old_count_field, new_count_field):
+        changes = {}
+        if old_count_field:
+            changes[old_count_field] = F(old_count_field) - 1
+        if new_count_field:
+            changes[new_count_field] = F(new_count_field) + 1
+        Epic.objects.filter(id=self.epic_id).update(**changes)
+        self.epic.refresh_from_db(fields=TASK_STATUS_COUNT_FIELDS.values())
+
     def subscribable_by(self, user):  # pragma: nocover
         return True
 
@@ -652,12 +993,24 @@ class Task(
 
     @property
     def get_all_users_in_commits(self):
-        ret = []
-        for commit in self.commits:
-            if commit["author"] not in ret:
-                ret.append(commit["author"])
-        ret.sort(key=lambda d: d["username"])
-        return ret
+        authors = (
+            self.commits.order_by("author_username", "author_name", "author_email")
+            .values_list(
+                "author_name", "author_email", "author_username", "author_avatar_url"
+            )
+            .distinct()
+        )
+        return [
+            {"name": name, "email": email, "username": username, "avatar_url": avatar}
+            for name, email, username, avatar in authors
+        ]
+
+    def get_latest_commit_sha(self):
+        """
+        The sha at the tip of the task branch, as far as we know: the newest
+        commit, or the origin sha if there are no commits yet.
+        """
+        return self.commits.values_list("sha", flat=True).first() or self.origin_sha
 
     def add_reviewer(self, user):
         if user not in self.reviewers:
@@ -703,27 +1056,33 @@ class Task(
     # end CreatePrMixin configuration
 
     def update_review_valid(self):
-        review_valid = bool(
-            self.review_sha
-            and self.commits
-            and self.review_sha == self.commits[0].get("id")
-        )
-        self.review_valid = review_valid
-
-    def update_has_unmerged_commits(self):
+        latest_sha = self.commits.values_list("sha", flat=True).first()
+        self.review_valid = bool(self.review_sha and self.review_sha == latest_sha)
+
+    def update_has_unmerged_commits(self, *, repo=None, ahead_by_cache=None):
+        """
+        Callers updating several tasks at once can pass in an already
+        fetched ``repo``, and a dict to use as ``ahead_by_cache``, which
+        is keyed on (base, head) so each pair is only compared once.
+        """
         base = self.get_base()
         head = self.get_head()
         if head and base:
-            repo = gh.get_repo_info(
-                None,
-                repo_owner=self.epic.project.repo_owner,
-                repo_name=self.epic.project.repo_name,
-            )
-            base_sha = repo.branch(base).commit.sha
-            head_sha = repo.branch(head).commit.sha
-            self.has_unmerged_commits = (
-                repo.compare_commits(base_sha, head_sha).ahead_by > 0
-            )
+            if ahead_by_cache is not None and (base, head) in ahead_by_cache:
+                ahead_by = ahead_by_cache[(base, head)]
+            else:
+                if repo is None:
+                    repo = gh.get_repo_info(
+                        None,
+                        repo_owner=self.epic.project.repo_owner,
+                        repo_name=self.epic.project.repo_name,
+                    )
+                base_sha = repo.branch(base).commit.sha
+                head_sha = repo.branch(head).commit.sha
+                ahead_by = repo.compare_commits(base_sha, head_sha).ahead_by
+                if ahead_by_cache is not None:
+                    ahead_by_cache[(base, head)] = ahead_by
+            self.has_unmerged_commits = ahead_by > 0
 
     def finalize_task_update(self, *, originating_user_id):
         self.save()
@@ -764,11 +1123,15 @@ class Task(
             self.save()
             self.notify_changed(originating_user_id=originating_user_id)
 
-    def add_commits(self, commits, sender):
-        self.commits = [
-            gh.normalize_commit(c, sender=sender) for c in commits
-        ] + self.commits
-        self.update_has_unmerged_commits()
+    def add_commits(self, commits, *, ahead_by_cache=None):
+        # Push payloads list commits oldest first, and we order newest
+        # (highest id) first, so insert them as given. Ignoring conflicts
+        # makes hook redeliveries harmless:
+        Commit.objects.bulk_create(
+            [Commit.from_normalized(self, commit) for commit in commits],
+            ignore_conflicts=True,
+        )
+        self.update_has_unmerged_commits(ahead_by_cache=ahead_by_cache)
         self.update_review_valid()
         self.save()
         # This comes from the GitHub hook, and so has no originating user:
@@ -827,6 +1190,132 @@ class Task(
         # need to limit this constraint only to active Tasks, and
         # make the name column case-insensitive:
         # unique_together = (("name", "epic"),)
+        # That check is backed by a partial index on (epic, UPPER(name))
+        # for active tasks, created in migration 0098 as Django can't
+        # express it here.
+        indexes = [
+            # For routing GitHub hooks:
+            models.Index(fields=("pr_number", "epic"), name="task_pr_epic_idx"),
+            models.Index(fields=("branch_name", "epic"), name="task_branch_epic_idx"),
+            # For listing an epic's tasks:
+            models.Index(
+                fields=("epic", "-created_at", "name"),
+                name="task_active_list_idx",
+                condition=models.Q(deleted_at__isnull=True),
+            ),
+        ]
+
+
+class CommitQuerySet(models.QuerySet):
+    def newest_per_task(self, count):
+        """
+        At most the ``count`` newest commits of each task, in one query;
+        for prefetching, where a plain slice isn't possible.
+        """
+        nth_newest = (
+            Commit.objects.filter(task_id=OuterRef("task_id"))
+            .order_by("-id")
+            .values("id")[count - 1 : count]
+        )
+        return self.filter(id__gte=Coalesce(Subquery(nth_newest), 0))
+
+
+class Commit(models.Model):
+    """
+    A commit on a Task's branch since its origin_sha. Rows are ordered
+    newest first by insertion, which mirrors the branch history rather
+    than the (author-supplied) timestamps.
+    """
+
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name="commits")
+    sha = models.CharField(max_length=64)
+    timestamp = models.DateTimeField(null=True, blank=True)
+    author_name = StringField(blank=True, default="")
+    author_email = StringField(blank=True, default="")
+    author_username = models.CharField(
+        max_length=64, blank=True, default="", db_index=True
+    )
+    author_avatar_url = models.URLField(blank=True, default="")
+    message = models.TextField(blank=True, default="")
+    url = models.URLField(blank=True, default="")
+
+    objects = CommitQuerySet.as_manager()
+
+    class Meta:
+        ordering = ("-id",)
+        constraints = [
+            models.UniqueConstraint(
+                fields=("task", "sha"), name="unique_commit_sha_per_task"
+            )
+        ]
+        indexes = [models.Index(fields=("task", "-id"), name="commit_task_newest_idx")]
+
+    def __str__(self):
+        return self.sha
+
+    @classmethod
+    def from_normalized(cls, task, commit):
+        """
+        Build an unsaved Commit from the output of ``gh.normalize_commit``.
+        """
+        author = commit["author"]
+        return cls(
+            task=task,
+            sha=commit["id"],
+            timestamp=parse_datetime(commit["timestamp"] or "") or None,
+            author_name=author["name"] or "",
+            author_email=author["email"] or "",
+            author_username=author["username"] or "",
+            author_avatar_url=author["avatar_url"] or "",
+            message=commit["message"] or "",
+            url=commit["url"] or "",
+        )
+
+
+class ScratchOrgQuerySet(SoftDeleteQuerySet):
+    def for_serialization(self):
+        # The serializer only needs the ids of the related rows:
+        return self
+
+    def queue_delete(self, *, originating_user_id):
+        """
+        Bulk version of ``ScratchOrg.queue_delete``: one UPDATE, one batch
+        of notifications and a single job to tear all the orgs down.
+        """
+        from .jobs import delete_scratch_orgs_job
+
+        ids = [str(id_) for id_ in self.values_list("id", flat=True)]
+        if not ids:
+            return
+        # As in ScratchOrg.queue_delete, only orgs that completed their
+        # initial flow run are notified about:
+        notify_ids = list(
+            self.filter(last_modified_at__isnull=False).values_list("id", flat=True)
+        )
+        if notify_ids:
+            # Bumping edited_at by hand, as update() skips auto_now, so that
+            # conditional GETs see the change:
+            current_time = timezone.now()
+            ScratchOrg.objects.filter(id__in=notify_ids).update(
+                delete_queued_at=current_time, edited_at=current_time
+            )
+            message = {
+                "type": ScratchOrg.push_update_type,
+                "payload": {"originating_user_id": originating_user_id},
+            }
+            queue_push_messages(
+                [
+                    push.PushMessage(
+                        ScratchOrg._meta.model_name,
+                        str(id_),
+                        message,
+                        False,
+                        current_time,
+                    )
+                    for id_ in notify_ids
+                ]
+            )
+        delete_scratch_orgs_job.delay(ids, originating_user_id=originating_user_id)
 
 
 class ScratchOrg(
@@ -836,7 +1325,8 @@ class ScratchOrg(
     org_type = StringField(choices=SCRATCH_ORG_TYPES)
     owner = models.ForeignKey(User, on_delete=models.PROTECT)
     last_modified_at = models.DateTimeField(null=True, blank=True)
-    expires_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    expiry_alerted_at = models.DateTimeField(null=True, blank=True)
     latest_commit = StringField(blank=True)
     latest_commit_url = models.URLField(blank=True)
     latest_commit_at = models.DateTimeField(null=True, blank=True)
@@ -858,7 +1348,6 @@ class ScratchOrg(
     is_created = models.BooleanField(default=False)
     config = models.JSONField(default=dict, encoder=DjangoJSONEncoder, blank=True)
     delete_queued_at = models.DateTimeField(null=True, blank=True)
-    expiry_job_id = StringField(blank=True, default="")
     owner_sf_username = StringField(blank=True)
     owner_gh_username = StringField(blank=True)
     has_been_visited = models.BooleanField(default=False)
@@ -867,6 +1356,18 @@ class ScratchOrg(
     )
     cci_log = models.TextField(blank=True)
 
+    objects = ScratchOrgQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # For a task's orgs, and the one-org-per-type check:
+            models.Index(
+                fields=("task", "org_type"),
+                name="scratchorg_active_task_idx",
+                condition=models.Q(deleted_at__isnull=True),
+            ),
+        ]
+
     def _build_message_extras(self):
         return {
             "model": {
@@ -915,6 +1416,9 @@ class ScratchOrg(
     push_update_type = "SCRATCH_ORG_UPDATE"
     push_error_type = "SCRATCH_ORG_ERROR"
 
+    # Only the owner is shown the changes and target directories:
+    push_audience_field = "owner_id"
+
     def get_serialized_representation(self, user):
         from .serializers import ScratchOrgSerializer
 
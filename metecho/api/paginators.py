@@ -1,5 +1,128 @@
+import json
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+
 from django.conf import settings
-from rest_framework.pagination import PageNumberPagination
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def _to_json(value):
+    if hasattr(value, "isoformat"):
+        # Not DjangoJSONEncoder, which truncates to milliseconds:
+        return value.isoformat()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    # e.g. Hashids:
+    return str(value)
+
+
+class KeysetPaginator(BasePagination):
+    """
+    Cursor pagination over the queryset's ordering, made unique by
+    appending the primary key. Each page is one range query from the last
+    row seen, so deep pages cost the same as the first, and rows created
+    or deleted between requests can't make later pages skip or repeat
+    rows. There is no total count.
+
+    The ordering fields must be non-null attributes of the objects (model
+    fields or annotations), not lookups across relations.
+    """
+
+    cursor_query_param = "cursor"
+    page_size = settings.API_PAGE_SIZE
+    invalid_cursor_message = _("Invalid cursor")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = self.get_ordering(queryset)
+        reverse, position = self.decode_cursor(request)
+
+        ordering = (
+            [self._flip(field) for field in self.ordering] if reverse else self.ordering
+        )
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+        page = list(queryset[: self.page_size + 1])
+        has_more = len(page) > self.page_size
+        page = page[: self.page_size]
+        if reverse:
+            page.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = position is not None, has_more
+        self.page = page
+        return page
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_next_link(self):
+        if not (self.has_next and self.page):
+            return None
+        return self.encode_cursor(reverse=False, obj=self.page[-1])
+
+    def get_previous_link(self):
+        if not (self.has_previous and self.page):
+            return None
+        return self.encode_cursor(reverse=True, obj=self.page[0])
+
+    def get_ordering(self, queryset):
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        if not {"pk", "-pk", "id", "-id"} & set(ordering):
+            ordering.append("pk")
+        return ordering
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+        try:
+            cursor = json.loads(b64decode(encoded.encode("ascii")).decode("utf-8"))
+            reverse, position = bool(cursor["r"]), cursor["p"]
+        except (BinasciiError, KeyError, TypeError, UnicodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return reverse, position
+
+    def encode_cursor(self, *, reverse, obj):
+        position = [
+            _to_json(getattr(obj, field.lstrip("-"))) for field in self.ordering
+        ]
+        encoded = b64encode(
+            json.dumps({"r": reverse, "p": position}).encode("utf-8")
+        ).decode("ascii")
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    @staticmethod
+    def _after(ordering, position):
+        # Rows strictly after ``position`` in ``ordering``, as the
+        # expansion of a row comparison: (a > x) OR (a = x AND b > y) ...
+        q = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            q |= Q(**equal, **{f"{name}__{lookup}": value})
+            equal[name] = value
+        return q
 
 
 class CustomPaginator(PageNumberPagination):
@@ -8,4 +131,35 @@ class CustomPaginator(PageNumberPagination):
     # While the front end gracefully ignores duplicate objects, this may result
     # in an object being missed (until a browser-reload) if it was added to an
     # already-fetched page.
+    #
+    # Clients that need consistent pages opt into keyset pagination by
+    # passing a ``cursor`` parameter (empty for the first page).
     page_size = settings.API_PAGE_SIZE
+    keyset = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if KeysetPaginator.cursor_query_param in request.query_params:
+            self.keyset = KeysetPaginator()
+            return self.keyset.paginate_queryset(queryset, request, view=view)
+        return super().paginate_queryset(queryset, request, view=view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class OptionalPaginator(CustomPaginator):
+    """
+    Paginates only when the client asks for it with ``page`` or ``cursor``,
+    for endpoints that the front end still loads whole.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if not (
+            self.page_query_param in params
+            or KeysetPaginator.cursor_query_param in params
+        ):
+            return None
+        return super().paginate_queryset(queryset, request, view=view)
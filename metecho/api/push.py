@@ -42,32 +42,99 @@ Websocket notifications you can subscribe to:
     scratchorg.list
         SCRATCH_ORG_RECREATE
 """
-from copy import deepcopy
+import asyncio
+from collections import namedtuple
+from uuid import uuid4
 
 from channels.layers import get_channel_layer
 from django.utils.translation import gettext_lazy as _
 
-from ..consumer_utils import get_set_message_semaphore
+from ..consumer_utils import get_set_message_semaphores
 from .constants import CHANNELS_GROUP_NAME, LIST
 
+# A message about one instance, as queued by the models (see
+# model_mixins.queue_push_messages and PushMixin._queue_push_message):
+PushMessage = namedtuple(
+    "PushMessage", ("model_name", "id", "message", "for_list", "edited_at")
+)
 
-async def push_message_about_instance(instance, message, for_list=False):
-    model_name = instance._meta.model_name
-    id_ = str(instance.id)
-    group_name = CHANNELS_GROUP_NAME.format(
-        model=model_name, id=LIST if for_list else id_
-    )
-    channel_layer = get_channel_layer()
 
-    new_message = deepcopy(message)
-    new_message["model_name"] = model_name
-    new_message["id"] = id_
-    sent_message = {"type": "notify", "content": new_message}
+def should_push_about_instance(instance, message):
     not_deleted = getattr(instance, "deleted_at", None) is None
     message_about_delete = "DELETE" in message["type"] or "REMOVE" in message["type"]
-    semaphore_clear = await get_set_message_semaphore(channel_layer, sent_message)
-    if (message_about_delete or not_deleted) and semaphore_clear:
-        await channel_layer.group_send(group_name, sent_message)
+    return message_about_delete or not_deleted
+
+
+def message_about_instance(instance, message, for_list=False):
+    return PushMessage(
+        instance._meta.model_name,
+        str(instance.id),
+        message,
+        for_list,
+        getattr(instance, "edited_at", None),
+    )
+
+
+async def push_messages(messages):
+    """
+    Send PushMessages, checking all of their semaphores in one trip to
+    Redis and then sending them concurrently.
+
+    Each message's ``edited_at`` is the state it is about: identical
+    messages about different states are not duplicates, as each subscriber
+    loads the instance as it is when the message arrives. Messages with no
+    ``edited_at`` (errors, deletions of unversioned instances and such)
+    aren't tied to a state at all, so they are always sent: repeating one
+    means the event really did happen again.
+    """
+    channel_layer = get_channel_layer()
+    prepared_messages = []
+    for model_name, id_, message, for_list, edited_at in messages:
+        group_name = CHANNELS_GROUP_NAME.format(
+            model=model_name, id=LIST if for_list else id_
+        )
+        sent_message = {
+            "type": "notify",
+            "content": {**message, "model_name": model_name, "id": id_},
+        }
+        prepared_messages.append((group_name, sent_message, edited_at))
+    versioned_messages = [
+        {"group": group_name, "message": sent_message, "edited_at": edited_at}
+        for group_name, sent_message, edited_at in prepared_messages
+        if edited_at is not None
+    ]
+    is_new_versioned = iter(
+        await get_set_message_semaphores(channel_layer, versioned_messages)
+    )
+    is_new = [
+        edited_at is None or next(is_new_versioned)
+        for _, _, edited_at in prepared_messages
+    ]
+    await asyncio.gather(
+        *(
+            # The version identifies this send, so that subscribers can
+            # share one serialization of the instance, and edited_at lets
+            # them tell whether a replica has caught up with it (see
+            # PushNotificationConsumer):
+            channel_layer.group_send(
+                group_name,
+                {
+                    **sent_message,
+                    "version": uuid4().hex,
+                    "edited_at": edited_at.isoformat() if edited_at else None,
+                },
+            )
+            for (group_name, sent_message, edited_at), send in zip(
+                prepared_messages, is_new
+            )
+            if send
+        )
+    )
+
+
+async def push_message_about_instance(instance, message, for_list=False):
+    if should_push_about_instance(instance, message):
+        await push_messages([message_about_instance(instance, message, for_list)])
 
 
 async def report_error(user):
@@ -80,9 +147,7 @@ async def report_error(user):
     await push_message_about_instance(user, message)
 
 
-async def report_scratch_org_error(
-    instance, *, error, type_, originating_user_id, message=None
-):
+def scratch_org_error_message(*, error, type_, originating_user_id, message=None):
     # @jgerigmeyer asked for the error to be unwrapped in the case that
     # there's only one, which is the most common case, per this
     # discussion:
@@ -105,4 +170,18 @@ async def report_scratch_org_error(
         },
     }
     prepared_message["payload"].update(message or {})
-    await push_message_about_instance(instance, prepared_message)
+    return prepared_message
+
+
+async def report_scratch_org_error(
+    instance, *, error, type_, originating_user_id, message=None
+):
+    await push_message_about_instance(
+        instance,
+        scratch_org_error_message(
+            error=error,
+            type_=type_,
+            originating_user_id=originating_user_id,
+            message=message,
+        ),
+    )
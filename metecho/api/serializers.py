@@ -1,6 +1,7 @@
 from typing import Optional
 
 from allauth.socialaccount.models import SocialAccount
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.template.loader import render_to_string
 from django.utils.translation import gettext_lazy as _
@@ -12,6 +13,7 @@ from .fields import MarkdownField
 from .models import (
     SCRATCH_ORG_TYPES,
     TASK_REVIEW_STATUS,
+    Commit,
     Epic,
     Project,
     ScratchOrg,
@@ -250,6 +252,23 @@ class EpicSerializer(serializers.ModelSerializer):
         return None
 
 
+class TaskCommitSerializer(serializers.ModelSerializer):
+    id = serializers.CharField(source="sha")
+    author = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Commit
+        fields = ("id", "timestamp", "author", "message", "url")
+
+    def get_author(self, obj) -> dict:
+        return {
+            "name": obj.author_name,
+            "email": obj.author_email,
+            "username": obj.author_username,
+            "avatar_url": obj.author_avatar_url,
+        }
+
+
 class TaskSerializer(serializers.ModelSerializer):
     id = serializers.CharField(read_only=True)
     description_rendered = MarkdownField(source="description", read_only=True)
@@ -259,6 +278,7 @@ class TaskSerializer(serializers.ModelSerializer):
     branch_url = serializers.SerializerMethodField()
     branch_diff_url = serializers.SerializerMethodField()
     pr_url = serializers.SerializerMethodField()
+    commits = serializers.SerializerMethodField()
 
     should_alert_dev = serializers.BooleanField(write_only=True, required=False)
     should_alert_qa = serializers.BooleanField(write_only=True, required=False)
@@ -300,7 +320,6 @@ class TaskSerializer(serializers.ModelSerializer):
             "has_unmerged_commits": {"read_only": True},
             "currently_creating_pr": {"read_only": True},
             "branch_url": {"read_only": True},
-            "commits": {"read_only": True},
             "origin_sha": {"read_only": True},
             "branch_diff_url": {"read_only": True},
             "pr_url": {"read_only": True},
@@ -354,6 +373,10 @@ class TaskSerializer(serializers.ModelSerializer):
             return f"https://github.com/{repo_owner}/{repo_name}/pull/{pr_number}"
         return None
 
+    def get_commits(self, obj) -> list:
+        commits = obj.commits.all()[: settings.TASK_COMMITS_SUMMARY_SIZE]
+        return TaskCommitSerializer(commits, many=True).data
+
     def create(self, validated_data):
         validated_data.pop("should_alert_dev", None)
         validated_data.pop("should_alert_qa", None)
@@ -388,13 +411,12 @@ class TaskSerializer(serializers.ModelSerializer):
                 *instance.scratchorg_set.active().filter(org_type=org_type),
                 *instance.scratchorg_set.inactive().filter(org_type=org_type),
             ]
+            latest_commit_sha = instance.get_latest_commit_sha()
             for org in orgs:
                 new_user = self._valid_reassign(
                     type_, org, validated_data[f"assigned_{type_}"]
                 )
-                valid_commit = org.latest_commit == (
-                    instance.commits[0] if instance.commits else instance.origin_sha
-                )
+                valid_commit = org.latest_commit == latest_commit_sha
                 org_still_exists = is_org_good(org)
                 if (
                     org_still_exists
@@ -547,7 +569,7 @@ class ScratchOrgSerializer(serializers.ModelSerializer):
 
     def _X_changes(self, obj, kind):
         user = getattr(self.context.get("request"), "user", None)
-        if obj.owner == user:
+        if obj.owner_id == getattr(user, "id", None):
             return getattr(obj, f"{kind}_changes")
         return {}
 
@@ -577,7 +599,7 @@ class ScratchOrgSerializer(serializers.ModelSerializer):
 
     def get_valid_target_directories(self, obj) -> dict:
         user = getattr(self.context.get("request"), "user", None)
-        if obj.owner == user:
+        if obj.owner_id == getattr(user, "id", None):
             return obj.valid_target_directories
         return {}
 
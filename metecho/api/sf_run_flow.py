@@ -12,7 +12,6 @@ from cumulusci.oauth.salesforce import SalesforceOAuth2, jwt_session
 from cumulusci.tasks.salesforce.org_settings import DeployOrgSettings
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
-from django_rq import get_scheduler
 from requests.exceptions import HTTPError
 from rq import get_current_job
 from simple_salesforce import Salesforce as SimpleSalesforce
@@ -378,10 +377,6 @@ def delete_org(scratch_org):
     if active_scratch_org_id:
         devhub_api.ActiveScratchOrg.delete(active_scratch_org_id)
 
-    if scratch_org.expiry_job_id:
-        scheduler = get_scheduler("default")
-        scheduler.cancel(scratch_org.expiry_job_id)
-
 
 def _last_line(s: str) -> str:
     lines = [line for line in s.splitlines() if line.strip()]
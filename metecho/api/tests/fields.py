@@ -0,0 +1,22 @@
+from unittest.mock import patch
+
+from ..fields import MarkdownField, _render_clean_markdown
+
+
+class TestMarkdownField:
+    def test_to_representation(self):
+        field = MarkdownField()
+        assert field.to_representation("Test `code`") == "<p>Test <code>code</code></p>"
+        assert field.to_representation("") == ""
+
+    def test_to_representation__cached(self):
+        _render_clean_markdown.cache_clear()
+        field = MarkdownField()
+        with patch("metecho.api.fields.markdown", return_value="<p>Hi</p>") as md:
+            assert field.to_representation("Hi") == "<p>Hi</p>"
+            assert field.to_representation("Hi") == "<p>Hi</p>"
+            assert md.call_count == 1
+
+            field.to_representation("Hi there")
+            assert md.call_count == 2
+        _render_clean_markdown.cache_clear()
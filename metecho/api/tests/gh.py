@@ -9,6 +9,7 @@ from ..gh import (
     UnsafeZipfileError,
     extract_zip_file,
     get_all_org_repos,
+    get_rate_limit_remaining,
     get_repo_info,
     get_source_format,
     get_zip_file,
@@ -48,6 +49,16 @@ def test_gh_as_app():
         assert gh_as_app("TestOrg", "TestRepo") is not None
 
 
+def test_get_rate_limit_remaining():
+    with patch(f"{PATCH_ROOT}.gh_as_app") as gh_as_app:
+        gh_as_app.return_value.rate_limit.return_value = {
+            "resources": {"core": {"remaining": 42}}
+        }
+
+        assert get_rate_limit_remaining("TestOrg", "TestRepo") == 42
+        gh_as_app.assert_called_once_with("TestOrg", "TestRepo")
+
+
 def test_is_safe_path():
     assert not is_safe_path("/foo")
     assert not is_safe_path("../bar")
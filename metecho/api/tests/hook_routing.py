@@ -0,0 +1,96 @@
+import pytest
+from django.core.cache import cache
+
+from ..hook_routing import get_pr_target, get_project, get_task_for_pr
+from ..models import Project
+
+
+@pytest.fixture(autouse=True)
+def locmem_cache(settings):
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    }
+
+
+@pytest.mark.django_db
+class TestGetProject:
+    def test_cached(self, project_factory, django_assert_num_queries):
+        project = project_factory(repo_id=123)
+        assert get_project(123) == project
+        with django_assert_num_queries(1):
+            assert get_project(123) == project
+
+    def test_stale(self, project_factory):
+        project = project_factory(repo_id=123)
+        assert get_project(123) == project
+
+        Project.objects.filter(pk=project.pk).update(repo_id=456)
+        other = project_factory(repo_id=123)
+        assert get_project(123) == other
+
+    def test_missing(self):
+        assert get_project(123) is None
+
+
+@pytest.mark.django_db
+class TestGetPrTarget:
+    def test_precedence(self, project_factory, epic_factory, task_factory):
+        project = project_factory(repo_id=123, branch_name="main")
+        kwargs = {"pr_number": 1, "head_ref": "feature", "base_ref": "main"}
+
+        epic_by_branch = epic_factory(project=project, branch_name="feature")
+        assert get_pr_target(project, **kwargs) == epic_by_branch
+
+        # A cached match stays valid until it stops matching, so clear the
+        # cache to see what a fresh lookup prefers:
+        cache.clear()
+        task_by_branch = task_factory(
+            epic__project=project, epic__branch_name="main", branch_name="feature"
+        )
+        assert get_pr_target(project, **kwargs) == task_by_branch
+
+        # Matches by PR number outrank it, and invalidate it:
+        epic_by_pr = epic_factory(project=project, pr_number=1)
+        assert get_pr_target(project, **kwargs) == epic_by_pr
+
+        task_by_pr = task_factory(epic__project=project, pr_number=1)
+        assert get_pr_target(project, **kwargs) == task_by_pr
+
+    def test_pr_number_assigned(self, project_factory, epic_factory, task_factory):
+        project = project_factory(repo_id=123, branch_name="main")
+        kwargs = {"pr_number": 1, "head_ref": "feature", "base_ref": "main"}
+        task_by_branch = task_factory(
+            epic__project=project, epic__branch_name="main", branch_name="feature"
+        )
+        epic = epic_factory(project=project)
+        assert get_pr_target(project, **kwargs) == task_by_branch
+
+        epic.pr_number = 1
+        epic.save()
+        assert get_pr_target(project, **kwargs) == epic
+
+    def test_cached(self, project_factory, task_factory, django_assert_num_queries):
+        project = project_factory(repo_id=123)
+        task = task_factory(epic__project=project, pr_number=1)
+        kwargs = {"pr_number": 1, "head_ref": "feature", "base_ref": "main"}
+        assert get_pr_target(project, **kwargs) == task
+        with django_assert_num_queries(1):
+            assert get_pr_target(project, **kwargs) == task
+
+    def test_none(self, project_factory):
+        project = project_factory(repo_id=123)
+        assert (
+            get_pr_target(project, pr_number=1, head_ref="feature", base_ref="main")
+            is None
+        )
+
+
+@pytest.mark.django_db
+def test_get_task_for_pr(project_factory, task_factory):
+    project = project_factory(repo_id=123)
+    task = task_factory(epic__project=project, pr_number=1)
+    assert get_task_for_pr(project, 1) == task
+
+    task.pr_number = 2
+    task.save()
+    assert get_task_for_pr(project, 1) is None
@@ -1,3 +1,4 @@
+from contextlib import ExitStack
 from unittest.mock import patch
 
 import pytest
@@ -28,6 +29,73 @@ class TestPushHookSerializer:
             serializer.process_hook()
             assert logger.warn.called
 
+    def test_process_hooks__coalesced(self, project_factory):
+        project_factory(repo_id=123)
+        serializers = []
+        for sha in ("abc", "def"):
+            serializer = PushHookSerializer(
+                data={
+                    "forced": False,
+                    "ref": "refs/heads/feature",
+                    "commits": [
+                        {
+                            "id": sha,
+                            "timestamp": "2019-11-20T21:32:53+00:00",
+                            "author": {
+                                "name": "Test",
+                                "email": "test@example.com",
+                                "username": "test123",
+                            },
+                            "message": "Message",
+                            "url": "https://github.com/test/user/foo",
+                        }
+                    ],
+                    "repository": {"id": 123},
+                    "sender": {"login": "test123", "avatar_url": "https://avatar/"},
+                }
+            )
+            assert serializer.is_valid(), serializer.errors
+            serializers.append(serializer)
+
+        with patch("metecho.api.models.Project.add_commits") as add_commits:
+            PushHookSerializer.process_hooks(serializers)
+
+        assert add_commits.call_count == 1
+        kwargs = add_commits.call_args.kwargs
+        assert kwargs["ref"] == "feature"
+        assert [commit["id"] for commit in kwargs["commits"]] == ["abc", "def"]
+        assert kwargs["commits"][0]["author"]["avatar_url"] == "https://avatar/"
+
+    def test_process_hooks__forced(self, project_factory):
+        project_factory(repo_id=123)
+        serializers = []
+        for forced in (False, True, False):
+            serializer = PushHookSerializer(
+                data={
+                    "forced": forced,
+                    "ref": "refs/heads/feature",
+                    "commits": [],
+                    "repository": {"id": 123},
+                    "sender": {},
+                }
+            )
+            assert serializer.is_valid(), serializer.errors
+            serializers.append(serializer)
+
+        with ExitStack() as stack:
+            add_commits = stack.enter_context(
+                patch("metecho.api.models.Project.add_commits")
+            )
+            queue_refresh_commits = stack.enter_context(
+                patch("metecho.api.models.Project.queue_refresh_commits")
+            )
+            PushHookSerializer.process_hooks(serializers)
+
+        assert not add_commits.called
+        queue_refresh_commits.assert_called_once_with(
+            ref="feature", originating_user_id=None
+        )
+
     def test_process_hook__tag(self, project_factory):
         project_factory(repo_id=123)
         data = {
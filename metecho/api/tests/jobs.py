@@ -1,6 +1,6 @@
 from collections import namedtuple
 from contextlib import ExitStack
-from datetime import datetime
+from datetime import datetime, timedelta
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -13,22 +13,28 @@ from ..jobs import (
     _create_branches_on_github,
     _create_org_and_run_flow,
     alert_user_about_expiring_org,
+    alert_users_about_expiring_orgs,
     available_task_org_config_names,
     commit_changes_from_org,
     create_branches_on_github_then_create_scratch_org,
     create_gh_branch_for_new_epic,
     create_pr,
     delete_scratch_org,
+    delete_scratch_orgs,
     get_social_image,
     get_unsaved_changes,
     populate_github_users,
+    populate_repo_id,
+    populate_repo_ids,
+    process_hook_event,
+    prune_hook_events,
     refresh_commits,
     refresh_github_repositories_for_user,
     refresh_scratch_org,
     submit_review,
     user_reassign,
 )
-from ..models import SCRATCH_ORG_TYPES
+from ..models import HOOK_EVENT_STATUSES, SCRATCH_ORG_TYPES, GitHubHookEvent, Task
 
 Author = namedtuple("Author", ("avatar_url", "login"))
 Commit = namedtuple(
@@ -216,6 +222,44 @@ class TestAlertUserAboutExpiringOrg:
             assert send_mail.called
 
 
+@pytest.mark.django_db
+class TestAlertUsersAboutExpiringOrgs:
+    def test_due(self, scratch_org_factory):
+        due = scratch_org_factory(is_created=True, expires_at=now() + timedelta(days=1))
+        later = scratch_org_factory(
+            is_created=True, expires_at=now() + timedelta(days=30)
+        )
+        with patch(f"{PATCH_ROOT}.alert_user_about_expiring_org") as alert:
+            alert_users_about_expiring_orgs()
+
+            alert.assert_called_once_with(org=due, days=3)
+
+        due.refresh_from_db()
+        later.refresh_from_db()
+        assert due.expiry_alerted_at is not None
+        assert later.expiry_alerted_at is None
+
+    def test_already_alerted(self, scratch_org_factory):
+        scratch_org_factory(
+            is_created=True,
+            expires_at=now() + timedelta(days=1),
+            expiry_alerted_at=now(),
+        )
+        with patch(f"{PATCH_ROOT}.alert_user_about_expiring_org") as alert:
+            alert_users_about_expiring_orgs()
+
+            assert not alert.called
+
+    def test_error(self, scratch_org_factory):
+        scratch_org_factory(is_created=True, expires_at=now() + timedelta(days=1))
+        scratch_org_factory(is_created=True, expires_at=now() + timedelta(days=2))
+        with patch(f"{PATCH_ROOT}.alert_user_about_expiring_org") as alert:
+            alert.side_effect = Exception
+            alert_users_about_expiring_orgs()
+
+            assert alert.call_count == 2
+
+
 def test_create_org_and_run_flow():
     with ExitStack() as stack:
         stack.enter_context(patch(f"{PATCH_ROOT}.get_latest_revision_numbers"))
@@ -234,7 +278,6 @@ def test_create_org_and_run_flow():
             {"source": ["src"], "config": [], "post": [], "pre": []},
             False,
         )
-        stack.enter_context(patch(f"{PATCH_ROOT}.get_scheduler"))
         Path = stack.enter_context(patch(f"{PATCH_ROOT}.Path"))
         Path.return_value = MagicMock(**{"read_text.return_value": "test logs"})
         scratch_org = MagicMock(org_type=SCRATCH_ORG_TYPES.Dev)
@@ -276,7 +319,6 @@ def test_create_org_and_run_flow__fall_back_to_cases():
             {"source": ["src"], "config": [], "post": [], "pre": []},
             False,
         )
-        stack.enter_context(patch(f"{PATCH_ROOT}.get_scheduler"))
         Path = stack.enter_context(patch(f"{PATCH_ROOT}.Path"))
         Path.return_value = MagicMock(**{"read_text.return_value": "test logs"})
         _create_org_and_run_flow(
@@ -337,13 +379,17 @@ def test_create_branches_on_github_then_create_scratch_org():
         _create_org_and_run_flow = stack.enter_context(
             patch(f"{PATCH_ROOT}._create_org_and_run_flow")
         )
-        stack.enter_context(patch(f"{PATCH_ROOT}.get_scheduler"))
+        flush_notifications = stack.enter_context(
+            patch(f"{PATCH_ROOT}.flush_notifications")
+        )
 
         create_branches_on_github_then_create_scratch_org(
             scratch_org=MagicMock(), originating_user_id=None
         )
 
         assert _create_branches_on_github.called
+        # The branch updates go out before the org is provisioned:
+        assert flush_notifications.called
         assert _create_org_and_run_flow.called
 
 
@@ -392,7 +438,7 @@ def test_delete_scratch_org(scratch_org_factory):
 def test_delete_scratch_org__exception(scratch_org_factory):
     scratch_org = scratch_org_factory()
     with ExitStack() as stack:
-        stack.enter_context(patch(f"{PATCH_ROOT}.async_to_sync"))
+        stack.enter_context(patch("metecho.api.model_mixins.async_to_sync"))
         get_latest_revision_numbers = stack.enter_context(
             patch(f"{PATCH_ROOT}.get_latest_revision_numbers")
         )
@@ -412,6 +458,55 @@ def test_delete_scratch_org__exception(scratch_org_factory):
         assert get_latest_revision_numbers.called
 
 
+@pytest.mark.django_db
+def test_delete_scratch_orgs(scratch_org_factory):
+    scratch_orgs = [scratch_org_factory(), scratch_org_factory()]
+    with ExitStack() as stack:
+        delete_scratch_org = stack.enter_context(
+            patch(f"{PATCH_ROOT}.delete_scratch_org")
+        )
+        delete_scratch_org.side_effect = [ValueError, None]
+        logger = stack.enter_context(patch(f"{PATCH_ROOT}.logger"))
+        delete_scratch_orgs(
+            [str(scratch_org.id) for scratch_org in scratch_orgs],
+            originating_user_id=None,
+        )
+
+        # A failure is logged, but doesn't stop the rest of the batch:
+        assert logger.error.call_count == 1
+        assert delete_scratch_org.call_count == 2
+
+
+@pytest.mark.django_db
+def test_populate_repo_id(project_factory):
+    project = project_factory(repo_id=None)
+    with ExitStack() as stack:
+        get_repo_info = stack.enter_context(
+            patch("metecho.api.model_mixins.get_repo_info")
+        )
+        get_repo_info.side_effect = NotFoundError(MagicMock())
+        logger = stack.enter_context(patch(f"{PATCH_ROOT}.logger"))
+
+        populate_repo_id(project)
+
+        assert logger.warning.called
+
+
+@pytest.mark.django_db
+def test_populate_repo_ids(project_factory):
+    due = project_factory(repo_id=None)
+    project_factory(repo_id=None, repo_id_retry_at=now() + timedelta(hours=1))
+    project_factory(repo_id=123)
+    with patch("metecho.api.model_mixins.get_repo_info") as get_repo_info:
+        get_repo_info.return_value = MagicMock(id=456)
+
+        populate_repo_ids()
+
+        assert get_repo_info.call_count == 1
+        due.refresh_from_db()
+        assert due.repo_id == 456
+
+
 def test_refresh_github_repositories_for_user(user_factory):
     user = MagicMock()
     refresh_github_repositories_for_user(user)
@@ -571,8 +666,66 @@ class TestErrorHandling:
             refresh_commits(
                 project=project, branch_name="task", originating_user_id=None
             )
-            task.refresh_from_db()
-            assert len(task.commits) == 1
+            assert task.commits.count() == 1
+
+
+@pytest.mark.django_db
+class TestRefreshCommits:
+    def test_stops_paging_when_origins_found(self, project_factory, task_factory):
+        project = project_factory(repo_id=123)
+        task_factory(
+            epic__project=project,
+            epic__branch_name="epic",
+            branch_name="task",
+            origin_sha="sha1",
+        )
+        task_factory(
+            epic__project=project,
+            epic__branch_name="epic",
+            branch_name="task",
+            origin_sha="sha2",
+        )
+        seen = []
+
+        def commits(*args, **kwargs):
+            for sha in ("sha0", "sha1", "sha2", "sha3", "sha4"):
+                seen.append(sha)
+                yield Commit(sha=sha, commit=Commit(author={}))
+
+        repo = MagicMock(
+            **{
+                "commits.side_effect": commits,
+                "compare_commits.return_value": MagicMock(ahead_by=1),
+            }
+        )
+        with patch(f"{PATCH_ROOT}.get_repo_info") as get_repo_info:
+            get_repo_info.return_value = repo
+            refresh_commits(
+                project=project, branch_name="task", originating_user_id=None
+            )
+
+        assert seen == ["sha0", "sha1", "sha2"]
+        assert repo.compare_commits.call_count == 1
+        commit_counts = sorted(
+            task.commits.count() for task in Task.objects.filter(branch_name="task")
+        )
+        assert commit_counts == [1, 2]
+
+    def test_origin_not_found(self, project_factory, task_factory):
+        project = project_factory(repo_id=123)
+        task = task_factory(
+            epic__project=project, branch_name="task", origin_sha="missing"
+        )
+        repo = MagicMock(
+            **{"commits.return_value": [Commit(sha="sha0", commit=Commit(author={}))]}
+        )
+        with patch(f"{PATCH_ROOT}.get_repo_info") as get_repo_info:
+            get_repo_info.return_value = repo
+            refresh_commits(
+                project=project, branch_name="task", originating_user_id=None
+            )
+
+        assert not task.commits.exists()
 
 
 @pytest.mark.django_db
@@ -966,3 +1119,181 @@ class TestUserReassign:
             user_reassign(scratch_org, new_user=user, originating_user_id=str(user.id))
 
             assert async_to_sync.called
+
+
+@pytest.mark.django_db
+class TestProcessHookEvent:
+    def make_hook_event(self, repo_id=123, **kwargs):
+        return GitHubHookEvent.objects.create(
+            delivery_id="abc",
+            event="push",
+            repo_id=repo_id,
+            payload={
+                "ref": "refs/heads/main",
+                "forced": True,
+                "repository": {"id": repo_id},
+                "commits": [],
+                "sender": {},
+            },
+            **kwargs,
+        )
+
+    def test_processed(self, project_factory):
+        project_factory(repo_id=123)
+        hook_event = self.make_hook_event()
+        with patch(f"{PATCH_ROOT}.refresh_commits_job") as refresh_commits_job:
+            process_hook_event(hook_event)
+
+        assert refresh_commits_job.delay.called
+        hook_event.refresh_from_db()
+        assert hook_event.status == HOOK_EVENT_STATUSES.Processed
+        assert hook_event.processed_at is not None
+
+    def test_ignored(self):
+        hook_event = self.make_hook_event(repo_id=456)
+        process_hook_event(hook_event)
+
+        hook_event.refresh_from_db()
+        assert hook_event.status == HOOK_EVENT_STATUSES.Ignored
+        assert hook_event.error == "No matching project."
+
+    def test_failed(self, project_factory):
+        project_factory(repo_id=123)
+        hook_event = self.make_hook_event()
+        with patch(f"{PATCH_ROOT}.refresh_commits_job") as refresh_commits_job:
+            refresh_commits_job.delay.side_effect = ValueError("Oops")
+            with pytest.raises(ValueError):
+                process_hook_event(hook_event)
+
+        hook_event.refresh_from_db()
+        assert hook_event.status == HOOK_EVENT_STATUSES.Failed
+        assert "Oops" in hook_event.error
+
+
+@pytest.mark.django_db
+class TestProcessHookEvent__coalescing:
+    def make_push(self, delivery_id, sha, ref="refs/heads/feature"):
+        return GitHubHookEvent.objects.create(
+            delivery_id=delivery_id,
+            event="push",
+            repo_id=123,
+            ref=ref,
+            payload={
+                "ref": ref,
+                "forced": False,
+                "repository": {"id": 123},
+                "commits": [
+                    {
+                        "id": sha,
+                        "timestamp": "2019-11-20T21:32:53+00:00",
+                        "author": {
+                            "name": "Test",
+                            "email": "test@example.com",
+                            "username": "test123",
+                        },
+                        "message": "Message",
+                        "url": "https://github.com/test/user/foo",
+                    }
+                ],
+                "sender": {"login": "test123", "avatar_url": "https://avatar/"},
+            },
+        )
+
+    def make_pull_request(self, delivery_id):
+        return GitHubHookEvent.objects.create(
+            delivery_id=delivery_id, event="pull_request", repo_id=123
+        )
+
+    def age(self, *events, seconds=60):
+        GitHubHookEvent.objects.filter(id__in=[event.id for event in events]).update(
+            created_at=now() - timedelta(seconds=seconds)
+        )
+
+    def test_coalesces_pushes_to_branch(self, settings, project_factory):
+        settings.HOOK_PUSH_COALESCE_SECONDS = 5
+        project_factory(repo_id=123)
+        first = self.make_push("1", "abc")
+        second = self.make_push("2", "def")
+        self.make_push("3", "ghi", ref="refs/heads/other")
+
+        with ExitStack() as stack:
+            get_scheduler = stack.enter_context(patch(f"{PATCH_ROOT}.get_scheduler"))
+            add_commits = stack.enter_context(
+                patch("metecho.api.models.Project.add_commits")
+            )
+            # Still inside the window, so it's rescheduled:
+            process_hook_event(first)
+            assert get_scheduler.return_value.enqueue_in.called
+            assert not add_commits.called
+
+            self.age(first, second)
+            process_hook_event(first)
+            # Already applied along with the first one:
+            process_hook_event(second)
+
+        assert add_commits.call_count == 1
+        commits = add_commits.call_args.kwargs["commits"]
+        assert [commit["id"] for commit in commits] == ["abc", "def"]
+        statuses = dict(GitHubHookEvent.objects.values_list("delivery_id", "status"))
+        assert statuses == {
+            "1": HOOK_EVENT_STATUSES.Processed,
+            "2": HOOK_EVENT_STATUSES.Processed,
+            "3": HOOK_EVENT_STATUSES.Received,
+        }
+
+    def test_keeps_repo_order(self, project_factory):
+        project_factory(repo_id=123)
+        first = self.make_push("1", "abc")
+        pull_request = self.make_pull_request("2")
+        self.make_push("3", "def")
+        self.age(first)
+
+        applied = []
+        with ExitStack() as stack:
+            stack.enter_context(
+                patch(
+                    f"{PATCH_ROOT}._apply_hook_event_batch",
+                    side_effect=lambda batch: applied.append(
+                        [event.delivery_id for event in batch]
+                    ),
+                )
+            )
+            # The push waiting from before it goes first, without the push
+            # that came after it:
+            process_hook_event(pull_request)
+
+        assert applied == [["1"], ["2"]]
+
+    def test_claimed_elsewhere(self, project_factory):
+        project_factory(repo_id=123)
+        push = self.make_push("1", "abc")
+        self.age(push)
+        GitHubHookEvent.objects.filter(id=push.id).update(
+            status=HOOK_EVENT_STATUSES.Processing
+        )
+
+        with patch(f"{PATCH_ROOT}._apply_hook_event_batch") as apply:
+            process_hook_event(push)
+
+        assert not apply.called
+
+
+@pytest.mark.django_db
+def test_prune_hook_events():
+    old = now() - timedelta(days=30)
+    for delivery_id, status_ in (
+        ("old-processed", HOOK_EVENT_STATUSES.Processed),
+        ("old-failed", HOOK_EVENT_STATUSES.Failed),
+        ("new-processed", HOOK_EVENT_STATUSES.Processed),
+    ):
+        GitHubHookEvent.objects.create(
+            delivery_id=delivery_id, event="push", status=status_
+        )
+    GitHubHookEvent.objects.exclude(delivery_id="new-processed").update(created_at=old)
+
+    prune_hook_events()
+
+    assert set(GitHubHookEvent.objects.values_list("delivery_id", flat=True)) == {
+        "old-failed",
+        "new-processed",
+    }
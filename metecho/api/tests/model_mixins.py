@@ -0,0 +1,89 @@
+from unittest.mock import patch
+
+import pytest
+from django.db import transaction
+
+from ..model_mixins import NotificationBatch, batched_notifications, flush_notifications
+from ..push import PushMessage
+
+PATCH_ROOT = "metecho.api.model_mixins"
+
+
+@pytest.mark.django_db
+class TestBatchedNotifications:
+    def test_sent_once(self, task_factory):
+        task = task_factory()
+        with patch(f"{PATCH_ROOT}.async_to_sync") as async_to_sync:
+            with batched_notifications():
+                task.notify_changed(originating_user_id="first")
+                task.epic.notify_changed(originating_user_id=None)
+                task.notify_changed(originating_user_id="last")
+                assert not async_to_sync.called
+
+        assert async_to_sync.return_value.call_count == 1
+        (messages,), _ = async_to_sync.return_value.call_args
+        # One message per instance and type, the last one:
+        assert [(message.model_name, message.id) for message in messages] == [
+            ("epic", str(task.epic.id)),
+            ("task", str(task.id)),
+        ]
+        assert messages[1].message["payload"]["originating_user_id"] == "last"
+
+    def test_flushed(self, task_factory):
+        task = task_factory()
+        with patch(f"{PATCH_ROOT}.async_to_sync") as async_to_sync:
+            with batched_notifications():
+                task.notify_changed(originating_user_id=None)
+                flush_notifications()
+                assert async_to_sync.return_value.call_count == 1
+
+                task.epic.notify_changed(originating_user_id=None)
+
+            assert async_to_sync.return_value.call_count == 2
+            (messages,), _ = async_to_sync.return_value.call_args
+            assert [message.model_name for message in messages] == ["epic"]
+
+            # Outside of a batch, there's nothing to flush:
+            flush_notifications()
+            assert async_to_sync.return_value.call_count == 2
+
+    def test_unbatched(self, task_factory):
+        task = task_factory()
+        with patch(f"{PATCH_ROOT}.async_to_sync") as async_to_sync:
+            task.notify_changed(originating_user_id=None)
+
+            assert async_to_sync.return_value.call_count == 1
+
+    def test_send_error(self, task_factory):
+        task = task_factory()
+        with patch(f"{PATCH_ROOT}.async_to_sync") as async_to_sync:
+            async_to_sync.return_value.side_effect = Exception
+            with pytest.raises(ValueError):
+                with batched_notifications():
+                    task.notify_changed(originating_user_id=None)
+                    raise ValueError
+
+    def test_closed_batch(self):
+        batch = NotificationBatch()
+        batch.send()
+        message = PushMessage("task", "abc", {"type": "TASK_UPDATE"}, False, None)
+        with patch(f"{PATCH_ROOT}.async_to_sync") as async_to_sync:
+            batch.add_all([message])
+
+            async_to_sync.return_value.assert_called_once_with([message])
+
+
+@pytest.mark.django_db(transaction=True)
+def test_notifications_wait_for_commit(task_factory):
+    task = task_factory()
+    with patch(f"{PATCH_ROOT}.async_to_sync") as async_to_sync:
+        with pytest.raises(ValueError):
+            with transaction.atomic():
+                task.notify_changed(originating_user_id=None)
+                raise ValueError
+        assert not async_to_sync.called
+
+        with transaction.atomic():
+            task.notify_changed(originating_user_id=None)
+            assert not async_to_sync.called
+        assert async_to_sync.called
@@ -1,17 +1,23 @@
+import pickle
 from contextlib import ExitStack
 from datetime import datetime, timedelta
 from unittest.mock import MagicMock, patch
 
 import pytest
+from allauth.socialaccount.models import SocialAccount
+from django.db import connection
 from django.utils.timezone import now
 from simple_salesforce.exceptions import SalesforceError
 
 from ..models import (
+    EPIC_STATUS_RANKS,
     EPIC_STATUSES,
     SCRATCH_ORG_TYPES,
     TASK_STATUSES,
+    Commit,
     Epic,
     Project,
+    ScratchOrg,
     Task,
     user_logged_in_handler,
 )
@@ -47,6 +53,56 @@ class TestProject:
             assert get_repo_info.called
             assert project.repo_id == 123
 
+    def test_queue_populate_repo_id(self):
+        with patch("metecho.api.jobs.populate_repo_id_job") as populate_repo_id_job:
+            project = Project(name="Test Project", repo_owner="test", repo_name="repo")
+            project.save()
+            assert populate_repo_id_job.delay.called
+
+            populate_repo_id_job.reset_mock()
+            project.save()
+            assert not populate_repo_id_job.delay.called
+
+    def test_queue_populate_repo_id__on_commit(self):
+        with ExitStack() as stack:
+            populate_repo_id_job = stack.enter_context(
+                patch("metecho.api.jobs.populate_repo_id_job")
+            )
+            on_commit = stack.enter_context(
+                patch("metecho.api.models.transaction.on_commit")
+            )
+            project = Project(name="Test Project", repo_owner="test", repo_name="repo")
+            project.save()
+            assert not populate_repo_id_job.delay.called
+
+            for call in on_commit.call_args_list:
+                call[0][0]()
+            populate_repo_id_job.delay.assert_called_once_with(project)
+
+    def test_populate_repo_id__backoff(self, project_factory, settings):
+        settings.REPO_ID_RETRY_BASE_MINUTES = 5
+        settings.REPO_ID_RETRY_MAX_MINUTES = 15
+        project = project_factory(repo_id=None)
+        with patch("metecho.api.model_mixins.get_repo_info") as get_repo_info:
+            get_repo_info.side_effect = ValueError
+
+            delays = []
+            for _ in range(4):
+                before = now()
+                assert not project.populate_repo_id()
+                project.refresh_from_db()
+                delays.append(round((project.repo_id_retry_at - before).seconds / 60))
+            assert delays == [5, 10, 15, 15]
+            assert project.repo_id_failures == 4
+
+            get_repo_info.side_effect = None
+            get_repo_info.return_value = MagicMock(id=123)
+            assert project.populate_repo_id()
+            project.refresh_from_db()
+            assert project.repo_id == 123
+            assert project.repo_id_failures == 0
+            assert project.repo_id_retry_at is None
+
     def test_queue_populate_github_users(self, project_factory, user_factory):
         project = project_factory()
         with patch(
@@ -132,6 +188,129 @@ class TestEpic:
         task_factory(epic=epic, status=TASK_STATUSES.Completed)
         assert not epic.should_update_status()
 
+    def test_task_status_counts(self, epic_factory, task_factory):
+        epic = epic_factory()
+        task = task_factory(epic=epic)
+        task_factory(epic=epic, status=TASK_STATUSES.Completed)
+
+        epic.refresh_from_db()
+        assert epic.planned_task_count == 1
+        assert epic.completed_task_count == 1
+        assert epic.status == EPIC_STATUSES["In progress"]
+
+        task.status = TASK_STATUSES.Completed
+        task.save()
+        epic.refresh_from_db()
+        assert epic.planned_task_count == 0
+        assert epic.completed_task_count == 2
+        assert epic.status == EPIC_STATUSES.Review
+
+    def test_task_status_counts__soft_delete(self, epic_factory, task_factory):
+        epic = epic_factory()
+        task = task_factory(epic=epic, status=TASK_STATUSES["In progress"])
+        task_factory(epic=epic, status=TASK_STATUSES.Completed)
+
+        task.delete()
+        epic.refresh_from_db()
+        assert epic.in_progress_task_count == 0
+        assert epic.completed_task_count == 1
+        assert epic.status == EPIC_STATUSES.Review
+
+    def test_task_status_counts__queryset_soft_delete(self, epic_factory, task_factory):
+        epic = epic_factory()
+        task_factory(epic=epic)
+        task_factory(epic=epic, status=TASK_STATUSES.Completed)
+
+        Task.objects.filter(status=TASK_STATUSES.Planned).delete()
+        epic.refresh_from_db()
+        assert epic.planned_task_count == 0
+        assert epic.completed_task_count == 1
+
+    def test_task_status_counts__stale_instances(self, epic_factory, task_factory):
+        epic = epic_factory()
+        task = task_factory(epic=epic)
+        first = Task.objects.get(pk=task.pk)
+        second = Task.objects.get(pk=task.pk)
+
+        first.status = TASK_STATUSES["In progress"]
+        first.save()
+        second.status = TASK_STATUSES.Completed
+        second.save()
+        epic.refresh_from_db()
+        assert epic.planned_task_count == 0
+        assert epic.in_progress_task_count == 0
+        assert epic.completed_task_count == 1
+
+    def test_task_status_counts__update_fields(self, epic_factory, task_factory):
+        epic = epic_factory()
+        task = task_factory(epic=epic)
+
+        task.status = TASK_STATUSES.Completed
+        task.name = "Renamed"
+        task.save(update_fields=["name"])
+        epic.refresh_from_db()
+        assert epic.planned_task_count == 1
+        assert epic.completed_task_count == 0
+
+    def test_save__stale_task_status_counts(self, epic_factory, task_factory):
+        epic = epic_factory()
+        stale = Epic.objects.get(pk=epic.pk)
+        task_factory(epic=epic, status=TASK_STATUSES.Completed)
+
+        stale.name = "Renamed"
+        stale.save()
+        epic.refresh_from_db()
+        assert epic.name == "Renamed"
+        assert epic.completed_task_count == 1
+        assert epic.status == EPIC_STATUSES.Review
+
+    def test_recount_task_statuses(self, epic_factory, task_factory):
+        epic = epic_factory()
+        task_factory(epic=epic)
+        task_factory(epic=epic, status=TASK_STATUSES["In progress"])
+        Epic.objects.filter(pk=epic.pk).update(
+            planned_task_count=5, in_progress_task_count=0
+        )
+
+        Epic.objects.all().recount_task_statuses()
+        epic.refresh_from_db()
+        assert epic.planned_task_count == 1
+        assert epic.in_progress_task_count == 1
+        assert epic.completed_task_count == 0
+
+    def test_recount_task_statuses__no_tasks(self, epic_factory, task_factory):
+        epic = epic_factory()
+        task_factory(epic=epic).delete()
+        Epic.objects.filter(pk=epic.pk).update(planned_task_count=5)
+
+        Epic.objects.all().recount_task_statuses()
+        epic.refresh_from_db()
+        assert epic.task_count == 0
+
+    def test_soft_delete__bulk(self, epic_factory, task_factory, scratch_org_factory):
+        epic = epic_factory()
+        for _ in range(3):
+            task = task_factory(epic=epic)
+            scratch_org_factory(task=task, last_modified_at=now())
+        with ExitStack() as stack:
+            async_to_sync = stack.enter_context(
+                patch("metecho.api.model_mixins.async_to_sync")
+            )
+            delete_scratch_orgs_job = stack.enter_context(
+                patch("metecho.api.jobs.delete_scratch_orgs_job")
+            )
+
+            Epic.objects.filter(pk=epic.pk).delete()
+
+            assert delete_scratch_orgs_job.delay.call_count == 1
+            (scratch_org_ids,), _ = delete_scratch_orgs_job.delay.call_args
+            assert len(scratch_org_ids) == 3
+            # One batch of messages each for the scratch orgs, tasks and epic:
+            assert async_to_sync.call_count == 3
+        assert not Task.objects.active().exists()
+        assert not ScratchOrg.objects.active().exists()
+        assert ScratchOrg.objects.filter(delete_queued_at__isnull=False).count() == 3
+
     def test_queue_create_pr(self, epic_factory, user_factory):
         with ExitStack() as stack:
             create_pr_job = stack.enter_context(patch("metecho.api.jobs.create_pr_job"))
@@ -195,6 +374,15 @@ class TestEpic:
         epic.finalize_available_task_org_config_names()
         assert epic.notify_changed.called
 
+    def test_status_rank(self, epic_factory):
+        epic = epic_factory(status=EPIC_STATUSES.Planned)
+        assert epic.status_rank == EPIC_STATUS_RANKS[EPIC_STATUSES.Planned]
+
+        epic.status = EPIC_STATUSES.Review
+        epic.save(update_fields=["status"])
+        epic.refresh_from_db()
+        assert epic.status_rank == EPIC_STATUS_RANKS[EPIC_STATUSES.Review]
+
 
 @pytest.mark.django_db
 class TestTask:
@@ -284,14 +472,15 @@ class TestTask:
 
             assert submit_review_job.delay.called
 
-    def test_finalize_submit_review(self, task_factory):
+    def test_finalize_submit_review(self, task_factory, commit_factory):
         now = datetime(2020, 12, 31, 12, 0)
         with ExitStack() as stack:
             async_to_sync = stack.enter_context(
                 patch("metecho.api.model_mixins.async_to_sync")
             )
 
-            task = task_factory(commits=[{"id": "123"}])
+            task = task_factory()
+            commit_factory(task=task, sha="123")
             task.finalize_submit_review(now, sha="123", originating_user_id=None)
 
             assert async_to_sync.called
@@ -299,7 +488,7 @@ class TestTask:
             assert task.review_valid
 
     def test_finalize_submit_review__delete_org(
-        self, task_factory, scratch_org_factory
+        self, task_factory, commit_factory, scratch_org_factory
     ):
         now = datetime(2020, 12, 31, 12, 0)
         with ExitStack() as stack:
@@ -307,7 +496,8 @@ class TestTask:
                 patch("metecho.api.model_mixins.async_to_sync")
             )
 
-            task = task_factory(commits=[{"id": "123"}])
+            task = task_factory()
+            commit_factory(task=task, sha="123")
             scratch_org = scratch_org_factory(task=task, org_type=SCRATCH_ORG_TYPES.QA)
             scratch_org.queue_delete = MagicMock()
             task.finalize_submit_review(
@@ -356,38 +546,34 @@ class TestTask:
         Task.objects.all().delete()
         assert task.scratchorg_set.active().count() == 0
 
-    def test_get_all_users_in_commits(self, task_factory):
-        task = task_factory(
-            commits=[
-                {
-                    "id": "123",
-                    "author": {
-                        "name": "Name 1",
-                        "email": "name1@example.com",
-                        "username": "name1",
-                        "avatar_url": "https://example.com/",
-                    },
-                },
-                {
-                    "id": "456",
-                    "author": {
-                        "name": "Name 2",
-                        "email": "name2@example.com",
-                        "username": "name2",
-                        "avatar_url": "https://example.com/",
-                    },
-                },
-                {
-                    "id": "789",
-                    "author": {
-                        "name": "Name 1",
-                        "email": "name1@example.com",
-                        "username": "name1",
-                        "avatar_url": "https://example.com/",
-                    },
-                },
-            ],
-        )
+    def test_newest_commits_per_task(self, task_factory, commit_factory):
+        task1 = task_factory()
+        task2 = task_factory()
+        for sha in ("1", "2", "3"):
+            commit_factory(task=task1, sha=sha)
+        commit_factory(task=task2, sha="4")
+
+        commits = Commit.objects.newest_per_task(2)
+        assert [commit.sha for commit in commits.filter(task=task1)] == ["3", "2"]
+        assert [commit.sha for commit in commits.filter(task=task2)] == ["4"]
+
+    def test_get_all_users_in_commits(self, task_factory, commit_factory):
+        task = task_factory()
+        author1 = {
+            "author_name": "Name 1",
+            "author_email": "name1@example.com",
+            "author_username": "name1",
+            "author_avatar_url": "https://example.com/",
+        }
+        author2 = {
+            "author_name": "Name 2",
+            "author_email": "name2@example.com",
+            "author_username": "name2",
+            "author_avatar_url": "https://example.com/",
+        }
+        commit_factory(task=task, sha="123", **author2)
+        commit_factory(task=task, sha="456", **author1)
+        commit_factory(task=task, sha="789", **author1)
 
         expected = [
             {
@@ -406,6 +592,48 @@ class TestTask:
 
         assert task.get_all_users_in_commits == expected
 
+    def test_get_latest_commit_sha(self, task_factory, commit_factory):
+        task = task_factory(origin_sha="origin")
+        assert task.get_latest_commit_sha() == "origin"
+
+        commit_factory(task=task, sha="older")
+        commit_factory(task=task, sha="newer")
+        assert task.get_latest_commit_sha() == "newer"
+
+    def test_add_commits(self, task_factory, commit_factory):
+        task = task_factory()
+        commit_factory(task=task, sha="abc")
+        commits = [
+            {
+                "id": sha,
+                "timestamp": "2019-11-20T21:32:53+00:00",
+                "author": {
+                    "name": "Test",
+                    "email": "test@example.com",
+                    "username": "test123",
+                    "avatar_url": "https://avatar_url/",
+                },
+                "message": "Message",
+                "url": "https://github.com/test/user/foo",
+            }
+            for sha in ("abc", "def", "ghi")
+        ]
+        with ExitStack() as stack:
+            stack.enter_context(patch.object(task, "update_has_unmerged_commits"))
+            stack.enter_context(patch("metecho.api.model_mixins.async_to_sync"))
+            task.add_commits(commits)
+            # Redelivering the same hook is harmless:
+            task.add_commits(commits)
+
+        assert list(task.commits.values_list("sha", flat=True)) == [
+            "ghi",
+            "def",
+            "abc",
+        ]
+        commit = task.commits.get(sha="ghi")
+        assert commit.author_avatar_url == "https://avatar_url/"
+        assert commit.timestamp is not None
+
     def test_add_reviewer(self, task_factory):
         task = task_factory()
         task.add_reviewer({"login": "login", "avatar_url": "https://example.com"})
@@ -424,7 +652,7 @@ class TestUser:
         with ExitStack() as stack:
             gh = stack.enter_context(patch("metecho.api.models.gh"))
             async_to_sync = stack.enter_context(
-                patch("metecho.api.models.async_to_sync")
+                patch("metecho.api.model_mixins.async_to_sync")
             )
             gh.get_all_org_repos.return_value = [
                 MagicMock(id=8558, html_url="https://example.com/")
@@ -438,7 +666,7 @@ class TestUser:
         with ExitStack() as stack:
             gh = stack.enter_context(patch("metecho.api.models.gh"))
             async_to_sync = stack.enter_context(
-                patch("metecho.api.models.async_to_sync")
+                patch("metecho.api.model_mixins.async_to_sync")
             )
             gh.get_all_org_repos.return_value = [
                 MagicMock(id=1, html_url="https://example.com/")
@@ -453,6 +681,7 @@ class TestUser:
         assert user.org_id is not None
 
         user.socialaccount_set.all().delete()
+        user.refresh_from_db()
         assert user.org_id is None
 
     def test_org_name(self, user_factory, social_account_factory):
@@ -461,6 +690,7 @@ class TestUser:
         assert user.org_name == "Sample Org"
 
         user.socialaccount_set.all().delete()
+        user.refresh_from_db()
         assert user.org_name is None
 
     def test_org_name__global_devhub(
@@ -477,6 +707,7 @@ class TestUser:
         assert user.org_type == "Developer Edition"
 
         user.socialaccount_set.all().delete()
+        user.refresh_from_db()
         assert user.org_type is None
 
     def test_org_type__global_devhub(
@@ -496,6 +727,7 @@ class TestUser:
         )
 
         user.socialaccount_set.all().delete()
+        user.refresh_from_db()
         assert user.salesforce_account is None
 
     def test_salesforce_account(self, user_factory, social_account_factory):
@@ -508,11 +740,13 @@ class TestUser:
         )
 
         user.socialaccount_set.all().delete()
+        user.refresh_from_db()
         assert user.salesforce_account is None
 
     def test_avatar_url(self, user_factory, social_account_factory):
         user = user_factory()
         user.socialaccount_set.all().delete()
+        user.refresh_from_db()
         assert not user.avatar_url
 
         social_account_factory(
@@ -520,6 +754,7 @@ class TestUser:
             provider="github",
             extra_data={"avatar_url": "https://example.com/avatar/"},
         )
+        user.refresh_from_db()
         assert user.avatar_url == "https://example.com/avatar/"
 
     def test_sf_username(self, user_factory, social_account_factory):
@@ -549,6 +784,7 @@ class TestUser:
         assert user.instance_url == "https://example.com"
 
         user.socialaccount_set.all().delete()
+        user.refresh_from_db()
         assert user.instance_url is None
 
     def test_sf_token(self, user_factory, social_account_factory):
@@ -557,6 +793,7 @@ class TestUser:
         assert user.sf_token == ("0123456789abcdef", "secret.0123456789abcdef")
 
         user.socialaccount_set.all().delete()
+        user.refresh_from_db()
         assert user.sf_token == (None, None)
 
     def test_sf_token__invalid(
@@ -570,6 +807,7 @@ class TestUser:
         assert user.sf_token == (None, None)
 
         user.socialaccount_set.all().delete()
+        user.refresh_from_db()
         assert user.sf_token == (None, None)
 
     def test_valid_token_for(self, user_factory, social_account_factory):
@@ -580,6 +818,7 @@ class TestUser:
         user.socialaccount_set.filter(
             provider="salesforce"
         ).first().socialtoken_set.all().delete()
+        user.refresh_from_db()
         assert user.valid_token_for is None
 
     def test_valid_token_for__use_global_devhub(
@@ -590,6 +829,49 @@ class TestUser:
         social_account_factory(user=user, provider="salesforce")
         assert user.valid_token_for is None
 
+    def test_social_accounts_loaded_once(
+        self, user_factory, social_account_factory, django_assert_num_queries
+    ):
+        user = user_factory()
+        social_account_factory(user=user, provider="salesforce")
+        user.refresh_from_db()
+
+        # One query for the accounts, one for their tokens:
+        with django_assert_num_queries(2):
+            assert user.github_account is not None
+            assert user.org_name == "Sample Org"
+            assert user.full_org_type == "Developer"
+            assert user.instance_url == "https://example.com"
+            assert all(user.sf_token)
+            assert user.gh_token
+
+    def test_social_accounts_cleared_on_invalidate(
+        self, user_factory, social_account_factory
+    ):
+        user = user_factory()
+        social_account_factory(user=user, provider="salesforce")
+        assert user.salesforce_account is not None
+
+        user.invalidate_salesforce_credentials()
+        assert user.salesforce_account is None
+
+    def test_social_accounts_not_pickled(self, user_factory):
+        user = user_factory()
+        assert user.gh_token
+
+        unpickled = pickle.loads(pickle.dumps(user))
+
+        assert user.gh_token.encode() not in pickle.dumps(user)
+        assert "socialaccount_set" not in unpickled._prefetched_objects_cache
+        # The original instance keeps its cache:
+        assert "socialaccount_set" in user._prefetched_objects_cache
+        assert unpickled.gh_token == user.gh_token
+
+    def test_gh_token__missing(self, user_factory):
+        user = user_factory(socialaccount_set=[])
+        with pytest.raises(SocialAccount.DoesNotExist):
+            user.gh_token
+
     def test_full_org_type(self, user_factory, social_account_factory):
         user = user_factory(socialaccount_set=[])
         social_account_factory(
@@ -792,6 +1074,33 @@ class TestScratchOrg:
             scratch_org.queue_delete(originating_user_id=None)
             assert delete_scratch_org_job.delay.called
 
+    def test_queue_delete__bulk(self, scratch_org_factory):
+        queued = scratch_org_factory(last_modified_at=now())
+        provisioning = scratch_org_factory()
+        with ExitStack() as stack:
+            async_to_sync = stack.enter_context(
+                patch("metecho.api.model_mixins.async_to_sync")
+            )
+            delete_scratch_orgs_job = stack.enter_context(
+                patch("metecho.api.jobs.delete_scratch_orgs_job")
+            )
+
+            ScratchOrg.objects.all().queue_delete(originating_user_id=None)
+
+            (scratch_org_ids,), _ = delete_scratch_orgs_job.delay.call_args
+            assert set(scratch_org_ids) == {str(queued.id), str(provisioning.id)}
+            (messages,), _ = async_to_sync.return_value.call_args
+            assert [message.id for message in messages] == [str(queued.id)]
+        queued.refresh_from_db()
+        provisioning.refresh_from_db()
+        assert queued.delete_queued_at is not None
+        assert provisioning.delete_queued_at is None
+
+    def test_queue_delete__bulk_empty(self):
+        with patch("metecho.api.jobs.delete_scratch_orgs_job") as job:
+            ScratchOrg.objects.all().queue_delete(originating_user_id=None)
+            assert not job.delay.called
+
     def test_notify_delete(self, scratch_org_factory):
         with ExitStack() as stack:
             async_to_sync = stack.enter_context(
@@ -899,3 +1208,55 @@ def test_login_handler(user_factory):
     user.queue_refresh_repositories = MagicMock()
     user_logged_in_handler(None, user=user)
     user.queue_refresh_repositories.assert_called_once()
+
+
+@pytest.mark.django_db
+class TestActiveListIndexes:
+    """
+    With sequential scans priced out, the list and name-uniqueness queries
+    should be answerable from the partial indexes on active rows.
+    """
+
+    def explain(self, queryset):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        return queryset.explain()
+
+    def test_epic_list(self, epic_factory):
+        epic = epic_factory()
+        plan = self.explain(
+            Epic.objects.active()
+            .filter(project=epic.project)
+            .order_by("status_rank", "-created_at", "name")
+        )
+        assert "epic_active_list_idx" in plan
+
+    def test_epic_name(self, epic_factory):
+        epic = epic_factory()
+        plan = self.explain(
+            Epic.objects.active().filter(project=epic.project, name__iexact="Epic")
+        )
+        assert "epic_active_name_ci_idx" in plan
+
+    def test_task_list(self, task_factory):
+        task = task_factory()
+        plan = self.explain(
+            Task.objects.active().filter(epic=task.epic).order_by("-created_at", "name")
+        )
+        assert "task_active_list_idx" in plan
+
+    def test_task_name(self, task_factory):
+        task = task_factory()
+        plan = self.explain(
+            Task.objects.active().filter(epic=task.epic, name__iexact="Task")
+        )
+        assert "task_active_name_ci_idx" in plan
+
+    def test_scratch_org_by_task(self, scratch_org_factory):
+        scratch_org = scratch_org_factory()
+        plan = self.explain(
+            ScratchOrg.objects.active().filter(
+                task=scratch_org.task, org_type=SCRATCH_ORG_TYPES.Dev
+            )
+        )
+        assert "scratchorg_active_task_idx" in plan
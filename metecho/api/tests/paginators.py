@@ -0,0 +1,83 @@
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+
+from ..models import Project
+from ..paginators import CustomPaginator, KeysetPaginator
+
+
+def _paginate(rf, queryset, cursor=""):
+    paginator = CustomPaginator()
+    paginator.page_size = 2
+    request = Request(rf.get("/", {"cursor": cursor}))
+    page = paginator.paginate_queryset(queryset, request)
+    return page, paginator.get_paginated_response([obj.name for obj in page]).data
+
+
+def _cursor(link):
+    return parse_qs(urlparse(link).query)["cursor"][0]
+
+
+@pytest.mark.django_db
+class TestKeysetPaginator:
+    def test_walk(self, rf, project_factory):
+        for name in ("e", "b", "d", "a", "c"):
+            project_factory(name=name)
+        queryset = Project.objects.all()
+
+        _, data = _paginate(rf, queryset)
+        assert "count" not in data
+        names = list(data["results"])
+        pages = [data]
+        while data["next"]:
+            _, data = _paginate(rf, queryset, cursor=_cursor(data["next"]))
+            names.extend(data["results"])
+            pages.append(data)
+        assert names == ["a", "b", "c", "d", "e"]
+        assert pages[0]["previous"] is None
+
+        _, data = _paginate(rf, queryset, cursor=_cursor(pages[-1]["previous"]))
+        assert data["results"] == ["c", "d"]
+        assert data["next"]
+
+    def test_stable_across_inserts(self, rf, project_factory):
+        for name in ("b", "d", "f"):
+            project_factory(name=name)
+        queryset = Project.objects.all()
+
+        _, data = _paginate(rf, queryset)
+        assert data["results"] == ["b", "d"]
+        # A row inserted before the cursor doesn't shift the next page:
+        project_factory(name="a")
+        _, data = _paginate(rf, queryset, cursor=_cursor(data["next"]))
+        assert data["results"] == ["f"]
+
+    def test_ties(self, rf, project_factory):
+        projects = [project_factory(branch_prefix="same") for _ in range(3)]
+        queryset = Project.objects.order_by("branch_prefix")
+
+        page, data = _paginate(rf, queryset)
+        seen = list(page)
+        page, _ = _paginate(rf, queryset, cursor=_cursor(data["next"]))
+        seen.extend(page)
+        assert sorted(obj.pk for obj in seen) == sorted(obj.pk for obj in projects)
+
+    def test_invalid_cursor(self, rf):
+        with pytest.raises(NotFound):
+            _paginate(rf, Project.objects.all(), cursor="not a cursor")
+
+    def test_get_ordering(self):
+        paginator = KeysetPaginator()
+        assert paginator.get_ordering(Project.objects.all()) == ["name", "pk"]
+        assert paginator.get_ordering(Project.objects.order_by("-id")) == ["-id"]
+
+
+@pytest.mark.django_db
+def test_custom_paginator__page_numbers(rf, project_factory):
+    project_factory()
+    paginator = CustomPaginator()
+    request = Request(rf.get("/"))
+    paginator.paginate_queryset(Project.objects.all(), request)
+    assert paginator.get_paginated_response([]).data["count"] == 1
@@ -1,9 +1,11 @@
+from contextlib import ExitStack
+from datetime import datetime, timezone
 from unittest.mock import MagicMock, patch
 
 import pytest
 from channels.db import database_sync_to_async
 
-from ..push import report_error, report_scratch_org_error
+from ..push import PushMessage, push_messages, report_error, report_scratch_org_error
 
 
 class AsyncMock(MagicMock):
@@ -62,3 +64,66 @@ async def test_report_scratch_org_error__dict():
             originating_user_id=None,
         )
         assert push_message_about_instance.called
+
+
+@pytest.mark.asyncio
+async def test_push_messages():
+    channel_layer = MagicMock(group_send=AsyncMock())
+    with ExitStack() as stack:
+        stack.enter_context(
+            patch(f"{PATCH_ROOT}.get_channel_layer", return_value=channel_layer)
+        )
+        get_set_message_semaphores = stack.enter_context(
+            patch(
+                f"{PATCH_ROOT}.get_set_message_semaphores",
+                new=AsyncMock(return_value=[True, False]),
+            )
+        )
+        message = {"type": "SOFT_DELETE", "payload": {}}
+        edited_at = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        await push_messages(
+            [
+                PushMessage("task", "abc", message, False, None),
+                PushMessage("task", "def", message, False, edited_at),
+                PushMessage("task", "def", message, False, edited_at),
+            ]
+        )
+
+    # Only the versioned messages are deduplicated:
+    assert len(get_set_message_semaphores.call_args[0][1]) == 2
+    groups = {call[0][0] for call in channel_layer.group_send.call_args_list}
+    assert len(groups) == 2
+    assert all("task" in group for group in groups)
+    versions = {
+        call[0][1]["version"] for call in channel_layer.group_send.call_args_list
+    }
+    assert len(versions) == 2
+    edited_ats = [
+        call[0][1]["edited_at"] for call in channel_layer.group_send.call_args_list
+    ]
+    assert edited_ats == [None, "2020-01-01T00:00:00+00:00"]
+
+
+@pytest.mark.asyncio
+async def test_push_messages__repeated_unversioned():
+    channel_layer = MagicMock(group_send=AsyncMock())
+    with ExitStack() as stack:
+        stack.enter_context(
+            patch(f"{PATCH_ROOT}.get_channel_layer", return_value=channel_layer)
+        )
+        get_set_message_semaphores = stack.enter_context(
+            patch(
+                f"{PATCH_ROOT}.get_set_message_semaphores",
+                new=AsyncMock(return_value=[]),
+            )
+        )
+        message = {"type": "TASK_CREATE_PR_FAILED", "payload": {}}
+        await push_messages(
+            [
+                PushMessage("task", "abc", message, False, None),
+                PushMessage("task", "abc", message, False, None),
+            ]
+        )
+
+    get_set_message_semaphores.assert_called_once_with(channel_layer, [])
+    assert channel_layer.group_send.call_count == 2
@@ -269,9 +269,12 @@ class TestTaskSerializer:
         serializer.save()
         assert Task.objects.count() == 1
 
-    def test_update(self, rf, user_factory, task_factory, scratch_org_factory):
+    def test_update(
+        self, rf, user_factory, task_factory, commit_factory, scratch_org_factory
+    ):
         user = user_factory()
-        task = task_factory(commits=["abc123"])
+        task = task_factory()
+        commit_factory(task=task, sha="abc123")
         so1 = scratch_org_factory(task=task, org_type=SCRATCH_ORG_TYPES.Dev)
         so2 = scratch_org_factory(task=task, org_type=SCRATCH_ORG_TYPES.QA)
         data = {
@@ -299,8 +302,9 @@ class TestTaskSerializer:
         assert so1.deleted_at is not None
         assert so2.deleted_at is not None
 
-    def test_update__no_user(self, task_factory, scratch_org_factory):
-        task = task_factory(commits=["abc123"])
+    def test_update__no_user(self, task_factory, commit_factory, scratch_org_factory):
+        task = task_factory()
+        commit_factory(task=task, sha="abc123")
         so1 = scratch_org_factory(task=task, org_type=SCRATCH_ORG_TYPES.Dev)
         so2 = scratch_org_factory(task=task, org_type=SCRATCH_ORG_TYPES.QA)
         data = {
@@ -376,14 +380,31 @@ class TestTaskSerializer:
         serializer = TaskSerializer(task)
         assert serializer.data["pr_url"] is None
 
-    def test_queues_reassign(self, task_factory, scratch_org_factory, user_factory):
+    def test_commits(self, settings, task_factory, commit_factory):
+        settings.TASK_COMMITS_SUMMARY_SIZE = 2
+        task = task_factory()
+        commit_factory(task=task, sha="abc")
+        commit_factory(task=task, sha="def", author_name="Name")
+        commit_factory(task=task, sha="ghi")
+        serializer = TaskSerializer(task)
+        commits = serializer.data["commits"]
+        assert [commit["id"] for commit in commits] == ["ghi", "def"]
+        assert commits[1]["author"] == {
+            "name": "Name",
+            "email": "",
+            "username": "username",
+            "avatar_url": "",
+        }
+
+    def test_queues_reassign(
+        self, task_factory, commit_factory, scratch_org_factory, user_factory
+    ):
         user = user_factory()
         new_user = user_factory(devhub_username="test")
         id_ = user.github_account.uid
         new_id = new_user.github_account.uid
-        task = task_factory(
-            assigned_dev={"id": id_}, assigned_qa={"id": id_}, commits=["abc123"]
-        )
+        task = task_factory(assigned_dev={"id": id_}, assigned_qa={"id": id_})
+        commit_factory(task=task, sha="abc123")
         scratch_org_factory(
             owner_sf_username="test",
             task=task,
@@ -515,3 +536,20 @@ class TestScratchOrgSerializer:
         r = rf.get("/")
         serializer = ScratchOrgSerializer(instances, many=True, context={"request": r})
         assert all(instance["ignored_changes"] == {} for instance in serializer.data)
+
+
+@pytest.mark.django_db
+def test_for_serialization(
+    task_factory, commit_factory, rf, user_factory, django_assert_num_queries
+):
+    task = task_factory()
+    for sha in ("1", "2", "3"):
+        commit_factory(task=task, sha=sha)
+    request = rf.get("/")
+    request.user = user_factory()
+
+    task = Task.objects.for_serialization().get(pk=task.pk)
+    with django_assert_num_queries(0):
+        data = TaskSerializer(task, context={"request": request}).data
+    assert data["slug"] == task.slug
+    assert [commit["id"] for commit in data["commits"]] == ["3", "2", "1"]
@@ -1,13 +1,24 @@
 import json
 from collections import namedtuple
 from contextlib import ExitStack
+from datetime import timedelta
 from unittest.mock import MagicMock, patch
 
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.timezone import now
 from github3.exceptions import ResponseError
 
-from ..models import SCRATCH_ORG_TYPES
+from ..jobs import process_hook_event
+from ..models import (
+    HOOK_EVENT_STATUSES,
+    SCRATCH_ORG_TYPES,
+    Epic,
+    GitHubHookEvent,
+    Project,
+)
 
 Branch = namedtuple("Branch", ["name"])
 
@@ -139,6 +150,8 @@ class TestProjectView:
             get_repo_info.side_effect = ResponseError(MagicMock())
             response = client.get(reverse("project-list"))
 
+        # Missing repo_ids are looked up in the background, not per request:
+        assert not get_repo_info.called
         assert response.status_code == 200
         assert response.json() == {
             "count": 1,
@@ -178,6 +191,7 @@ class TestHookView:
         task_factory,
     ):
         settings.GITHUB_HOOK_SECRET = b""
+        settings.HOOK_PUSH_COALESCE_SECONDS = 0
         with ExitStack() as stack:
             gh = stack.enter_context(patch("metecho.api.models.gh"))
             gh.get_repo_info.return_value = MagicMock(
@@ -193,7 +207,6 @@ class TestHookView:
                     "compare_commits.return_value": MagicMock(ahead_by=0),
                 }
             )
-            gh.normalize_commit.return_value = "1234abcd"
 
             project = project_factory(repo_id=123)
             git_hub_repository_factory(repo_id=123)
@@ -203,6 +216,10 @@ class TestHookView:
             refresh_commits_job = stack.enter_context(
                 patch("metecho.api.jobs.refresh_commits_job")
             )
+            process_hook_event_job = stack.enter_context(
+                patch("metecho.api.jobs.process_hook_event_job")
+            )
+            process_hook_event_job.delay.side_effect = process_hook_event
             response = client.post(
                 reverse("hook"),
                 json.dumps(
@@ -237,8 +254,7 @@ class TestHookView:
             )
             assert response.status_code == 202, response.content
             assert not refresh_commits_job.delay.called
-            task.refresh_from_db()
-            assert len(task.commits) == 1
+            assert task.commits.count() == 1
 
     def test_400__no_handler(
         self,
@@ -261,9 +277,17 @@ class TestHookView:
         self, settings, client, project_factory, git_hub_repository_factory
     ):
         settings.GITHUB_HOOK_SECRET = b""
+        settings.HOOK_PUSH_COALESCE_SECONDS = 0
         project_factory(repo_id=123)
         git_hub_repository_factory(repo_id=123)
-        with patch("metecho.api.jobs.refresh_commits_job") as refresh_commits_job:
+        with ExitStack() as stack:
+            refresh_commits_job = stack.enter_context(
+                patch("metecho.api.jobs.refresh_commits_job")
+            )
+            process_hook_event_job = stack.enter_context(
+                patch("metecho.api.jobs.process_hook_event_job")
+            )
+            process_hook_event_job.delay.side_effect = process_hook_event
             response = client.post(
                 reverse("hook"),
                 json.dumps(
@@ -284,6 +308,43 @@ class TestHookView:
             assert response.status_code == 202, response.content
             assert refresh_commits_job.delay.called
 
+    def test_202__redelivery(
+        self, settings, client, project_factory, git_hub_repository_factory
+    ):
+        settings.GITHUB_HOOK_SECRET = b""
+        project_factory(repo_id=123)
+        git_hub_repository_factory(repo_id=123)
+        kwargs = {
+            "data": json.dumps(
+                {
+                    "ref": "refs/heads/main",
+                    "forced": True,
+                    "repository": {"id": 123},
+                    "commits": [],
+                    "sender": {},
+                }
+            ),
+            "content_type": "application/json",
+            "HTTP_X_HUB_SIGNATURE": "sha1=7724a4777b8215f158efbe74f05ce6eaa5ec41a8",
+            "HTTP_X_GITHUB_EVENT": "push",
+            "HTTP_X_GITHUB_DELIVERY": "some-delivery-id",
+        }
+        with patch("metecho.api.jobs.process_hook_event_job") as process_job:
+            first = client.post(reverse("hook"), **kwargs)
+            second = client.post(reverse("hook"), **kwargs)
+            assert process_job.delay.call_count == 1
+
+            # Failed deliveries are retried when GitHub redelivers them:
+            GitHubHookEvent.objects.update(status=HOOK_EVENT_STATUSES.Failed)
+            third = client.post(reverse("hook"), **kwargs)
+            assert process_job.delay.call_count == 2
+
+        assert first.status_code == second.status_code == third.status_code == 202
+        hook_event = GitHubHookEvent.objects.get()
+        assert hook_event.delivery_id == "some-delivery-id"
+        assert hook_event.repo_id == 123
+        assert hook_event.status == HOOK_EVENT_STATUSES.Received
+
     def test_400__push_error(
         self, settings, client, project_factory, git_hub_repository_factory
     ):
@@ -710,6 +771,38 @@ class TestTaskView:
 
         assert response.status_code == 400
 
+    def test_commits(self, client, task_factory, commit_factory):
+        task = task_factory()
+        for sha in ("abc", "def", "ghi"):
+            commit_factory(task=task, sha=sha)
+
+        with patch("metecho.api.paginators.CustomPaginator.page_size", 2):
+            response = client.get(reverse("task-commits", kwargs={"pk": str(task.id)}))
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["count"] == 3
+        assert [commit["id"] for commit in data["results"]] == ["ghi", "def"]
+        assert data["next"] is not None
+
+    def test_commits__beyond_summary(
+        self, settings, client, task_factory, commit_factory
+    ):
+        settings.TASK_COMMITS_SUMMARY_SIZE = 2
+        task = task_factory()
+        for sha in ("abc", "def", "ghi", "jkl"):
+            commit_factory(task=task, sha=sha)
+
+        with patch("metecho.api.paginators.CustomPaginator.page_size", 3):
+            url = reverse("task-commits", kwargs={"pk": str(task.id)})
+            response = client.get(url)
+            next_response = client.get(response.json()["next"])
+
+        data = response.json()
+        assert data["count"] == 4
+        assert [commit["id"] for commit in data["results"]] == ["jkl", "ghi", "def"]
+        assert [commit["id"] for commit in next_response.json()["results"]] == ["abc"]
+
     def test_can_reassign__good(self, client, task_factory):
         task = task_factory()
 
@@ -750,3 +843,212 @@ class TestEpicView:
 
             assert response.status_code == 202, response.json()
             assert available_task_org_config_names_job.delay.called
+
+
+@pytest.mark.django_db
+class TestQueryCounts:
+    """
+    List endpoints must load related rows in a bounded number of queries,
+    however many items they return.
+    """
+
+    def count_queries(self, client, url):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        assert response.status_code == 200
+        return len(context)
+
+    def assert_bounded(self, client, url, make_items):
+        make_items(2)
+        few = self.count_queries(client, url)
+        make_items(18)
+        assert self.count_queries(client, url) == few
+
+    def test_users(self, client, user_factory):
+        def make_items(count):
+            for _ in range(count):
+                user_factory()
+
+        self.assert_bounded(client, reverse("user-list"), make_items)
+
+    def test_projects(self, client, project_factory, git_hub_repository_factory):
+        def make_items(count):
+            for _ in range(count):
+                project = project_factory()
+                git_hub_repository_factory(user=client.user, repo_id=project.repo_id)
+
+        self.assert_bounded(client, reverse("project-list"), make_items)
+
+    def test_epics(self, client, project_factory, epic_factory):
+        project = project_factory()
+
+        def make_items(count):
+            for _ in range(count):
+                epic_factory(project=project)
+
+        self.assert_bounded(
+            client, f"{reverse('epic-list')}?project={project.id}", make_items
+        )
+
+    def test_tasks(self, client, epic_factory, task_factory, commit_factory):
+        epic = epic_factory()
+
+        def make_items(count):
+            for _ in range(count):
+                task = task_factory(epic=epic)
+                commit_factory(task=task)
+                commit_factory(task=task)
+
+        self.assert_bounded(
+            client, f"{reverse('task-list')}?epic={epic.id}", make_items
+        )
+
+    def test_scratch_orgs(self, client, task_factory, scratch_org_factory):
+        task = task_factory()
+
+        def make_items(count):
+            for _ in range(count):
+                scratch_org_factory(task=task, org_type=SCRATCH_ORG_TYPES.QA)
+
+        self.assert_bounded(
+            client, f"{reverse('scratch-org-list')}?task={task.id}", make_items
+        )
+
+
+@pytest.mark.django_db
+class TestOptionalPagination:
+    def test_tasks(self, client, epic_factory, task_factory):
+        epic = epic_factory()
+        task_factory(epic=epic)
+        task_factory(epic=epic)
+
+        response = client.get(reverse("task-list"), {"epic": str(epic.id)})
+        assert len(response.json()) == 2
+
+        response = client.get(reverse("task-list"), {"epic": str(epic.id), "page": 1})
+        assert response.json()["count"] == 2
+        assert len(response.json()["results"]) == 2
+
+    def test_scratch_orgs(self, client, task_factory, scratch_org_factory):
+        task = task_factory()
+        scratch_org_factory(task=task, org_type=SCRATCH_ORG_TYPES.QA)
+
+        response = client.get(reverse("scratch-org-list"), {"task": str(task.id)})
+        assert len(response.json()) == 1
+
+        response = client.get(
+            reverse("scratch-org-list"), {"task": str(task.id), "cursor": ""}
+        )
+        assert response.json()["next"] is None
+        assert len(response.json()["results"]) == 1
+
+    def test_scratch_orgs__ordered(self, client, task_factory, scratch_org_factory):
+        task = task_factory()
+        orgs = [
+            scratch_org_factory(task=task, org_type=SCRATCH_ORG_TYPES.QA)
+            for _ in range(3)
+        ]
+
+        with patch("metecho.api.paginators.CustomPaginator.page_size", 2):
+            response = client.get(
+                reverse("scratch-org-list"), {"task": str(task.id), "page": 1}
+            )
+            next_response = client.get(response.json()["next"])
+
+        ids = [org["id"] for org in response.json()["results"]]
+        ids += [org["id"] for org in next_response.json()["results"]]
+        assert ids == [str(org.id) for org in reversed(orgs)]
+
+
+@pytest.mark.django_db
+class TestConditionalGet:
+    def test_list__not_modified(self, client, project_factory, epic_factory):
+        project = project_factory()
+        epic_factory(project=project)
+        url = reverse("epic-list") + f"?project={project.id}"
+        etag = client.get(url)["ETag"]
+
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == 304
+        assert response["ETag"] == etag
+        # Just the aggregate:
+        assert len([q for q in context if "api_epic" in q["sql"]]) == 1
+
+    def test_list__changed(self, client, project_factory, epic_factory):
+        project = project_factory()
+        epic = epic_factory(project=project)
+        url = reverse("epic-list") + f"?project={project.id}"
+        etag = client.get(url)["ETag"]
+
+        epic.name = "Renamed"
+        epic.save()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+
+    def test_list__related_changed(self, client, project_factory, epic_factory):
+        project = project_factory()
+        epic_factory(project=project)
+        url = reverse("epic-list") + f"?project={project.id}"
+        etag = client.get(url)["ETag"]
+
+        project.repo_name = "renamed"
+        project.save()
+
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    def test_list__deleted(self, client, task_factory):
+        task = task_factory()
+        task_factory(epic=task.epic)
+        url = reverse("task-list") + f"?epic={task.epic.id}"
+        etag = client.get(url)["ETag"]
+
+        task.delete()
+
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    def test_list__rows_swapped(self, client, project_factory, epic_factory):
+        project = project_factory()
+        epic_factory(project=project)
+        old = epic_factory(project=project)
+        Epic.objects.filter(id=old.id).update(edited_at=now() - timedelta(days=1))
+        project.refresh_from_db()
+        url = reverse("epic-list") + f"?project={project.id}"
+        etag = client.get(url)["ETag"]
+
+        # Same count and latest edit, but a different set of rows:
+        Epic.objects.filter(id=old.id).update(deleted_at=now())
+        other = epic_factory(project=project)
+        Epic.objects.filter(id=other.id).update(edited_at=now() - timedelta(days=1))
+        Project.objects.filter(id=project.id).update(edited_at=project.edited_at)
+
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    def test_list__per_user(self, client, user_factory, scratch_org_factory):
+        scratch_org = scratch_org_factory(owner=client.user)
+        url = reverse("scratch-org-list") + f"?task={scratch_org.task.id}"
+        etag = client.get(url)["ETag"]
+
+        client.force_login(user_factory())
+
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    def test_retrieve__not_modified(self, client, task_factory):
+        task = task_factory()
+        url = reverse("task-detail", kwargs={"pk": str(task.id)})
+        response = client.get(url)
+        assert "Last-Modified" in response
+
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        assert response.status_code == 304
+
+    def test_retrieve__not_found(self, client, task_factory):
+        task = task_factory()
+        url = reverse("task-detail", kwargs={"pk": str(task.id)})
+        etag = client.get(url)["ETag"]
+        task.delete()
+
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 404
@@ -1,14 +1,20 @@
+from hashlib import md5
+from uuid import uuid4
+
 from allauth.socialaccount.models import SocialAccount
 from django.contrib.auth import get_user_model
-from django.db.models import Case, IntegerField, When
+from django.contrib.postgres.aggregates import StringAgg
+from django.db.models import Count, Max, TextField
+from django.db.models.functions import MD5, Cast
 from django.http import HttpResponseRedirect
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from django.utils.translation import gettext_lazy as _
 from django_filters.rest_framework import DjangoFilterBackend
-from github3.exceptions import ConnectionError, ResponseError
 from rest_framework import generics, mixins, status
 from rest_framework.decorators import action
-from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -17,13 +23,18 @@ from rest_framework.viewsets import GenericViewSet, ModelViewSet
 from . import gh
 from .authentication import GitHubHookAuthentication
 from .filters import EpicFilter, ProjectFilter, ScratchOrgFilter, TaskFilter
-from .hook_serializers import (
-    PrHookSerializer,
-    PrReviewHookSerializer,
-    PushHookSerializer,
+from .hook_serializers import HOOK_SERIALIZERS
+from .models import (
+    HOOK_EVENT_STATUSES,
+    SCRATCH_ORG_TYPES,
+    Commit,
+    Epic,
+    GitHubHookEvent,
+    Project,
+    ScratchOrg,
+    Task,
 )
-from .models import EPIC_STATUSES, SCRATCH_ORG_TYPES, Epic, Project, ScratchOrg, Task
-from .paginators import CustomPaginator
+from .paginators import CustomPaginator, OptionalPaginator
 from .serializers import (
     CanReassignSerializer,
     CommitSerializer,
@@ -34,6 +45,7 @@ from .serializers import (
     ProjectSerializer,
     ReviewSerializer,
     ScratchOrgSerializer,
+    TaskCommitSerializer,
     TaskSerializer,
 )
 
@@ -48,6 +60,87 @@ class CurrentUserObjectMixin:
         return self.get_queryset().get()
 
 
+class ConditionalGetMixin:
+    """
+    Answers list and retrieve requests with 304 Not Modified when the
+    client's copy is current. The validators come from one aggregate query
+    over the rows, before anything is loaded or serialized: the latest
+    ``edited_at`` of the rows and of any related rows serialized with them,
+    the number of rows, a hash of their ids (so a list that swapped rows
+    for older ones, e.g. when the user's access changed, isn't mistaken
+    for the same list) and the requesting user (some fields are only shown
+    to owners).
+
+    Lists only get an ETag, as rows leaving the list don't show up in any
+    timestamp; single objects also get a Last-Modified.
+    """
+
+    # Relations whose fields are serialized along with each object:
+    conditional_related = ()
+
+    etag = None
+    last_modified = None
+
+    def list(self, request, *args, **kwargs):
+        not_modified = self.not_modified(self.filter_queryset(self.get_queryset()))
+        if not_modified is not None:
+            return not_modified
+        return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        not_modified = self.not_modified(self.get_detail_queryset(), detail=True)
+        if not_modified is not None:
+            return not_modified
+        return super().retrieve(request, *args, **kwargs)
+
+    def get_detail_queryset(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+
+    def not_modified(self, queryset, *, detail=False):
+        fields = [
+            "edited_at",
+            *(f"{related}__edited_at" for related in self.conditional_related),
+        ]
+        pk_text = Cast("pk", TextField())
+        aggregates = queryset.order_by().aggregate(
+            count=Count("pk", distinct=True),
+            ids=MD5(StringAgg(pk_text, ",", distinct=True, ordering=pk_text)),
+            **{f"edited_at_{i}": Max(field) for i, field in enumerate(fields)},
+        )
+        if detail and not aggregates["count"]:
+            # Let retrieve raise the 404:
+            return None
+        timestamps = [
+            aggregates[f"edited_at_{i}"]
+            for i in range(len(fields))
+            if aggregates[f"edited_at_{i}"] is not None
+        ]
+        validators = [
+            getattr(self.request.user, "id", None),
+            aggregates["count"],
+            aggregates["ids"],
+            *(timestamp.isoformat() for timestamp in timestamps),
+        ]
+        digest = md5(repr(validators).encode("utf-8")).hexdigest()
+        self.etag = f"W/{quote_etag(digest)}"
+        if detail and timestamps:
+            self.last_modified = int(max(timestamps).timestamp())
+        return get_conditional_response(
+            self.request, etag=self.etag, last_modified=self.last_modified
+        )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.etag and response.status_code in (200, 304):
+            response["ETag"] = self.etag
+            if self.last_modified is not None:
+                response["Last-Modified"] = http_date(self.last_modified)
+        return response
+
+
 class CreatePrMixin:
     error_pr_exists = ""  # Implement this
 
@@ -62,7 +155,7 @@ class CreatePrMixin:
         instance.queue_create_pr(
             request.user,
             **serializer.validated_data,
-            originating_user_id=str(request.user.id)
+            originating_user_id=str(request.user.id),
         )
         return Response(
             self.get_serializer(instance).data, status=status.HTTP_202_ACCEPTED
@@ -73,20 +166,32 @@ class HookView(APIView):
     authentication_classes = (GitHubHookAuthentication,)
 
     def post(self, request):
-        # To support the various formats that GitHub can post to this endpoint:
-        serializers = {
-            "push": PushHookSerializer,
-            "pull_request": PrHookSerializer,
-            "pull_request_review": PrReviewHookSerializer,
-        }
-        serializer_class = serializers.get(request.META.get("HTTP_X_GITHUB_EVENT"))
+        event = request.META.get("HTTP_X_GITHUB_EVENT")
+        serializer_class = HOOK_SERIALIZERS.get(event)
         if serializer_class is None:
             return Response(status=status.HTTP_400_BAD_REQUEST)
         serializer = serializer_class(data=request.data)
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-
-        serializer.process_hook()
+        project = serializer.get_matching_project()
+        if not project:
+            raise NotFound(_("No matching project."))
+
+        # The actual processing talks to GitHub, and can easily outlast
+        # GitHub's hook timeout, so it happens in a job. A delivery without
+        # an id (which GitHub always sends) can't be deduplicated:
+        delivery_id = request.META.get("HTTP_X_GITHUB_DELIVERY") or str(uuid4())
+        hook_event, created = GitHubHookEvent.objects.get_or_create(
+            delivery_id=delivery_id,
+            defaults={
+                "event": event,
+                "repo_id": project.repo_id,
+                "ref": request.data.get("ref", "") if event == "push" else "",
+                "payload": request.data,
+            },
+        )
+        if created or hook_event.status == HOOK_EVENT_STATUSES.Failed:
+            hook_event.queue_process()
         return Response(status=status.HTTP_202_ACCEPTED)
 
 
@@ -137,10 +242,15 @@ class UserViewSet(mixins.RetrieveModelMixin, mixins.ListModelMixin, GenericViewS
     permission_classes = (IsAuthenticated,)
     serializer_class = MinimalUserSerializer
     pagination_class = CustomPaginator
-    queryset = User.objects.all()
+    queryset = User.objects.with_social_accounts()
 
 
-class ProjectViewSet(mixins.RetrieveModelMixin, mixins.ListModelMixin, GenericViewSet):
+class ProjectViewSet(
+    ConditionalGetMixin,
+    mixins.RetrieveModelMixin,
+    mixins.ListModelMixin,
+    GenericViewSet,
+):
     permission_classes = (IsAuthenticated,)
     serializer_class = ProjectSerializer
     filter_backends = (DjangoFilterBackend,)
@@ -149,15 +259,12 @@ class ProjectViewSet(mixins.RetrieveModelMixin, mixins.ListModelMixin, GenericVi
     model = Project
 
     def get_queryset(self):
+        # Projects still missing a repo_id are backfilled in the background
+        # by populate_repo_ids; until then they just aren't listed.
         repo_ids = self.request.user.repositories.values_list("repo_id", flat=True)
-
-        for project in Project.objects.filter(repo_id__isnull=True):
-            try:
-                project.get_repo_id()
-            except (ResponseError, ConnectionError):
-                pass
-
-        return Project.objects.filter(repo_id__isnull=False, repo_id__in=repo_ids)
+        return Project.objects.filter(
+            repo_id__isnull=False, repo_id__in=repo_ids
+        ).for_serialization()
 
     @action(detail=True, methods=["POST"])
     def refresh_github_users(self, request, pk=None):
@@ -188,26 +295,18 @@ class ProjectViewSet(mixins.RetrieveModelMixin, mixins.ListModelMixin, GenericVi
         return Response(data)
 
 
-class EpicViewSet(CreatePrMixin, ModelViewSet):
+class EpicViewSet(ConditionalGetMixin, CreatePrMixin, ModelViewSet):
     permission_classes = (IsAuthenticated,)
     serializer_class = EpicSerializer
+    conditional_related = ("project",)
     pagination_class = CustomPaginator
-    queryset = Epic.objects.active()
+    queryset = Epic.objects.active().for_serialization()
     filter_backends = (DjangoFilterBackend,)
     filterset_class = EpicFilter
     error_pr_exists = _("Epic has already been submitted for testing.")
 
     def get_queryset(self):
-        qs = super().get_queryset()
-        whens = [
-            When(status=EPIC_STATUSES.Review, then=0),
-            When(status=EPIC_STATUSES["In progress"], then=1),
-            When(status=EPIC_STATUSES.Planned, then=2),
-            When(status=EPIC_STATUSES.Merged, then=3),
-        ]
-        return qs.annotate(ordering=Case(*whens, output_field=IntegerField())).order_by(
-            "ordering", "-created_at", "name"
-        )
+        return super().get_queryset().order_by("status_rank", "-created_at", "name")
 
     @action(detail=True, methods=["POST"])
     def refresh_org_config_names(self, request, pk=None):
@@ -216,14 +315,26 @@ class EpicViewSet(CreatePrMixin, ModelViewSet):
         return Response(self.get_serializer(epic).data, status=status.HTTP_202_ACCEPTED)
 
 
-class TaskViewSet(CreatePrMixin, ModelViewSet):
+class TaskViewSet(ConditionalGetMixin, CreatePrMixin, ModelViewSet):
     permission_classes = (IsAuthenticated,)
     serializer_class = TaskSerializer
-    queryset = Task.objects.active()
+    conditional_related = ("epic", "epic__project")
+    pagination_class = OptionalPaginator
+    queryset = Task.objects.active().for_serialization()
     filter_backends = (DjangoFilterBackend,)
     filterset_class = TaskFilter
     error_pr_exists = _("Task has already been submitted for testing.")
 
+    @action(detail=True, methods=["GET"])
+    def commits(self, request, pk=None):
+        task = self.get_object()
+        paginator = CustomPaginator()
+        # Not task.commits.all(), which would be the prefetched summary:
+        commits = Commit.objects.filter(task=task)
+        page = paginator.paginate_queryset(commits, request, view=self)
+        serializer = TaskCommitSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
     @action(detail=True, methods=["POST"])
     def review(self, request, pk=None):
         serializer = ReviewSerializer(data=request.data)
@@ -262,9 +373,7 @@ class TaskViewSet(CreatePrMixin, ModelViewSet):
             "user",
             None,
         )
-        valid_commit = org and org.latest_commit == (
-            task.commits[0] if task.commits else task.origin_sha
-        )
+        valid_commit = org and org.latest_commit == task.get_latest_commit_sha()
         return Response(
             {
                 "can_reassign": bool(
@@ -278,6 +387,7 @@ class TaskViewSet(CreatePrMixin, ModelViewSet):
 
 
 class ScratchOrgViewSet(
+    ConditionalGetMixin,
     mixins.CreateModelMixin,
     mixins.RetrieveModelMixin,
     mixins.UpdateModelMixin,
@@ -287,7 +397,11 @@ class ScratchOrgViewSet(
 ):
     permission_classes = (IsAuthenticated,)
     serializer_class = ScratchOrgSerializer
-    queryset = ScratchOrg.objects.active()
+    pagination_class = OptionalPaginator
+    # ScratchOrg has no default ordering, and pages need a stable one:
+    queryset = (
+        ScratchOrg.objects.active().for_serialization().order_by("-created_at", "pk")
+    )
     filter_backends = (DjangoFilterBackend,)
     filterset_class = ScratchOrgFilter
 
@@ -316,7 +430,7 @@ class ScratchOrgViewSet(
 
     def list(self, request, *args, **kwargs):
         # XXX: This method is copied verbatim from
-        # rest_framework.mixins.RetrieveModelMixin, because I needed to
+        # rest_framework.mixins.ListModelMixin, because I needed to
         # insert the get_unsaved_changes line in the middle.
         queryset = self.filter_queryset(self.get_queryset())
 
@@ -336,8 +450,15 @@ class ScratchOrgViewSet(
                 force_get=force_get, originating_user_id=str(request.user.id)
             )
 
-        # XXX: If we ever paginate this endpoint, we will need to add
-        # pagination logic back in here.
+        # After queueing, which may have changed the orgs:
+        not_modified = self.not_modified(queryset)
+        if not_modified is not None:
+            return not_modified
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
 
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
@@ -362,6 +483,9 @@ class ScratchOrgViewSet(
             instance.queue_get_unsaved_changes(
                 force_get=force_get, originating_user_id=str(request.user.id)
             )
+        not_modified = self.not_modified(self.get_detail_queryset(), detail=True)
+        if not_modified is not None:
+            return not_modified
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
@@ -1,3 +1,5 @@
+from unittest.mock import patch
+
 import factory
 import pytest
 from allauth.socialaccount.models import SocialAccount, SocialApp, SocialToken
@@ -6,7 +8,7 @@ from pytest_factoryboy import register
 from rest_framework.test import APIClient
 from sfdo_template_helpers.crypto import fernet_encrypt
 
-from .api.models import Epic, GitHubRepository, Project, ScratchOrg, Task
+from .api.models import Commit, Epic, GitHubRepository, Project, ScratchOrg, Task
 
 User = get_user_model()
 
@@ -103,6 +105,16 @@ class TaskFactory(factory.django.DjangoModelFactory):
     org_config_name = "dev"
 
 
+@register
+class CommitFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Commit
+
+    task = factory.SubFactory(TaskFactory)
+    sha = factory.Sequence("{:040x}".format)
+    author_username = "username"
+
+
 @register
 class ScratchOrgFactory(factory.django.DjangoModelFactory):
     class Meta:
@@ -121,3 +133,21 @@ def client(user_factory):
     client.force_login(user)
     client.user = user
     return client
+
+
+@pytest.fixture(autouse=True)
+def run_on_commit_immediately(request):
+    """
+    Most tests run in a transaction that is rolled back at the end, so
+    on-commit callbacks (like sending push messages) would never run. Run
+    them right away instead, as in autocommit mode; tests using real
+    transactions get the real thing.
+    """
+    marker = request.node.get_closest_marker("django_db")
+    if marker and marker.kwargs.get("transaction"):
+        yield
+        return
+    with patch(
+        "django.db.transaction.on_commit", side_effect=lambda func, using=None: func()
+    ):
+        yield
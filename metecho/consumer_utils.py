@@ -3,24 +3,36 @@ We presume that Channels is operating over a Redis channel_layer here, and use i
 explicitly.
 """
 
-from base64 import b64encode
+from hashlib import blake2b
 from json import dumps
 
+SEMAPHORE_SECONDS = 2
 
-def message_to_hash(message):
-    message_hash = b64encode(dumps(message).encode("utf-8"))
-    return b"semaphore:" + message_hash
 
+def message_to_hash(message):
+    digest = blake2b(
+        dumps(message, sort_keys=True, default=str).encode("utf-8"), digest_size=16
+    ).digest()
+    return b"semaphore:" + digest
 
-async def get_set_message_semaphore(channel_layer, message):
-    """Set a semaphore in redis.
-    Used to prevent sending the same message twice within 2 seconds."""
-    msg_hash = message_to_hash(message)
-    async with channel_layer.connection(0) as connection:
-        return await connection.set(msg_hash, 1, expire=2, exist="SET_IF_NOT_EXIST")
 
+async def get_set_message_semaphores(channel_layer, messages):
+    """Set a semaphore in redis for each message, in one round trip.
+    Used to prevent sending the same message twice within 2 seconds, so the
+    messages must identify the state they are about (see push_messages).
 
-async def clear_message_semaphore(channel_layer, message):
-    msg_hash = message_to_hash(message)
+    Returns, for each message, whether it is new and should be sent. The
+    semaphores just expire, so receivers have nothing to clear.
+    """
+    if not messages:
+        return []
     async with channel_layer.connection(0) as connection:
-        return await connection.delete(msg_hash)
+        pipeline = connection.pipeline()
+        for message in messages:
+            pipeline.set(
+                message_to_hash(message),
+                1,
+                expire=SEMAPHORE_SECONDS,
+                exist="SET_IF_NOT_EXIST",
+            )
+        return [bool(result) for result in await pipeline.execute()]
@@ -1,21 +1,28 @@
-from copy import deepcopy
+import asyncio
+from collections import defaultdict
 from enum import Enum
+from urllib.parse import parse_qs
 
 from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import MultipleObjectsReturned, ObjectDoesNotExist
+from django.utils.dateparse import parse_datetime
 from django.utils.translation import gettext as _
 
 from .api.constants import CHANNELS_GROUP_NAME, LIST
-from .consumer_utils import clear_message_semaphore
+from .replica_routing import reading_from_replica, replica_configured
 
 KNOWN_MODELS = {"user", "project", "epic", "task", "scratchorg"}
+PUSH_HYDRATION_CACHE_PREFIX = "push-hydration"
 
 
 class Actions(Enum):
     Subscribe = "SUBSCRIBE"
     Unsubscribe = "UNSUBSCRIBE"
+    Resync = "RESYNC"
 
 
 class PushNotificationConsumer(AsyncJsonWebsocketConsumer):
@@ -24,7 +31,15 @@ class PushNotificationConsumer(AsyncJsonWebsocketConsumer):
     project's use case.
     """
 
+    use_deltas = False
+
     async def connect(self):
+        # Clients opt into delta payloads with ``?deltas=1``; see
+        # apply_delta_protocol:
+        query = parse_qs(self.scope.get("query_string", b"").decode("utf-8"))
+        self.use_deltas = query.get("deltas") == ["1"]
+        # (model name, id) -> (version, last model sent):
+        self.sent_models = {}
         await self.accept()
 
     async def notify(self, event):
@@ -42,17 +57,22 @@ class PushNotificationConsumer(AsyncJsonWebsocketConsumer):
                     'model_name': str,
                     'id': str,
                 },
+                'version': str (unique to this message, optional),
+                'edited_at': str (ISO timestamp of the instance, optional),
             })
         """
-        # Take lock out of redis for this message:
-        await clear_message_semaphore(self.channel_layer, event)
         if "content" in event:
-            message = await self.hydrate_message(event["content"])
+            message = await self.hydrate_message(
+                event["content"],
+                version=event.get("version"),
+                edited_at=event.get("edited_at"),
+            )
             await self.send_json(message)
             return
 
-    async def hydrate_message(self, content):
-        content = deepcopy(content)
+    async def hydrate_message(self, content, version=None, edited_at=None):
+        # Shallow copies will do, as we only add to the payload:
+        content = {**content, "payload": {**content["payload"]}}
         model_name = content.pop("model_name")
         id_ = content.pop("id")
         # We specifically don't want to include the user model, as that
@@ -60,24 +80,151 @@ class PushNotificationConsumer(AsyncJsonWebsocketConsumer):
         # getting the message. It'd just be noise on the wire.
         if model_name.lower() != "user":
             try:
-                instance = await self.get_instance(model=model_name, id=id_)
+                content["payload"]["model"] = await self.get_serialized_instance(
+                    model=model_name, id=id_, version=version, edited_at=edited_at
+                )
             except ObjectDoesNotExist:
                 pass
             else:
-                content["payload"]["model"] = await database_sync_to_async(
-                    instance.get_serialized_representation
-                )(self.scope["user"])
+                if self.use_deltas:
+                    self.apply_delta_protocol(model_name, id_, content)
         return content
 
+    def apply_delta_protocol(self, model_name, id_, content):
+        """
+        Numbers the models sent about each instance, and replaces the
+        model in *_UPDATE messages with just its changed fields (and id),
+        as ``model_delta``, when the client has the previous version::
+
+            {"type": "TASK_UPDATE", "payload": {
+                "originating_user_id": str,
+                "model_delta": {"id": str, "currently_creating_pr": true},
+                "version": 7,
+            }}
+
+        A client that sees a gap in the versions should refetch the
+        instance and send a RESYNC action for it, which makes the next
+        message carry the full model again.
+        """
+        payload = content["payload"]
+        model = payload["model"]
+        key = (model_name.lower(), id_)
+        version, last_sent = self.sent_models.get(key, (0, None))
+        version += 1
+        self.sent_models[key] = (version, model)
+        payload["version"] = version
+        if (
+            content["type"].endswith("_UPDATE")
+            and last_sent is not None
+            and last_sent.keys() == model.keys()
+        ):
+            del payload["model"]
+            payload["model_delta"] = {
+                "id": model["id"],
+                **{
+                    field: value
+                    for field, value in model.items()
+                    if last_sent[field] != value
+                },
+            }
+
     @database_sync_to_async
-    def get_instance(self, *, model, id, **kwargs):
+    def get_serialized_instance(self, *, model, id, version=None, edited_at=None):
+        """
+        Every subscriber gets the same message about an instance, so it is
+        serialized once per message (``version``) and audience, and shared
+        through the cache. The audience is the instance's
+        ``push_audience_field`` owner or everyone else.
+
+        Only a payload of the state the message is about is shared: one
+        read from the primary, or from a replica row with the message's
+        ``edited_at``.
+        """
+        key = f"{PUSH_HYDRATION_CACHE_PREFIX}:{model}:{id}:{version}"
+        cached = cache.get(key) if version else None
+        if cached is not None:
+            audience = self._get_push_audience(cached["owner_id"])
+            if audience in cached["payloads"]:
+                return cached["payloads"][audience]
+
+        instance, from_replica = self._get_pushed_instance(
+            model=model, id=id, edited_at=edited_at
+        )
+        owner_field = instance.push_audience_field
+        owner_id = str(getattr(instance, owner_field)) if owner_field else None
+        audience = self._get_push_audience(owner_id)
+        user = self.scope["user"]
+        # The user lives as long as the connection, so don't serialize with
+        # the social accounts it loaded for an earlier message:
+        if hasattr(user, "clear_social_accounts"):
+            user.clear_social_accounts()
+        with reading_from_replica(from_replica):
+            payload = instance.get_serialized_representation(user)
+        is_message_state = not from_replica or (
+            instance.edited_at == parse_datetime(edited_at)
+        )
+        if version and is_message_state:
+            payloads = cached["payloads"] if cached is not None else {}
+            cache.set(
+                key,
+                {"owner_id": owner_id, "payloads": {**payloads, audience: payload}},
+                settings.PUSH_HYDRATION_CACHE_SECONDS,
+            )
+        return payload
+
+    def _get_push_audience(self, owner_id):
+        user_id = getattr(self.scope["user"], "id", None)
+        return (
+            "owner" if owner_id is not None and owner_id == str(user_id) else "others"
+        )
+
+    @database_sync_to_async
+    def get_instance(self, **kwargs):
+        return self._get_instance(**kwargs)
+
+    def _get_pushed_instance(self, *, model, id, edited_at):
+        """
+        Pushes go out as soon as their write commits, which the replica may
+        not have yet. So the instance is read from the replica only if it
+        is at least as new as the push's ``edited_at``, and otherwise from
+        the primary. Returns the instance and whether it came from the
+        replica.
+        """
+        edited_at = parse_datetime(edited_at) if edited_at else None
+        if edited_at is not None and replica_configured():
+            instance = self._get_instance(model=model, id=id, for_serialization=True)
+            instance_edited_at = getattr(instance, "edited_at", None)
+            if instance_edited_at is not None and instance_edited_at >= edited_at:
+                return instance, True
+        instance = self._get_instance(
+            model=model, id=id, for_serialization=True, use_replica=False
+        )
+        return instance, False
+
+    def _get_instance(
+        self, *, model, id, for_serialization=False, use_replica=True, **kwargs
+    ):
         # XXX: We currently hard-code API as it's our only
         # model-containing app:
         Model = apps.get_model("api", model)
-        return Model.objects.get(pk=id)
+        queryset = Model.objects.all()
+        # Load what the serializer will need up front:
+        if for_serialization and hasattr(queryset, "for_serialization"):
+            queryset = queryset.for_serialization()
+        try:
+            with reading_from_replica(use_replica):
+                return queryset.get(pk=id)
+        except Model.DoesNotExist:
+            if not (use_replica and replica_configured()):
+                raise
+        # It may just not have reached the replica yet:
+        return queryset.get(pk=id)
 
     async def receive_json(self, content, **kwargs):
         # Just used to sub/unsub to notification channels.
+        if isinstance(content, dict) and "subscriptions" in content:
+            await self.receive_batch(content)
+            return
         is_valid, content = self.is_valid(content)
         is_known_model = self.is_known_model(content.get("model", None))
         has_good_permissions = await self.has_good_permissions(content)
@@ -85,12 +232,18 @@ class PushNotificationConsumer(AsyncJsonWebsocketConsumer):
         if not all_good:
             await self.send_json({"error": _("Invalid subscription.")})
             return
-        group_name = CHANNELS_GROUP_NAME.format(
-            model=content["model"], id=content["id"]
-        )
-        self.groups.append(group_name)
+        if content["action"] == Actions.Resync.value:
+            self.sent_models.pop((content["model"], content["id"]), None)
+            await self.send_json(
+                {
+                    "ok": _("Resynced {model}.id = {id_}").format(
+                        model=content["model"], id_=content["id"]
+                    )
+                }
+            )
+            return
         if content["action"] == Actions.Subscribe.value:
-            await self.channel_layer.group_add(group_name, self.channel_name)
+            await self.subscribe(content["model"], content["id"])
             await self.send_json(
                 {
                     "ok": _("Subscribed to {model}.id = {id_}").format(
@@ -106,7 +259,114 @@ class PushNotificationConsumer(AsyncJsonWebsocketConsumer):
                     )
                 }
             )
-            await self.channel_layer.group_discard(group_name, self.channel_name)
+            await self.unsubscribe(content["model"], content["id"])
+
+    async def receive_batch(self, content):
+        """
+        Handles many subscriptions in one message, like::
+
+            {
+                "action": "SUBSCRIBE" or "UNSUBSCRIBE",
+                "subscriptions": [{"model": str, "id": str}, ...],
+            }
+
+        and answers with the ones that were invalid, if any.
+        """
+        action = content.get("action")
+        subscriptions = content["subscriptions"]
+        if (
+            content.keys() != {"action", "subscriptions"}
+            or action not in (Actions.Subscribe.value, Actions.Unsubscribe.value)
+            or not isinstance(subscriptions, list)
+        ):
+            await self.send_json({"error": _("Invalid subscription.")})
+            return
+        requested = []
+        invalid = []
+        for subscription in subscriptions:
+            is_valid = (
+                isinstance(subscription, dict)
+                and subscription.keys() == {"model", "id"}
+                and isinstance(subscription["model"], str)
+                and isinstance(subscription["id"], str)
+            )
+            if not is_valid:
+                invalid.append(subscription)
+                continue
+            model = self._process_value("model", subscription["model"])
+            if not self.is_known_model(model):
+                invalid.append(subscription)
+                continue
+            requested.append((model, subscription["id"]))
+        requested = list(dict.fromkeys(requested))
+
+        if action == Actions.Subscribe.value:
+            allowed = await self.get_subscribable(requested)
+            invalid += [
+                {"model": model, "id": id_}
+                for model, id_ in requested
+                if (model, id_) not in allowed
+            ]
+            await asyncio.gather(
+                *(
+                    self.subscribe(model, id_)
+                    for model, id_ in requested
+                    if (model, id_) in allowed
+                )
+            )
+            message = {"ok": _("Subscribed.")}
+        else:
+            # Leaving a group needs no permission:
+            await asyncio.gather(
+                *(self.unsubscribe(model, id_) for model, id_ in requested)
+            )
+            message = {"ok": _("Unsubscribed.")}
+        if invalid:
+            message["invalid"] = invalid
+        await self.send_json(message)
+
+    async def subscribe(self, model, id_):
+        group_name = CHANNELS_GROUP_NAME.format(model=model, id=id_)
+        if group_name not in self.groups:
+            self.groups.append(group_name)
+        await self.channel_layer.group_add(group_name, self.channel_name)
+
+    async def unsubscribe(self, model, id_):
+        group_name = CHANNELS_GROUP_NAME.format(model=model, id=id_)
+        if group_name in self.groups:
+            self.groups.remove(group_name)
+        await self.channel_layer.group_discard(group_name, self.channel_name)
+        self.sent_models.pop((model, id_), None)
+
+    @database_sync_to_async
+    def get_subscribable(self, subscriptions):
+        """
+        Of the (model, id) pairs, the ones the user may subscribe to,
+        loading the instances with one query per model.
+        """
+        allowed = {(model, id_) for model, id_ in subscriptions if id_ == LIST}
+        ids_by_model = defaultdict(set)
+        for model, id_ in subscriptions:
+            if id_ != LIST:
+                ids_by_model[model].add(id_)
+        user = self.scope["user"]
+        for model, ids in ids_by_model.items():
+            Model = apps.get_model("api", model)
+            try:
+                with reading_from_replica():
+                    instances = list(Model.objects.filter(pk__in=ids))
+                missing = ids - {str(instance.id) for instance in instances}
+                if missing and replica_configured():
+                    # They may just not have reached the replica yet:
+                    instances += Model.objects.filter(pk__in=missing)
+            except (TypeError, ValueError):
+                continue
+            allowed.update(
+                (model, str(instance.id))
+                for instance in instances
+                if instance.subscribable_by(user)
+            )
+        return allowed
 
     def _process_value(self, key, value):
         if key == "model":
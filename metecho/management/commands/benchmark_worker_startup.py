@@ -0,0 +1,81 @@
+import subprocess
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from ...rq_worker import preload_modules
+
+# The timer starts before django.setup(), since setting up the apps already
+# imports most of what the jobs need:
+COLD_IMPORT_SCRIPT = """
+import time
+
+start = time.perf_counter()
+
+import django
+
+django.setup()
+from metecho.rq_worker import preload_modules
+
+preload_modules()
+print(time.perf_counter() - start)
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the per-job start-up overhead that preloading modules and "
+        "reusing db connections in an rq worker saves."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def _cold_import(self):
+        # A fresh interpreter stands in for a work-horse forked from a parent
+        # that hasn't preloaded anything:
+        result = subprocess.run(
+            [sys.executable, "-c", COLD_IMPORT_SCRIPT],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        return float(result.stdout.strip().splitlines()[-1])
+
+    def _warm_import(self):
+        start = time.perf_counter()
+        preload_modules()
+        return time.perf_counter() - start
+
+    def _reconnect(self):
+        connection.close()
+        start = time.perf_counter()
+        connection.ensure_connection()
+        return time.perf_counter() - start
+
+    def _reuse(self):
+        connection.ensure_connection()
+        start = time.perf_counter()
+        connection.ensure_connection()
+        return time.perf_counter() - start
+
+    def _best(self, func, repeat):
+        return min(func() for _ in range(repeat))
+
+    def handle(self, *args, **options):
+        repeat = options["repeat"]
+        preload_modules()
+        rows = [
+            ("import modules, not preloaded", self._best(self._cold_import, repeat)),
+            ("import modules, preloaded", self._best(self._warm_import, repeat)),
+            ("db connection, reconnect", self._best(self._reconnect, repeat)),
+            ("db connection, reused", self._best(self._reuse, repeat)),
+        ]
+        for label, seconds in rows:
+            self.stdout.write(f"{label:<32} {seconds * 1000:>10.2f}ms")
+        saved = (rows[0][1] - rows[1][1]) + (rows[2][1] - rows[3][1])
+        self.stdout.write(
+            self.style.SUCCESS(f"Per-job overhead saved: {saved * 1000:.2f}ms")
+        )
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django_rq import get_connection
+
+from ...rq_metrics import get_job_metrics, reset_job_metrics
+
+
+class Command(BaseCommand):
+    help = "Show per-job-function queue wait, run time and outcome counts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset", action="store_true", help="Clear all recorded metrics."
+        )
+
+    def _mean(self, histogram):
+        if not histogram["count"]:
+            return "-"
+        return f"{histogram['sum'] / histogram['count']:.2f}s"
+
+    def handle(self, *args, **options):
+        connection = get_connection("default")
+        if options["reset"]:
+            reset_job_metrics(connection)
+            self.stdout.write(self.style.SUCCESS("Metrics reset."))
+            return
+
+        metrics = get_job_metrics(connection)
+        if not metrics:
+            self.stdout.write("No job metrics recorded.")
+            return
+
+        row = "{:<60} {:>9} {:>7} {:>10} {:>10}"
+        self.stdout.write(
+            row.format("function", "succeeded", "failed", "mean wait", "mean run")
+        )
+        for func_name, data in metrics.items():
+            self.stdout.write(
+                row.format(
+                    func_name,
+                    data["succeeded"],
+                    data["failed"],
+                    self._mean(data["wait"]),
+                    self._mean(data["run"]),
+                )
+            )
@@ -0,0 +1,21 @@
+from io import StringIO
+from unittest.mock import MagicMock
+
+import pytest
+from django.core.management import call_command
+
+
+@pytest.mark.django_db
+def test_benchmark_worker_startup(mocker):
+    module_name = "metecho.management.commands.benchmark_worker_startup"
+    mocker.patch(f"{module_name}.preload_modules")
+    run = mocker.patch(f"{module_name}.subprocess.run")
+    run.return_value = MagicMock(stdout="1.5\n")
+    out = StringIO()
+    call_command("benchmark_worker_startup", "--repeat", "1", stdout=out)
+
+    script = run.call_args[0][0][-1]
+    assert script.index("start = time.perf_counter()") < script.index("django.setup()")
+    assert "import modules, not preloaded" in out.getvalue()
+    assert "1500.00ms" in out.getvalue()
+    assert "Per-job overhead saved" in out.getvalue()
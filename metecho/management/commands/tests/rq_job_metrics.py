@@ -0,0 +1,40 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django_rq import get_connection
+
+from ....rq_metrics import get_job_metrics, record_job, reset_job_metrics
+
+
+@pytest.fixture
+def connection():
+    connection = get_connection("default")
+    reset_job_metrics(connection)
+    yield connection
+    reset_job_metrics(connection)
+
+
+def test_rq_job_metrics__empty(connection):
+    out = StringIO()
+    call_command("rq_job_metrics", stdout=out)
+
+    assert "No job metrics recorded." in out.getvalue()
+
+
+def test_rq_job_metrics(connection):
+    record_job(connection, "my.job", wait=1, duration=4, succeeded=True)
+    out = StringIO()
+    call_command("rq_job_metrics", stdout=out)
+
+    assert "my.job" in out.getvalue()
+    assert "4.00s" in out.getvalue()
+
+
+def test_rq_job_metrics__reset(connection):
+    record_job(connection, "my.job", wait=1, duration=4, succeeded=True)
+    out = StringIO()
+    call_command("rq_job_metrics", "--reset", stdout=out)
+
+    assert "Metrics reset." in out.getvalue()
+    assert get_job_metrics(connection) == {}
@@ -0,0 +1,90 @@
+"""
+Sends reads to the optional read replica (``DATABASES["replica"]``) within
+``reading_from_replica`` blocks, until something is written: from then on
+the block reads from the primary too, so it always sees its own writes.
+
+Outside those blocks (jobs, management commands), everything goes to the
+primary.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DB_ALIAS = "replica"
+PIN_COOKIE_NAME = "metecho_primary"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_use_replica = ContextVar("use_replica", default=False)
+_wrote = ContextVar("wrote", default=False)
+
+
+def replica_configured():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+@contextmanager
+def reading_from_replica(use_replica=True):
+    """
+    Yields a callable that tells whether anything was written in the block.
+    """
+    use_replica_token = _use_replica.set(use_replica and replica_configured())
+    wrote_token = _wrote.set(False)
+    try:
+        yield _wrote.get
+    finally:
+        _use_replica.reset(use_replica_token)
+        _wrote.reset(wrote_token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (
+            _use_replica.get()
+            and not _wrote.get()
+            # Reads in a transaction on the primary must see its writes and
+            # locks, whether or not they came through the ORM:
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return REPLICA_DB_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary:
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Reads safe requests from the replica, unless the client wrote recently:
+    requests that write set a short-lived cookie that keeps the client's
+    next requests on the primary until the replica has caught up.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        use_replica = (
+            request.method in SAFE_METHODS and PIN_COOKIE_NAME not in request.COOKIES
+        )
+        with reading_from_replica(use_replica) as wrote:
+            response = self.get_response(request)
+            if wrote() and replica_configured():
+                response.set_cookie(
+                    PIN_COOKIE_NAME,
+                    "1",
+                    max_age=settings.REPLICA_PIN_SECONDS,
+                    secure=settings.SESSION_COOKIE_SECURE,
+                    httponly=True,
+                    samesite="Lax",
+                )
+        return response
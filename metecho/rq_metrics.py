@@ -0,0 +1,153 @@
+"""
+Per-job-function timing, queue-wait and outcome metrics for RQ workers.
+
+Every job run by a worker records, under its function name:
+
+    - how long it waited in the queue (enqueue to start),
+    - how long it ran,
+    - whether it succeeded or failed.
+
+Timings are kept as cumulative Prometheus-style histograms in one Redis
+hash per function, so they survive worker restarts and are shared by all
+worker processes.
+"""
+
+import math
+
+from redis.exceptions import RedisError
+
+KEY_PREFIX = "metecho:rq_metrics"
+FUNCTIONS_KEY = f"{KEY_PREFIX}:functions"
+
+# Upper bounds, in seconds. Jobs range from sub-second pushes to
+# multi-minute scratch org builds, so these are deliberately wide:
+WAIT_BUCKETS = (0.1, 0.5, 1, 5, 15, 30, 60, 300, 900, 3600)
+RUN_BUCKETS = (0.1, 0.5, 1, 5, 15, 30, 60, 300, 900, 3600)
+
+HISTOGRAMS = {
+    "wait": ("metecho_rq_job_wait_seconds", WAIT_BUCKETS),
+    "run": ("metecho_rq_job_run_seconds", RUN_BUCKETS),
+}
+
+
+def _function_key(func_name):
+    return f"{KEY_PREFIX}:{func_name}"
+
+
+def _format_bound(bound):
+    if bound == math.inf:
+        return "+Inf"
+    return repr(float(bound))
+
+
+def record_job(connection, func_name, *, wait, duration, succeeded):
+    """
+    Record a single job run. ``wait`` may be None if the job has no
+    enqueue time (e.g. it was run directly rather than dequeued).
+    """
+    key = _function_key(func_name)
+    pipe = connection.pipeline(transaction=False)
+    pipe.sadd(FUNCTIONS_KEY, func_name)
+    pipe.hincrby(key, "succeeded" if succeeded else "failed", 1)
+    for name, value in (("wait", wait), ("run", duration)):
+        if value is None:
+            continue
+        value = max(value, 0)
+        _, buckets = HISTOGRAMS[name]
+        for bound in (*buckets, math.inf):
+            if value <= bound:
+                pipe.hincrby(key, f"{name}_bucket:{_format_bound(bound)}", 1)
+        pipe.hincrby(key, f"{name}_count", 1)
+        pipe.hincrbyfloat(key, f"{name}_sum", value)
+    pipe.execute()
+
+
+def get_job_metrics(connection):
+    """
+    Returns a dict of function name to its metrics:
+
+        {
+            "succeeded": int,
+            "failed": int,
+            "wait": {"count": int, "sum": float, "buckets": [(bound, int)]},
+            "run": {"count": int, "sum": float, "buckets": [(bound, int)]},
+        }
+    """
+    func_names = sorted(
+        name.decode("utf-8") for name in connection.smembers(FUNCTIONS_KEY)
+    )
+    pipe = connection.pipeline(transaction=False)
+    for func_name in func_names:
+        pipe.hgetall(_function_key(func_name))
+    ret = {}
+    for func_name, raw in zip(func_names, pipe.execute()):
+        raw = {k.decode("utf-8"): v.decode("utf-8") for k, v in raw.items()}
+        metrics = {
+            "succeeded": int(raw.get("succeeded", 0)),
+            "failed": int(raw.get("failed", 0)),
+        }
+        for name, (_, buckets) in HISTOGRAMS.items():
+            metrics[name] = {
+                "count": int(raw.get(f"{name}_count", 0)),
+                "sum": float(raw.get(f"{name}_sum", 0)),
+                "buckets": [
+                    (
+                        bound,
+                        int(raw.get(f"{name}_bucket:{_format_bound(bound)}", 0)),
+                    )
+                    for bound in (*buckets, math.inf)
+                ],
+            }
+        ret[func_name] = metrics
+    return ret
+
+
+def reset_job_metrics(connection):
+    func_names = connection.smembers(FUNCTIONS_KEY)
+    keys = [_function_key(name.decode("utf-8")) for name in func_names]
+    connection.delete(FUNCTIONS_KEY, *keys)
+
+
+def _escape_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus(metrics):
+    """
+    Render the output of ``get_job_metrics`` in the Prometheus text
+    exposition format.
+    """
+    lines = [
+        "# HELP metecho_rq_jobs_total Finished RQ jobs by function and outcome.",
+        "# TYPE metecho_rq_jobs_total counter",
+    ]
+    for func_name, data in metrics.items():
+        label = _escape_label(func_name)
+        for outcome in ("succeeded", "failed"):
+            lines.append(
+                f'metecho_rq_jobs_total{{function="{label}",outcome="{outcome}"}} '
+                f"{data[outcome]}"
+            )
+    for name, (metric_name, _) in HISTOGRAMS.items():
+        lines.append(f"# TYPE {metric_name} histogram")
+        for func_name, data in metrics.items():
+            label = _escape_label(func_name)
+            histogram = data[name]
+            for bound, count in histogram["buckets"]:
+                lines.append(
+                    f'{metric_name}_bucket{{function="{label}",'
+                    f'le="{_format_bound(bound)}"}} {count}'
+                )
+            lines.append(f'{metric_name}_sum{{function="{label}"}} {histogram["sum"]}')
+            lines.append(
+                f'{metric_name}_count{{function="{label}"}} {histogram["count"]}'
+            )
+    return "\n".join(lines) + "\n"
+
+
+def safe_record_job(connection, func_name, **kwargs):
+    # Metrics are best-effort; they must never fail a job:
+    try:
+        record_job(connection, func_name, **kwargs)
+    except RedisError:  # pragma: nocover
+        pass
@@ -1,5 +1,36 @@
-from django.db import DatabaseError, InterfaceError, connections
-from rq.worker import HerokuWorker, Worker
+import time
+from importlib import import_module
+
+from django.db import DatabaseError, InterfaceError, close_old_connections, connections
+from rq.utils import utcnow
+from rq.worker import HerokuWorker, SimpleWorker, Worker
+
+from .api.model_mixins import batched_notifications
+from .rq_metrics import safe_record_job
+
+# Heavy modules that jobs otherwise import lazily in their call path,
+# which a forking worker would redo in every work-horse:
+PRELOAD_MODULES = (
+    "bs4",
+    "github3",
+    "simple_salesforce",
+    "cumulusci.core.config",
+    "cumulusci.core.runtime",
+    "cumulusci.tasks.github.util",
+    "cumulusci.tasks.salesforce.sourcetracking",
+    "metecho.api.jobs",
+)
+
+
+def preload_modules():
+    for name in PRELOAD_MODULES:
+        import_module(name)
+    # CumulusCI parses the universal cumulusci.yml once and caches it on
+    # the class, so instantiating it here shares the parsed config with
+    # every work-horse:
+    from .api.custom_cci_configs import MetechoUniversalConfig
+
+    MetechoUniversalConfig()
 
 
 class ConnectionClosingWorkerMixin(object):
@@ -28,11 +59,81 @@ class ConnectionClosingWorkerMixin(object):
         return super().work(*args, **kwargs)
 
 
-class ConnectionClosingWorker(ConnectionClosingWorkerMixin, Worker):
+class ConnectionReusingWorkerMixin(object):
+    """
+    Mixin for non-forking rq workers to reuse db connections across jobs.
+
+    Like Django's request handling, this only closes connections that are
+    broken, left mid-transaction, or older than ``CONN_MAX_AGE``.
+    """
+
+    def perform_job(self, *args, **kwargs):
+        close_old_connections()
+        try:
+            return super().perform_job(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+
+class PreloadingWorkerMixin(object):
+    """Mixin for rq workers to import heavy modules once, before forking."""
+
+    def work(self, *args, **kwargs):
+        preload_modules()
+        return super().work(*args, **kwargs)
+
+
+class JobMetricsWorkerMixin(object):
+    """Mixin for rq workers to record per-function timing and outcome metrics."""
+
+    def perform_job(self, job, queue, *args, **kwargs):
+        start = time.monotonic()
+        started_at = utcnow()
+        succeeded = False
+        try:
+            succeeded = super().perform_job(job, queue, *args, **kwargs)
+            return succeeded
+        finally:
+            wait = None
+            if job.enqueued_at is not None:
+                wait = (started_at - job.enqueued_at).total_seconds()
+            safe_record_job(
+                self.connection,
+                job.func_name,
+                wait=wait,
+                duration=time.monotonic() - start,
+                succeeded=bool(succeeded),
+            )
+
+
+class NotificationBatchingWorkerMixin(object):
+    """
+    Mixin for rq workers to send each job's push messages together, at its
+    end or wherever the job calls ``model_mixins.flush_notifications``.
+    """
+
+    def perform_job(self, *args, **kwargs):
+        with batched_notifications():
+            return super().perform_job(*args, **kwargs)
+
+
+class ConnectionClosingWorker(
+    PreloadingWorkerMixin,
+    ConnectionClosingWorkerMixin,
+    JobMetricsWorkerMixin,
+    NotificationBatchingWorkerMixin,
+    Worker,
+):
     """Connection-closing worker for non-Heroku environments"""
 
 
-class ConnectionClosingHerokuWorker(ConnectionClosingWorkerMixin, HerokuWorker):
+class ConnectionClosingHerokuWorker(
+    PreloadingWorkerMixin,
+    ConnectionClosingWorkerMixin,
+    JobMetricsWorkerMixin,
+    NotificationBatchingWorkerMixin,
+    HerokuWorker,
+):
     """Connection-closing worker for Heroku
 
     The HerokuWorker prevents child workhorse processes from handling the
@@ -42,3 +143,19 @@ class ConnectionClosingHerokuWorker(ConnectionClosingWorkerMixin, HerokuWorker):
 
     SIGRTMIN is undefined on macOS, so we can't use this worker everywhere.
     """
+
+
+class ConnectionReusingSimpleWorker(
+    PreloadingWorkerMixin,
+    ConnectionReusingWorkerMixin,
+    JobMetricsWorkerMixin,
+    NotificationBatchingWorkerMixin,
+    SimpleWorker,
+):
+    """Non-forking worker that keeps its db connections between jobs
+
+    This avoids a fork and a Postgres reconnect per job, at the cost of
+    isolation: a job that leaks memory or mutates global state affects
+    every later job in the process. Set ``DATABASE_CONN_MAX_AGE`` so that
+    connections are actually kept open between jobs.
+    """
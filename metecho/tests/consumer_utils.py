@@ -0,0 +1,53 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from ..consumer_utils import get_set_message_semaphores, message_to_hash
+
+
+class ConnectionContextManager:
+    def __init__(self, connection):
+        self.connection = connection
+
+    async def __aenter__(self):
+        return self.connection
+
+    async def __aexit__(self, *args):
+        pass
+
+
+def test_message_to_hash():
+    small = message_to_hash({"message": {"type": "TASK_UPDATE"}})
+    large = message_to_hash({"message": {"type": "TASK_UPDATE", "x": "y" * 10000}})
+
+    assert len(small) == len(large)
+    assert small != large
+    assert message_to_hash({"a": 1, "b": 2}) == message_to_hash({"b": 2, "a": 1})
+
+
+@pytest.mark.asyncio
+async def test_get_set_message_semaphores():
+    pipeline = MagicMock()
+
+    async def execute():
+        return [True, None]
+
+    pipeline.execute = execute
+    connection = MagicMock()
+    connection.pipeline.return_value = pipeline
+    channel_layer = MagicMock()
+    channel_layer.connection.return_value = ConnectionContextManager(connection)
+
+    result = await get_set_message_semaphores(channel_layer, [{"a": 1}, {"a": 1}])
+
+    assert result == [True, False]
+    assert pipeline.set.call_count == 2
+    assert channel_layer.connection.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_get_set_message_semaphores__empty():
+    channel_layer = MagicMock()
+
+    assert await get_set_message_semaphores(channel_layer, []) == []
+    assert not channel_layer.connection.called
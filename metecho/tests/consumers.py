@@ -1,8 +1,15 @@
+from contextlib import ExitStack
+from datetime import timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
 import pytest
 from channels.db import database_sync_to_async
 from channels.testing import WebsocketCommunicator
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ObjectDoesNotExist
 
 from ..api.model_mixins import Request
+from ..api.models import Task
 from ..api.push import push_message_about_instance, report_error
 from ..api.serializers import (
     EpicSerializer,
@@ -240,6 +247,85 @@ async def test_push_notification_consumer__invalid_subscription(user_factory):
     await communicator.disconnect()
 
 
+@pytest.mark.django_db
+async def test_push_notification_consumer__batch(
+    user_factory, project_factory, epic_factory
+):
+    user = await database_sync_to_async(user_factory)()
+    other_user = await database_sync_to_async(user_factory)()
+    project = await database_sync_to_async(project_factory)()
+    epic = await database_sync_to_async(epic_factory)(project=project)
+
+    communicator = WebsocketCommunicator(websockets, "/ws/notifications/")
+    communicator.scope["user"] = user
+    connected, _ = await communicator.connect()
+    assert connected
+
+    await communicator.send_json_to(
+        {
+            "action": "SUBSCRIBE",
+            "subscriptions": [
+                {"model": "project", "id": str(project.id)},
+                {"model": "epic", "id": str(epic.id)},
+                {"model": "epic", "id": str(epic.id)},
+                {"model": "scratchorg", "id": "list"},
+                {"model": "user", "id": str(other_user.id)},
+                {"model": "foobar", "id": "buzbaz"},
+            ],
+        }
+    )
+    response = await communicator.receive_json_from()
+    assert response == {
+        "ok": "Subscribed.",
+        "invalid": [
+            {"model": "foobar", "id": "buzbaz"},
+            {"model": "user", "id": str(other_user.id)},
+        ],
+    }
+
+    await push_message_about_instance(
+        epic, {"type": "TEST_MESSAGE", "payload": {"originating_user_id": "abc"}}
+    )
+    response = await communicator.receive_json_from()
+    model = await serialize_model(EpicSerializer, epic, user)
+    assert response == {
+        "type": "TEST_MESSAGE",
+        "payload": {"originating_user_id": "abc", "model": model},
+    }
+
+    await communicator.send_json_to(
+        {
+            "action": "UNSUBSCRIBE",
+            "subscriptions": [
+                {"model": "project", "id": str(project.id)},
+                {"model": "epic", "id": str(epic.id)},
+            ],
+        }
+    )
+    response = await communicator.receive_json_from()
+    assert response == {"ok": "Unsubscribed."}
+
+    await communicator.send_json_to({"action": "SUBSCRIBE", "subscriptions": {}})
+    response = await communicator.receive_json_from()
+    assert "error" in response
+
+    await communicator.disconnect()
+
+
+async def test_push_notification_consumer__groups_deduplicated():
+    consumer = PushNotificationConsumer()
+    consumer.channel_name = "test-channel"
+    consumer.sent_models = {}
+    consumer.channel_layer = MagicMock(group_add=AsyncMock(), group_discard=AsyncMock())
+
+    await consumer.subscribe("project", "abc")
+    await consumer.subscribe("project", "abc")
+    assert consumer.groups == ["project.abc"]
+
+    await consumer.unsubscribe("project", "abc")
+    assert consumer.groups == []
+
+
 # These tests need to go last, after any tests that start up a Communicator:
 @pytest.mark.django_db
 async def test_push_notification_consumer__missing_instance():
@@ -251,3 +337,198 @@ async def test_push_notification_consumer__missing_instance():
     consumer = PushNotificationConsumer()
     new_content = await consumer.hydrate_message(content)
     assert new_content == {"payload": {}}
+
+
+@pytest.mark.django_db
+async def test_push_notification_consumer__missing_instance__replica(
+    project_factory,
+):
+    project = await database_sync_to_async(project_factory)()
+    consumer = PushNotificationConsumer()
+    with patch("metecho.consumers.replica_configured", return_value=True):
+        instance = await consumer.get_instance(model="project", id=str(project.id))
+        assert instance == project
+
+        with pytest.raises(ObjectDoesNotExist):
+            await consumer.get_instance(model="project", id="bet this is invalid")
+
+
+@pytest.mark.django_db
+async def test_push_notification_consumer__replica_behind(user_factory, task_factory):
+    user = await database_sync_to_async(user_factory)()
+    task = await database_sync_to_async(task_factory)(name="New name")
+    replica_task = await database_sync_to_async(Task.objects.get)(pk=task.pk)
+    replica_task.name = "Replica name"
+    content = {
+        "type": "TASK_UPDATE",
+        "payload": {},
+        "model_name": "task",
+        "id": str(task.id),
+    }
+    get_instance = PushNotificationConsumer._get_instance
+
+    def get_replica_instance(self, *, use_replica=True, **kwargs):
+        if use_replica:
+            return replica_task
+        return get_instance(self, use_replica=use_replica, **kwargs)
+
+    with ExitStack() as stack:
+        stack.enter_context(
+            patch("metecho.consumers.replica_configured", return_value=True)
+        )
+        stack.enter_context(
+            patch.object(
+                PushNotificationConsumer, "_get_instance", get_replica_instance
+            )
+        )
+        consumer = PushNotificationConsumer()
+        consumer.scope = {"user": user}
+
+        # Caught up with the push:
+        message = await consumer.hydrate_message(
+            content, edited_at=task.edited_at.isoformat()
+        )
+        assert message["payload"]["model"]["name"] == "Replica name"
+
+        # Behind it, so it's read from the primary:
+        replica_task.edited_at = task.edited_at - timedelta(seconds=1)
+        message = await consumer.hydrate_message(
+            content, edited_at=task.edited_at.isoformat()
+        )
+        assert message["payload"]["model"]["name"] == "New name"
+
+
+@pytest.mark.django_db
+async def test_push_notification_consumer__serialized_once_per_audience(
+    user_factory, scratch_org_factory
+):
+    owner = await database_sync_to_async(user_factory)()
+    other_users = [await database_sync_to_async(user_factory)() for _ in range(2)]
+    scratch_org = await database_sync_to_async(scratch_org_factory)(owner=owner)
+    content = {
+        "type": "SCRATCH_ORG_UPDATE",
+        "payload": {},
+        "model_name": "scratchorg",
+        "id": str(scratch_org.id),
+    }
+    with ExitStack() as stack:
+        stack.enter_context(
+            patch("metecho.consumers.cache", LocMemCache("push-hydration", {}))
+        )
+        get_serialized_representation = stack.enter_context(
+            patch(
+                "metecho.api.models.ScratchOrg.get_serialized_representation",
+                autospec=True,
+                side_effect=lambda instance, user: {"is_owner": user == owner},
+            )
+        )
+        messages = []
+        for user in [owner, *other_users]:
+            consumer = PushNotificationConsumer()
+            consumer.scope = {"user": user}
+            messages.append(await consumer.hydrate_message(content, version="abc"))
+
+    assert get_serialized_representation.call_count == 2
+    assert [message["payload"]["model"]["is_owner"] for message in messages] == [
+        True,
+        False,
+        False,
+    ]
+    # The pushed content is left alone:
+    assert content["payload"] == {}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "replica_ahead, serializations", ((False, 1), (True, 2)), ids=("same", "ahead")
+)
+async def test_push_notification_consumer__cached_from_replica(
+    user_factory, task_factory, replica_ahead, serializations
+):
+    task = await database_sync_to_async(task_factory)()
+    message_edited_at = task.edited_at
+    if replica_ahead:
+        message_edited_at -= timedelta(seconds=1)
+    content = {
+        "type": "TASK_UPDATE",
+        "payload": {},
+        "model_name": "task",
+        "id": str(task.id),
+    }
+    with ExitStack() as stack:
+        stack.enter_context(
+            patch("metecho.consumers.cache", LocMemCache("push-hydration", {}))
+        )
+        stack.enter_context(
+            patch.object(
+                PushNotificationConsumer,
+                "_get_pushed_instance",
+                return_value=(task, True),
+            )
+        )
+        get_serialized_representation = stack.enter_context(
+            patch(
+                "metecho.api.models.Task.get_serialized_representation",
+                return_value={},
+            )
+        )
+        for _ in range(2):
+            consumer = PushNotificationConsumer()
+            consumer.scope = {"user": await database_sync_to_async(user_factory)()}
+            await consumer.hydrate_message(
+                content, version="abc", edited_at=message_edited_at.isoformat()
+            )
+
+    # A newer state than the message's isn't shared under its version:
+    assert get_serialized_representation.call_count == serializations
+
+
+@pytest.mark.django_db
+async def test_push_notification_consumer__deltas(user_factory, task_factory):
+    user = await database_sync_to_async(user_factory)()
+    task = await database_sync_to_async(task_factory)(epic__project__repo_id=4321)
+
+    communicator = WebsocketCommunicator(websockets, "/ws/notifications/?deltas=1")
+    communicator.scope["user"] = user
+    connected, _ = await communicator.connect()
+    assert connected
+
+    await communicator.send_json_to(
+        {"model": "task", "id": str(task.id), "action": "SUBSCRIBE"}
+    )
+    response = await communicator.receive_json_from()
+    assert "ok" in response
+
+    message = {"type": "TASK_UPDATE", "payload": {"originating_user_id": "abc"}}
+    await push_message_about_instance(task, message)
+    response = await communicator.receive_json_from()
+    model = await serialize_model(TaskSerializer, task, user)
+    assert response["payload"] == {
+        "originating_user_id": "abc",
+        "model": model,
+        "version": 1,
+    }
+
+    task.currently_creating_pr = True
+    await database_sync_to_async(task.save)()
+    await push_message_about_instance(task, message)
+    response = await communicator.receive_json_from()
+    assert response["payload"] == {
+        "originating_user_id": "abc",
+        "model_delta": {"id": str(task.id), "currently_creating_pr": True},
+        "version": 2,
+    }
+
+    await communicator.send_json_to(
+        {"model": "task", "id": str(task.id), "action": "RESYNC"}
+    )
+    response = await communicator.receive_json_from()
+    assert "ok" in response
+
+    await database_sync_to_async(task.save)()
+    await push_message_about_instance(task, message)
+    response = await communicator.receive_json_from()
+    assert response["payload"]["version"] == 1
+    assert "model" in response["payload"]
+
+    await communicator.disconnect()
@@ -1,12 +1,23 @@
 from channels.layers import InMemoryChannelLayer
 
 
+class MockedPipeline:
+    def __init__(self):
+        self.commands = 0
+
+    def set(self, *args, **kwargs):
+        self.commands += 1
+
+    async def execute(self):
+        return [True] * self.commands
+
+
 class MockedConnection:
     async def set(self, *args, **kwargs):
         return True
 
-    async def delete(self, *args, **kwargs):
-        pass
+    def pipeline(self):
+        return MockedPipeline()
 
 
 class MockedConnectionContextManager:
@@ -0,0 +1,96 @@
+from contextlib import ExitStack
+from unittest.mock import patch
+
+import pytest
+from django.http import HttpResponse
+
+from ..replica_routing import (
+    PIN_COOKIE_NAME,
+    REPLICA_DB_ALIAS,
+    ReplicaRouter,
+    ReplicaRoutingMiddleware,
+    reading_from_replica,
+)
+
+
+@pytest.fixture
+def replica():
+    with ExitStack() as stack:
+        stack.enter_context(
+            patch("metecho.replica_routing.replica_configured", return_value=True)
+        )
+        connections = stack.enter_context(patch("metecho.replica_routing.connections"))
+        connections.__getitem__.return_value.in_atomic_block = False
+        yield connections
+
+
+class TestReplicaRouter:
+    def test_outside_block(self, replica):
+        assert ReplicaRouter().db_for_read(None) is None
+
+    def test_in_block(self, replica):
+        with reading_from_replica():
+            assert ReplicaRouter().db_for_read(None) == REPLICA_DB_ALIAS
+        assert ReplicaRouter().db_for_read(None) is None
+
+    def test_sticks_after_write(self, replica):
+        router = ReplicaRouter()
+        with reading_from_replica() as wrote:
+            assert router.db_for_write(None) is None
+            assert router.db_for_read(None) is None
+            assert wrote()
+
+    def test_in_transaction(self, replica):
+        replica.__getitem__.return_value.in_atomic_block = True
+        with reading_from_replica():
+            assert ReplicaRouter().db_for_read(None) is None
+
+    def test_not_configured(self):
+        with reading_from_replica():
+            assert ReplicaRouter().db_for_read(None) is None
+
+    def test_allow_migrate(self):
+        router = ReplicaRouter()
+        assert router.allow_migrate("default", "api")
+        assert not router.allow_migrate(REPLICA_DB_ALIAS, "api")
+
+
+class TestReplicaRoutingMiddleware:
+    def get_response(self, *, write=False):
+        router = ReplicaRouter()
+
+        def get_response(request):
+            get_response.read_from = router.db_for_read(None)
+            if write:
+                router.db_for_write(None)
+            return HttpResponse()
+
+        return get_response
+
+    def test_get(self, rf, replica):
+        get_response = self.get_response()
+        response = ReplicaRoutingMiddleware(get_response)(rf.get("/"))
+
+        assert get_response.read_from == REPLICA_DB_ALIAS
+        assert PIN_COOKIE_NAME not in response.cookies
+
+    def test_post(self, rf, replica):
+        get_response = self.get_response(write=True)
+        response = ReplicaRoutingMiddleware(get_response)(rf.post("/"))
+
+        assert get_response.read_from is None
+        assert PIN_COOKIE_NAME in response.cookies
+
+    def test_get__pinned(self, rf, replica):
+        get_response = self.get_response()
+        request = rf.get("/")
+        request.COOKIES[PIN_COOKIE_NAME] = "1"
+        ReplicaRoutingMiddleware(get_response)(request)
+
+        assert get_response.read_from is None
+
+    def test_not_configured(self, rf):
+        get_response = self.get_response(write=True)
+        response = ReplicaRoutingMiddleware(get_response)(rf.post("/"))
+
+        assert PIN_COOKIE_NAME not in response.cookies
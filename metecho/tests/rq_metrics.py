@@ -0,0 +1,77 @@
+import math
+
+import pytest
+from django_rq import get_connection
+
+from ..rq_metrics import (
+    get_job_metrics,
+    record_job,
+    render_prometheus,
+    reset_job_metrics,
+)
+from ..views import rq_metrics
+
+
+@pytest.fixture
+def connection():
+    connection = get_connection("default")
+    reset_job_metrics(connection)
+    yield connection
+    reset_job_metrics(connection)
+
+
+class TestRecordJob:
+    def test_round_trip(self, connection):
+        record_job(connection, "my.job", wait=0.2, duration=3, succeeded=True)
+        record_job(connection, "my.job", wait=None, duration=0.05, succeeded=False)
+
+        metrics = get_job_metrics(connection)["my.job"]
+
+        assert metrics["succeeded"] == 1
+        assert metrics["failed"] == 1
+        assert metrics["wait"]["count"] == 1
+        assert metrics["run"]["count"] == 2
+        assert metrics["run"]["sum"] == pytest.approx(3.05)
+        run_buckets = dict(metrics["run"]["buckets"])
+        assert run_buckets[0.1] == 1
+        assert run_buckets[5] == 2
+        assert run_buckets[math.inf] == 2
+
+    def test_reset(self, connection):
+        record_job(connection, "my.job", wait=1, duration=1, succeeded=True)
+        reset_job_metrics(connection)
+
+        assert get_job_metrics(connection) == {}
+
+
+def test_render_prometheus(connection):
+    record_job(connection, "my.job", wait=1, duration=2, succeeded=True)
+
+    text = render_prometheus(get_job_metrics(connection))
+
+    assert 'metecho_rq_jobs_total{function="my.job",outcome="succeeded"} 1' in text
+    assert 'metecho_rq_job_run_seconds_bucket{function="my.job",le="+Inf"} 1' in text
+    assert 'metecho_rq_job_wait_seconds_count{function="my.job"} 1' in text
+
+
+@pytest.mark.django_db
+class TestRqMetricsView:
+    def test_staff(self, rf, user_factory, connection):
+        record_job(connection, "my.job", wait=1, duration=2, succeeded=False)
+        request = rf.get("/")
+        request.user = user_factory(is_staff=True)
+
+        response = rq_metrics(request)
+
+        assert response.status_code == 200
+        assert response["Content-Type"].startswith("text/plain")
+        assert b'outcome="failed"} 1' in response.content
+
+    def test_not_staff(self, rf, user_factory, connection):
+        request = rf.get("/")
+        request.user = user_factory()
+
+        response = rq_metrics(request)
+
+        assert response.status_code == 302
+        assert b"metecho_rq" not in response.content
@@ -4,6 +4,8 @@ import pytest
 from django.db import DatabaseError, InterfaceError
 from django_rq import get_worker
 
+from ..rq_worker import ConnectionReusingSimpleWorker, preload_modules
+
 
 class TestConnectionClosingWorker:
     def test_close_database__good(self, mocker):
@@ -54,12 +56,44 @@ class TestConnectionClosingWorker:
         )
         mocker.patch("rq.worker.Worker.perform_job")
 
+        mocker.patch("metecho.rq_worker.safe_record_job")
+
         worker = get_worker()
         # Symbolic call only, since we've mocked out the super:
-        worker.perform_job(None, None)
+        worker.perform_job(MagicMock(), None)
 
         assert close_database.called
 
+    def test_perform_job__batches_notifications(self, mocker):
+        mocker.patch("metecho.rq_worker.ConnectionClosingWorker.close_database")
+        mocker.patch("metecho.rq_worker.safe_record_job")
+        batched_notifications = mocker.patch("metecho.rq_worker.batched_notifications")
+
+        def perform_job(*args, **kwargs):
+            assert batched_notifications.return_value.__enter__.called
+            assert not batched_notifications.return_value.__exit__.called
+            return True
+
+        mocker.patch("rq.worker.Worker.perform_job", side_effect=perform_job)
+
+        worker = get_worker()
+        assert worker.perform_job(MagicMock(), None)
+        assert batched_notifications.return_value.__exit__.called
+
+    def test_perform_job__records_metrics(self, mocker):
+        mocker.patch("metecho.rq_worker.ConnectionClosingWorker.close_database")
+        mocker.patch("rq.worker.Worker.perform_job", return_value=True)
+        safe_record_job = mocker.patch("metecho.rq_worker.safe_record_job")
+        job = MagicMock(func_name="metecho.api.jobs.some_job", enqueued_at=None)
+
+        worker = get_worker()
+        worker.perform_job(job, None)
+
+        args, kwargs = safe_record_job.call_args
+        assert args[1] == "metecho.api.jobs.some_job"
+        assert kwargs["wait"] is None
+        assert kwargs["succeeded"]
+
     def test_work(self, mocker):
         close_database = mocker.patch(
             "metecho.rq_worker.ConnectionClosingWorker.close_database"
@@ -68,3 +102,39 @@ class TestConnectionClosingWorker:
         worker.work(burst=True)
 
         assert close_database.called
+
+
+def test_preload_modules(mocker):
+    import_module = mocker.patch("metecho.rq_worker.import_module")
+    universal_config = mocker.patch(
+        "metecho.api.custom_cci_configs.MetechoUniversalConfig"
+    )
+
+    preload_modules()
+
+    assert import_module.called
+    assert universal_config.called
+
+
+class TestConnectionReusingSimpleWorker:
+    def test_perform_job(self, mocker):
+        close_old_connections = mocker.patch("metecho.rq_worker.close_old_connections")
+        close_database = mocker.patch(
+            "metecho.rq_worker.ConnectionClosingWorkerMixin.close_database"
+        )
+        mocker.patch("rq.worker.Worker.perform_job", return_value=True)
+        mocker.patch("metecho.rq_worker.safe_record_job")
+
+        worker = get_worker(worker_class=ConnectionReusingSimpleWorker)
+        worker.perform_job(MagicMock(), None)
+
+        assert close_old_connections.call_count == 2
+        assert not close_database.called
+
+    def test_work(self, mocker):
+        preload = mocker.patch("metecho.rq_worker.preload_modules")
+
+        worker = get_worker(worker_class=ConnectionReusingSimpleWorker)
+        worker.work(burst=True)
+
+        assert preload.called
@@ -21,12 +21,14 @@ from django.urls import include, path, re_path
 from django.views.generic import RedirectView, TemplateView
 
 from .routing import websockets
+from .views import rq_metrics
 
 PREFIX = settings.ADMIN_AREA_PREFIX
 
 
 urlpatterns = [
     path(urljoin(PREFIX, r"django-rq/"), include("django_rq.urls")),
+    path(urljoin(PREFIX, r"rq-metrics/"), rq_metrics, name="rq_metrics"),
     path(
         urljoin(PREFIX, r"rest/"),
         include("metecho.adminapi.urls", namespace="admin_rest"),
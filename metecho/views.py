@@ -0,0 +1,19 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse
+from django_rq import get_connection
+
+from .rq_metrics import get_job_metrics, render_prometheus
+
+
+@staff_member_required
+def rq_metrics(request):
+    """
+    Per-job-function RQ metrics in the Prometheus text format.
+
+    Like the django-rq views, this is for staff only, and is mounted under
+    the admin prefix so ``AdminRestrictMiddleware`` applies too.
+    """
+    metrics = get_job_metrics(get_connection("default"))
+    return HttpResponse(
+        render_prometheus(metrics), content_type="text/plain; version=0.0.4"
+    )